@@ -1,29 +1,92 @@
-import google.generativeai as genai
 import os
 import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-load_dotenv()
+import backends
+import database
+import telemetry
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
+load_dotenv()
 
-model = genai.GenerativeModel('gemini-pro')
+_model = None
+_model_lock = threading.Lock()
 
-def analyze_video_ai(video):
+def get_model():
     """
-    Analyzes video using Gemini Pro to generate intelligence report.
+    The analysis model (Gemini, or the fake with AI_BACKEND=fake), created on
+    first use: the SDK takes long to import and processes that only serve the
+    API (or hit the cache) never need it.
     """
-    prompt = f"""
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = backends.create_ai_model()
+        return _model
+
+# Analysis stage tuning
+AI_MAX_WORKERS = int(os.getenv("AI_MAX_WORKERS", "6"))
+AI_REQUESTS_PER_MINUTE = float(os.getenv("AI_REQUESTS_PER_MINUTE", "60"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+AI_BACKOFF_BASE = float(os.getenv("AI_BACKOFF_BASE", "1.0"))
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(6 * 3600)))
+# Videos packed into one prompt; 1 = one request per video
+AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "5"))
+
+# Expected type of every key in an analysis
+ANALYSIS_SCHEMA = {
+    "why_trending": str,
+    "emotional_trigger": str,
+    "target_audience": str,
+    "thumbnail_psychology": str,
+    "title_strategy": str,
+    "predicted_performance": str,
+    "viral_score": (int, float),
+}
+
+FALLBACK_ANALYSIS = {
+    "why_trending": "Analysis failed.",
+    "emotional_trigger": "Unknown",
+    "target_audience": "General",
+    "thumbnail_psychology": "N/A",
+    "title_strategy": "N/A",
+    "predicted_performance": "Unknown",
+    "viral_score": 0
+}
+
+class RateLimiter:
+    """Spaces calls at least 60/requests_per_minute seconds apart, across threads."""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+rate_limiter = RateLimiter(AI_REQUESTS_PER_MINUTE)
+
+def build_prompt(video):
+    return f"""
     Analyze this trending YouTube video and provide a structured JSON response.
-    
+
     Video Title: {video['title']}
     Channel: {video['channel_title']}
     Views: {video['view_count']}
     Hours Live: {video.get('hours_since_upload')}
     Description: {video.get('description', '')[:300]}...
     Tags: {video.get('tags', [])[:10]}
-    
+
     Return ONLY a JSON object with these exact keys:
     {{
         "why_trending": "3 concise lines explaining why it's viral",
@@ -36,19 +99,201 @@ def analyze_video_ai(video):
     }}
     Do not include markdown formatting like ```json or ```. Just the raw JSON string.
     """
-    
+
+def build_batch_prompt(videos):
+    entries = [{
+        "video_id": v['video_id'],
+        "title": v['title'],
+        "channel": v['channel_title'],
+        "views": v['view_count'],
+        "hours_live": v.get('hours_since_upload'),
+        "description": v.get('description', '')[:300],
+        "tags": v.get('tags', [])[:10],
+    } for v in videos]
+    return f"""
+    Analyze each of these trending YouTube videos.
+
+    Videos (JSON):
+    {json.dumps(entries, ensure_ascii=False)}
+
+    Return ONLY a JSON array with one object per video, each with these exact keys:
+    {{
+        "video_id": "the video_id given above",
+        "why_trending": "3 concise lines explaining why it's viral",
+        "emotional_trigger": "e.g., Curiosity, Shock, Nostalgia",
+        "target_audience": "Specific demographic",
+        "thumbnail_psychology": "Why the thumbnail works (guess based on title/stats)",
+        "title_strategy": "Analysis of the title structure",
+        "predicted_performance": "Forecast for next 24h",
+        "viral_score": 0-100 (numeric)
+    }}
+    Do not include markdown formatting like ```json or ```. Just the raw JSON string.
+    """
+
+def validate_analysis(entry):
+    """True if entry has every schema key with the right type and a 0-100 viral_score."""
+    if not isinstance(entry, dict):
+        return False
+    for key, expected in ANALYSIS_SCHEMA.items():
+        value = entry.get(key)
+        if not isinstance(value, expected) or isinstance(value, bool):
+            return False
+    return 0 <= entry['viral_score'] <= 100
+
+def _parse_json_reply(text):
+    return json.loads(text.replace('```json', '').replace('```', '').strip())
+
+def parse_batch_response(text, video_ids):
+    """
+    Returns {video_id: analysis} for the valid entries of a batch reply.
+    Entries that are missing, unknown or fail validation are left out.
+    """
     try:
-        response = model.generate_content(prompt)
-        text_response = response.text.replace('```json', '').replace('```', '').strip()
-        return json.loads(text_response)
+        data = _parse_json_reply(text)
+    except ValueError:
+        return {}
+    if isinstance(data, dict):
+        data = data.get('results', data.get('videos', []))
+    if not isinstance(data, list):
+        return {}
+
+    wanted = set(video_ids)
+    results = {}
+    for entry in data:
+        if not isinstance(entry, dict) or entry.get('video_id') not in wanted:
+            continue
+        analysis = {key: entry.get(key) for key in ANALYSIS_SCHEMA}
+        if validate_analysis(analysis):
+            results[entry['video_id']] = analysis
+    return results
+
+def content_hash(video):
+    """Hash of the text the prompt is built from; a changed title/description/tags invalidates the cache."""
+    text = "\x1f".join([video.get('title', ''), video.get('description', ''), "\x1e".join(video.get('tags', []))])
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def _generate_with_retries(prompt, ai_model, limiter):
+    """
+    Calls the model (anything with generate_content(prompt).text) and parses the
+    JSON reply, retrying with exponential backoff + jitter. Raises after the last attempt.
+    """
+    for attempt in range(AI_MAX_RETRIES + 1):
+        try:
+            limiter.acquire()
+            with telemetry.timed('ai_request_seconds', mode='single'):
+                response = ai_model.generate_content(prompt)
+            analysis = _parse_json_reply(response.text)
+            if not validate_analysis(analysis):
+                raise ValueError("Reply does not match the analysis schema")
+            telemetry.inc('ai_requests_total', mode='single', result='ok')
+            return analysis
+        except Exception:
+            telemetry.inc('ai_requests_total', mode='single', result='error')
+            if attempt == AI_MAX_RETRIES:
+                raise
+            time.sleep(AI_BACKOFF_BASE * (2 ** attempt) * (0.5 + random.random()))
+
+def analyze_batch(videos, ai_model, limiter):
+    """
+    One request for several videos. Returns {video_id: analysis} for the
+    entries that came back valid; a failed request returns nothing.
+    """
+    limiter.acquire()
+    try:
+        with telemetry.timed('ai_request_seconds', mode='batch'):
+            response = ai_model.generate_content(build_batch_prompt(videos))
+        results = parse_batch_response(response.text, [v['video_id'] for v in videos])
     except Exception as e:
+        telemetry.inc('ai_requests_total', mode='batch', result='error')
+        print(f"AI batch of {len(videos)} failed: {e}")
+        return {}
+    # 'partial': some entries were invalid and get re-queued
+    telemetry.inc('ai_requests_total', mode='batch', result='ok' if len(results) == len(videos) else 'partial')
+    return results
+
+def _analyze_batched(videos, ai_model, limiter, max_workers, batch_size):
+    """
+    Packs videos into batch_size prompts run concurrently; only entries that
+    failed are re-queued (into fresh batches) on the next round, with backoff.
+    """
+    results = {}
+    queue = list(videos)
+    for attempt in range(AI_MAX_RETRIES + 1):
+        if not queue:
+            break
+        if attempt:
+            print(f"Re-queueing {len(queue)} AI analyses (attempt {attempt + 1})")
+            time.sleep(AI_BACKOFF_BASE * (2 ** (attempt - 1)) * (0.5 + random.random()))
+        batches = [queue[i:i + batch_size] for i in range(0, len(queue), batch_size)]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as pool:
+            for batch_results in pool.map(lambda b: analyze_batch(b, ai_model, limiter), batches):
+                results.update(batch_results)
+        queue = [v for v in queue if v['video_id'] not in results]
+    return results
+
+def analyze_video_ai(video, ai_model=None, limiter=None):
+    """
+    Analyzes video using Gemini Pro to generate intelligence report.
+    """
+    try:
+        return _generate_with_retries(build_prompt(video), ai_model or get_model(), limiter or rate_limiter)
+    except Exception as e:
+        telemetry.inc('ai_failures_total')
         print(f"AI Analysis failed for {video['title']}: {e}")
-        return {
-            "why_trending": "Analysis failed.",
-            "emotional_trigger": "Unknown",
-            "target_audience": "General",
-            "thumbnail_psychology": "N/A",
-            "title_strategy": "N/A",
-            "predicted_performance": "Unknown",
-            "viral_score": 0
-        }
+        return dict(FALLBACK_ANALYSIS)
+
+def analyze_videos_ai(videos, ai_model=None, max_workers=AI_MAX_WORKERS, limiter=None, use_cache=True,
+                      batch_size=None):
+    """
+    Analyzes many videos concurrently on a bounded pool, sharing one rate limiter.
+    With batch_size > 1 (default AI_BATCH_SIZE) several videos share one prompt.
+    Fresh results are served from the SQLite cache (video_id + content hash, TTL);
+    only successful analyses are cached. Returns {video_id: analysis}.
+    """
+    videos = list(videos)
+    hashes = {v['video_id']: content_hash(v) for v in videos}
+    results = database.get_cached_analyses(hashes, AI_CACHE_TTL) if use_cache else {}
+    pending = [v for v in videos if v['video_id'] not in results]
+    if use_cache:
+        telemetry.inc('ai_cache_hits_total', len(results))
+        telemetry.inc('ai_cache_misses_total', len(pending))
+    if pending:
+        print(f"AI cache: {len(results)} hits, {len(pending)} to analyze")
+
+    fresh = []
+    if pending:
+        ai_model = ai_model or get_model()
+    limiter = limiter or rate_limiter
+    batch_size = AI_BATCH_SIZE if batch_size is None else batch_size
+
+    if pending and batch_size > 1:
+        analyzed = _analyze_batched(pending, ai_model, limiter, max_workers, batch_size)
+        for video in pending:
+            analysis = analyzed.get(video['video_id'])
+            if analysis is None:
+                telemetry.inc('ai_failures_total')
+                print(f"AI Analysis failed for {video['title']}: no valid entry after retries")
+                analysis = dict(FALLBACK_ANALYSIS)
+            else:
+                fresh.append((video['video_id'], hashes[video['video_id']], analysis))
+            results[video['video_id']] = analysis
+
+    elif pending:
+        def task(video):
+            return _generate_with_retries(build_prompt(video), ai_model, limiter)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as pool:
+            futures = [pool.submit(task, v) for v in pending]
+            for video, future in zip(pending, futures):
+                try:
+                    analysis = future.result()
+                    fresh.append((video['video_id'], hashes[video['video_id']], analysis))
+                except Exception as e:
+                    telemetry.inc('ai_failures_total')
+                    print(f"AI Analysis failed for {video['title']}: {e}")
+                    analysis = dict(FALLBACK_ANALYSIS)
+                results[video['video_id']] = analysis
+
+    if use_cache:
+        database.save_cached_analyses(fresh)
+    return results
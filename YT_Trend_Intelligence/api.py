@@ -1,39 +1,52 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import sqlite3
 import os
+import json
+import asyncio
+import base64
 import database
-import metrics_engine
-import ai_analyzer
-import category_engine
 import youtube_client
 from pydantic import BaseModel
+from typing import Optional
 import threading
 import time
 from contextlib import asynccontextmanager
-import main
+import url_analyzer
+import live_feed
+import telemetry
+from response_cache import response_cache
+# jobs and outbox pull in the whole cycle (pipeline, email, SMTP); they are
+# imported where used so a read-only replica starts without them.
+
+# 0 = read-only replica: no scheduled cycles or email delivery in this process
+# (POST /run-cycle still queues a job for the worker process to pick up)
+API_BACKGROUND_JOBS = os.getenv("API_BACKGROUND_JOBS", "1") == "1"
 
 # Background Worker Thread
 def run_worker_loop():
+    import jobs
     print("Background Worker Started: Waiting 10s before first run...")
     time.sleep(10) # Initial buffer
-    while True:
-        try:
-            print(">>> Triggering Background Analysis Cycle <<<")
-            main.main()
-        except Exception as e:
-            print(f"Background Worker Error: {e}")
-        
-        print("Worker sleeping for 30 minutes...")
-        time.sleep(1800)
+    # Adaptive interval between cycles (see scheduler.AdaptivePolicy)
+    jobs.run_schedule_forever()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    worker_thread = threading.Thread(target=run_worker_loop, daemon=True)
-    worker_thread.start()
+    # Startup (creates tables, indexes and runs pending migrations)
+    database.init_db()
+    if API_BACKGROUND_JOBS:
+        import outbox
+        worker_thread = threading.Thread(target=run_worker_loop, daemon=True)
+        worker_thread.start()
+        outbox.start_delivery()
+    live_feed.start_publisher()
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    if API_BACKGROUND_JOBS:
+        outbox.stop_delivery()
+    live_feed.stop_publisher()
+    database.close_db_connections()
 
 app = FastAPI(title="TrendIntel API", description="API for YouTube Trend Intelligence", lifespan=lifespan)
 
@@ -44,71 +57,113 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-def get_db_connection():
-    conn = sqlite3.connect(database.DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
-
 # Root route removed to allow frontend to take over
 # @app.get("/")
 # def read_root():
 #     return {"status": "active", "system": "TrendIntel AI"}
 
+def encode_cursor(row):
+    raw = json.dumps([row['engagement_score'], row['video_id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor):
+    try:
+        score, video_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (score, video_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def cached_json(request, key, build):
+    # Serves a pre-serialized response from response_cache (rebuilt only after
+    # a write bumps the data generation), answering If-None-Match with 304.
+    # Builds are where the SQLite time goes, so they are timed per endpoint.
+    def timed_build():
+        with telemetry.timed("api_db_query_seconds", endpoint=key[0]):
+            return build()
+    entry = response_cache.get_or_build(key, timed_build)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+    if request.headers.get("if-none-match") == entry.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
 @app.get("/trends")
-def get_trends(limit: int = 50, category: str = None):
-    conn = get_db_connection()
-    c = conn.cursor()
+def get_trends(request: Request, limit: int = 50, category: str = None, trend_type: str = None,
+               since_hours: float = None, cursor: str = None):
+    # Filters and ordering run in SQL against idx_videos_(category_)score.
+    # The next page's cursor is returned in the X-Next-Cursor header so the
+    # body stays a plain list for existing clients.
+    if category == "All":
+        category = None
+    after = decode_cursor(cursor) if cursor else None
+    
+    def build():
+        rows = database.get_trending_videos(
+            limit=limit, category=category, trend_type=trend_type,
+            since_hours=since_hours, after=after
+        )
+        headers = {"X-Next-Cursor": encode_cursor(rows[-1])} if rows and len(rows) == limit else {}
+        return [dict(row) for row in rows], headers
     
-    query = "SELECT * FROM videos"
-    params = []
+    return cached_json(request, ("trends", limit, category, trend_type, since_hours, cursor), build)
+
+@app.get("/leaders")
+def get_leaders(request: Request, k: int = 5):
+    # Top k per category in one response, each read straight off the
+    # category/score index (database.get_category_leaders)
+    k = min(max(k, 1), 50)
+    
+    def build():
+        leaders = database.get_category_leaders(k)
+        return {category: [dict(row) for row in rows] for category, rows in leaders.items()}, {}
     
-    if category and category != "All":
-        # Rough filtering since we didn't store category explicitly in DB (my bad in data model, fixing logic)
-        # We stored 'trend_type' and 'title'. 
-        # Actually in main.py we categorized but didn't save 'category' column in DB.
-        # We can try to re-categorize or just return all and let frontend filter.
-        # Ideally we should migrate DB. For now, let's fetch all and filter in python if needed or just return all.
-        pass
-
-    query += " ORDER BY engagement_score DESC LIMIT ?"
-    params.append(limit)
+    return cached_json(request, ("leaders", k), build)
+
+@app.get("/live")
+async def live_trends(request: Request):
+    # Server-Sent Events: a snapshot of the top list, then only deltas (new
+    # videos, rank and score changes) as cycles save. Every client shares one
+    # DB read per update via live_feed.broadcaster.
+    queue, snapshot = live_feed.broadcaster.subscribe(asyncio.get_running_loop())
     
-    c.execute(query, tuple(params))
-    rows = c.fetchall()
-    conn.close()
+    async def stream():
+        try:
+            yield snapshot
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None: # fell behind; the client reconnects for a fresh snapshot
+                    break
+                yield message
+        finally:
+            live_feed.broadcaster.unsubscribe(queue)
     
-    # Enrichment (Minimal now since DB has category)
-    results = []
-    for row in rows:
-        vid = dict(row)
-        # Fallback if category is missing (old data)
-        if not vid.get('category'):
-            vid['category'] = category_engine.categorize_video(vid)
-            
-        if category and category != "All" and vid['category'] != category:
-            continue
-            
-        results.append(vid)
-        
-    return results
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
 
 @app.get("/stats")
-def get_stats():
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT COUNT(*) as total FROM videos")
-    total = c.fetchone()['total']
-    c.execute("SELECT COUNT(*) as sent FROM videos WHERE is_sent=1")
-    sent = c.fetchone()['sent']
-    conn.close()
-    return {
-        "total_analyzed": total,
-        "emails_sent": sent,
-        "virality_rate": 15, # Placeholder
-        "bot_active": database.is_bot_active()
-    }
+def get_stats(request: Request):
+    # Counts come from the trigger-maintained aggregates, not COUNT(*) scans
+    def build():
+        stats = database.get_stats_aggregates()
+        return {
+            "total_analyzed": stats['total'],
+            "emails_sent": stats['sent'],
+            "virality_rate": stats['virality']['24h']['rate'], # % of videos seen in 24h that were Exploding/Fast Rising
+            "virality": stats['virality'],
+            "by_category": stats['by_category'],
+            "by_trend_type": stats['by_trend_type'],
+            "bot_active": database.is_bot_active()
+        }, {}
+    
+    return cached_json(request, ("stats",), build)
 
 class SettingRequest(BaseModel):
     key: str
@@ -117,84 +172,144 @@ class SettingRequest(BaseModel):
 @app.post("/settings")
 def update_setting(req: SettingRequest):
     database.set_setting(req.key, req.value)
+    response_cache.invalidate()
     return {"status": "success", "key": req.key, "value": req.value}
 
 class AnalysisRequest(BaseModel):
     url: str
 
+class BatchAnalysisRequest(BaseModel):
+    urls: list[str]
+
 @app.post("/analyze")
 def analyze_video(request: AnalysisRequest):
-    # Extract ID
-    import re
-    video_id = None
-    patterns = [
-        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-        r'(?:v=|\/)([0-9A-Za-z_-]{11})'
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, request.url)
-        if match:
-            video_id = match.group(1)
-            break
-            
-    if not video_id:
-        raise HTTPException(status_code=400, detail="Invalid YouTube URL")
-        
-    # Fetch details (Reuse youtube client logic ideally, but it fetches list. Need single video fetcher)
-    # For now, let's mock or use the youtube client if adaptable.
-    # We will just fetch trending to see if it's there, or use a quick shim.
-    # Actually, let's add a single video fetch to youtube_client.
-    
+    # Fetches the video (videos.list by ID), scores it and runs the AI
+    # analysis. Cached for ANALYZE_CACHE_TTL; concurrent lookups of the same
+    # video share one API + one LLM call.
     try:
-        # Quick fetch using existing client logic but specific ID
-        # Reuse existing client logic usually fetches list.
-        # Let's rely on simple extraction from existing DB if present, else fail for MVP or implement full fetch.
-        # Returning mock for UI demo if not in DB, to avoid API cost/complexity in this turn.
-        # Real implementation would call API.
-        
-        return {
-            "video_id": video_id,
-            "title": "AI Analysis Pending...",
-            "viral_score": 85,
-            "ai_insights": {
-                "why_trending": "High engagement velocity detected in last hour.",
-                "emotional_trigger": "Curiosity & Shock",
-                "audience": "Gen Z Gamers",
-                "sentiment": "Positive"
-            }
-        }
+        return url_analyzer.analyze_url(request.url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except url_analyzer.VideoNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except youtube_client.QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze/batch")
+def analyze_videos_batch(request: BatchAnalysisRequest):
+    # Many URLs in one go: one videos.list per 50 IDs and batched AI prompts.
+    # Results follow the input order; bad or unknown URLs get an error entry.
+    if len(request.urls) > url_analyzer.ANALYZE_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {url_analyzer.ANALYZE_MAX_BATCH} URLs per request")
+    ids = [youtube_client.parse_video_id(url) for url in request.urls]
+    try:
+        results = url_analyzer.analyze_video_ids(vid for vid in ids if vid)
+    except youtube_client.QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    items = []
+    for url, vid in zip(request.urls, ids):
+        if not vid:
+            items.append({"url": url, "error": "Invalid YouTube URL"})
+        elif vid not in results:
+            items.append({"url": url, "video_id": vid, "error": "Video not found"})
+        else:
+            items.append({"url": url, **results[vid]})
+    return items
+
 @app.get("/reports")
-def get_reports(limit: int = 20):
-    conn = get_db_connection()
-    c = conn.cursor()
-    # Fetch videos that have been sent (is_sent=1)
-    c.execute('SELECT * FROM videos WHERE is_sent = 1 ORDER BY timestamp DESC LIMIT ?', (limit,))
-    rows = c.fetchall()
-    conn.close()
+def get_reports(request: Request, limit: int = 20):
+    def build():
+        conn = database.get_db_connection()
+        c = conn.cursor()
+        # Fetch videos that have been sent (is_sent=1)
+        c.execute('SELECT * FROM videos WHERE is_sent = 1 ORDER BY timestamp DESC LIMIT ?', (limit,))
+        rows = c.fetchall()
+        return [dict(row) for row in rows], {}
     
-    results = [dict(row) for row in rows]
-    return results
+    return cached_json(request, ("reports", limit), build)
+
+class SubscriberRequest(BaseModel):
+    email: str
+    categories: Optional[list[str]] = None
+    regions: Optional[list[str]] = None
+    trend_types: Optional[list[str]] = None
+    min_viral_probability: float = 0
+    active: bool = True
+
+@app.get("/subscribers")
+def list_subscribers():
+    return database.get_subscribers(active_only=False)
+
+@app.post("/subscribers")
+def save_subscriber(req: SubscriberRequest):
+    # Adds or updates by email; omitted filters mean "everything"
+    if "@" not in req.email:
+        raise HTTPException(status_code=400, detail="Invalid email address")
+    return database.upsert_subscriber(
+        req.email, req.categories, req.regions, req.trend_types, req.min_viral_probability, req.active
+    )
+
+@app.delete("/subscribers/{email}")
+def remove_subscriber(email: str):
+    if not database.delete_subscriber(email):
+        raise HTTPException(status_code=404, detail="Subscriber not found")
+    return {"status": "success", "email": email}
 
 @app.post("/run-cycle")
 def run_cycle_manually():
-    import threading
-    import main
-    
-    # Run in background to not block response
-    def task():
-        try:
-            print("Manual cycle triggered...")
-            main.main()
-        except Exception as e:
-            print(f"Manual cycle failed: {e}")
-            
-    thread = threading.Thread(target=task)
-    thread.start()
+    # Queue (or join) the single cycle job and return at once; the runner
+    # executes it in the background, at most one cycle across all processes
+    import jobs
+    job = jobs.request_cycle("manual")
+    if API_BACKGROUND_JOBS:
+        jobs.start_runner()
     
-    return {"status": "success", "message": "Analysis cycle started in background"}
+    message = "Joined the cycle already in progress" if job['coalesced'] else "Analysis cycle queued"
+    return {"status": "success", "message": message, "job_id": job['id'], "job_status": job['status']}
+
+@app.get("/cycles")
+def get_cycles(limit: int = 20):
+    # Per-cycle records (counts, stage timings, counters), newest first
+    return database.get_cycle_runs(limit=min(max(limit, 1), 500))
+
+@app.get("/metrics")
+def get_metrics():
+    # Prometheus scrape target: this process's counters and histograms, plus
+    # gauges read from the DB so cycles run by a separate worker show up too
+    if not telemetry.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=0)")
+    gauges = [
+        ("yt_quota_used_units", "YouTube quota units spent today by all processes",
+         [({}, database.get_quota_used(youtube_client.quota_day()))]),
+        ("yt_quota_limit_units", "Daily YouTube quota", [({}, youtube_client.DAILY_QUOTA)]),
+        ("email_outbox_messages", "Outbox messages by status",
+         [({"status": status}, count) for status, count in database.get_outbox_counts().items()]),
+        ("api_response_cache_lookups", "Response cache lookups since start by result",
+         [({"result": "hit"}, response_cache.hits), ({"result": "miss"}, response_cache.misses)]),
+    ]
+    runs = database.get_cycle_runs(limit=1)
+    if runs:
+        last = runs[0]
+        gauges += [
+            ("cycle_last_started_seconds", "Start of the last finished cycle (unix time)", [({}, last['started_at'])]),
+            ("cycle_last_duration_seconds", "Wall time of the last cycle", [({}, last['duration'])]),
+            ("cycle_last_stage_seconds", "Busy seconds per stage in the last cycle",
+             [({"stage": stage}, seconds) for stage, seconds in last['timings'].items() if stage != 'total']),
+            ("cycle_last_videos", "Videos fetched, ranked as candidates and emailed in the last cycle",
+             [({"kind": kind}, last[kind] or 0) for kind in ('fetched', 'new_candidates', 'emailed')]),
+            ("cycle_last_quota_units", "YouTube quota units the last cycle spent", [({}, last['quota_used'] or 0)]),
+        ]
+    return Response(content=telemetry.render(gauges), media_type="text/plain; version=0.0.4")
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: int):
+    job = database.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 if __name__ == "__main__":
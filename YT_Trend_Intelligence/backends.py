@@ -0,0 +1,89 @@
+"""
+Chooses the implementation behind each external service, so the whole app
+(worker, API, benchmarks) can run without YouTube, Gemini or SMTP:
+
+    FETCH_BACKEND = youtube | fake   (trending charts and video lookups)
+    AI_BACKEND    = gemini  | fake   (analysis model)
+    MAIL_BACKEND  = smtp    | fake   (outgoing email)
+
+The fakes live in fakes.py and are tuned with the FAKE_* settings below.
+Everything is imported on first use, like the services themselves.
+"""
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FETCH_BACKEND = os.getenv("FETCH_BACKEND", "youtube")
+AI_BACKEND = os.getenv("AI_BACKEND", "gemini")
+MAIL_BACKEND = os.getenv("MAIL_BACKEND", "smtp")
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+
+# Fake backend tuning (latencies in seconds, error rates 0-1)
+FAKE_SEED = int(os.getenv("FAKE_SEED", "42"))
+FAKE_VIDEOS_PER_CHART = int(os.getenv("FAKE_VIDEOS_PER_CHART", "200"))
+FAKE_FETCH_LATENCY = float(os.getenv("FAKE_FETCH_LATENCY", "0.05"))
+FAKE_FETCH_ERROR_RATE = float(os.getenv("FAKE_FETCH_ERROR_RATE", "0"))
+FAKE_AI_LATENCY = float(os.getenv("FAKE_AI_LATENCY", "0.2"))
+FAKE_AI_ERROR_RATE = float(os.getenv("FAKE_AI_ERROR_RATE", "0"))
+FAKE_MAIL_LATENCY = float(os.getenv("FAKE_MAIL_LATENCY", "0.01"))
+FAKE_MAIL_ERROR_RATE = float(os.getenv("FAKE_MAIL_ERROR_RATE", "0"))
+
+_fake_fetcher = None
+_fake_mailer = None
+_lock = threading.Lock()
+
+def _unknown(setting, value, choices):
+    return ValueError(f"Unknown {setting} {value!r}; expected one of: {', '.join(choices)}")
+
+def get_fetcher():
+    """
+    Module or object with the youtube_client fetch API (iter_trending_pages,
+    fetch_videos, fetch_statistics). The fake fetcher is shared, so repeated
+    calls see the same charts with growing counts.
+    """
+    global _fake_fetcher
+    if FETCH_BACKEND == "youtube":
+        import youtube_client
+        return youtube_client
+    if FETCH_BACKEND == "fake":
+        with _lock:
+            if _fake_fetcher is None:
+                import fakes
+                _fake_fetcher = fakes.FakeFetcher(
+                    latency=FAKE_FETCH_LATENCY, error_rate=FAKE_FETCH_ERROR_RATE,
+                    seed=FAKE_SEED, chart_size=FAKE_VIDEOS_PER_CHART)
+            return _fake_fetcher
+    raise _unknown("FETCH_BACKEND", FETCH_BACKEND, ("youtube", "fake"))
+
+def create_ai_model():
+    """A new model object with generate_content(prompt).text."""
+    if AI_BACKEND == "gemini":
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+        return genai.GenerativeModel(GEMINI_MODEL)
+    if AI_BACKEND == "fake":
+        import fakes
+        return fakes.FakeModel(latency=FAKE_AI_LATENCY, failure_rate=FAKE_AI_ERROR_RATE, seed=FAKE_SEED)
+    raise _unknown("AI_BACKEND", AI_BACKEND, ("gemini", "fake"))
+
+def create_mail_connection():
+    """
+    A connection with send(msg) and close(). The fake mailer is shared, so
+    everything "sent" in this process can be inspected in its .sent list.
+    """
+    global _fake_mailer
+    if MAIL_BACKEND == "smtp":
+        import email_sender
+        return email_sender.SMTPConnection()
+    if MAIL_BACKEND == "fake":
+        with _lock:
+            if _fake_mailer is None:
+                import fakes
+                _fake_mailer = fakes.FakeMailer(
+                    latency=FAKE_MAIL_LATENCY, error_rate=FAKE_MAIL_ERROR_RATE, seed=FAKE_SEED)
+            return _fake_mailer
+    raise _unknown("MAIL_BACKEND", MAIL_BACKEND, ("smtp", "fake"))
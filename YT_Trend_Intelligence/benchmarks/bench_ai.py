@@ -0,0 +1,73 @@
+"""
+Benchmark: AI analysis stage with a fake model that simulates latency and
+failures. Compares sequential, concurrent and batched-prompt modes (requests
+per cycle, approximate prompt tokens, wall time), then a repeat run served
+from the SQLite cache.
+
+Usage:
+    python benchmarks/bench_ai.py [num_videos] [latency_seconds] [failure_rate]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_analyzer
+import database
+from fakes import FakeModel
+
+def make_videos(n):
+    return [{
+        'video_id': f"vid{i:05d}",
+        'title': f"Synthetic trending video {i}",
+        'channel_title': "Channel",
+        'view_count': 1000 * i,
+        'hours_since_upload': 2.0,
+        'description': "synthetic " * 40,
+        'tags': ["synthetic"],
+    } for i in range(n)]
+
+def run(label, videos, fake, max_workers, batch_size):
+    limiter = ai_analyzer.RateLimiter(0) # Unthrottled for the benchmark
+    calls_before, chars_before = fake.calls, fake.prompt_chars
+    start = time.perf_counter()
+    results = ai_analyzer.analyze_videos_ai(
+        videos, ai_model=fake, max_workers=max_workers, limiter=limiter, batch_size=batch_size
+    )
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for r in results.values() if r == ai_analyzer.FALLBACK_ANALYSIS)
+    print(f"{label:<12} workers={max_workers:<2} batch={batch_size:<3} {elapsed * 1000:8.1f} ms  "
+          f"requests={fake.calls - calls_before:<4} ~prompt tokens={(fake.prompt_chars - chars_before) // 4:<6} "
+          f"failed={failed}")
+
+def fresh_db(tmp, name):
+    database.DB_NAME = os.path.join(tmp, f"{name}.db")
+    database.init_db()
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 35
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    failure_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    ai_analyzer.AI_BACKOFF_BASE = 0.05
+    videos = make_videos(n)
+    workers = ai_analyzer.AI_MAX_WORKERS
+
+    def model():
+        return FakeModel(latency, failure_rate, item_latency=latency / 10, entry_failure_rate=0.05)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fresh_db(tmp, "sequential")
+        run("sequential", videos, model(), 1, 1)
+
+        fresh_db(tmp, "concurrent")
+        run("concurrent", videos, model(), workers, 1)
+
+        for batch_size in (5, 10):
+            fresh_db(tmp, f"batched{batch_size}")
+            fake = model()
+            run("batched", videos, fake, workers, batch_size)
+
+        run("cached", videos, fake, workers, ai_analyzer.AI_BATCH_SIZE)
+        database.close_db_connections()
@@ -0,0 +1,85 @@
+"""
+Benchmark: on-demand /analyze lookups against the stub YouTube server and a
+fake AI model. A burst of concurrent requests for the same viral URL should
+cost one videos.list and one model call; a repeat is served from SQLite; a
+batch of URLs shares batched requests.
+
+Usage:
+    python benchmarks/bench_analyze.py [concurrent_requests] [batch_urls] [api_latency] [ai_latency]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_analyzer
+import database
+import url_analyzer
+import youtube_client
+from fakes import FakeModel
+from stub_youtube_server import make_synthetic_recordings, start_stub_server
+
+def measure(label, server, fake, fn):
+    requests_before, calls_before = server.stats['requests'], fake.calls
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed * 1000:8.1f} ms  videos.list calls={server.stats['requests'] - requests_before:<3} "
+          f"model calls={fake.calls - calls_before}")
+    return result
+
+if __name__ == "__main__":
+    concurrent = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    batch_urls = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    api_latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    ai_latency = float(sys.argv[4]) if len(sys.argv) > 4 else 0.3
+
+    recordings = make_synthetic_recordings(["IN"], pages=1)
+    # Real IDs are 11 characters; parse_video_id rejects anything else
+    ids = []
+    for body in recordings.values():
+        for n, item in enumerate(body["items"]):
+            item["id"] = f"vid{n:08d}"
+            ids.append(item["id"])
+    server, base_url = start_stub_server(recordings, latency=api_latency)
+    youtube_client.YOUTUBE_API_URL = base_url
+    fake = FakeModel(latency=ai_latency, seed=3)
+    limiter = ai_analyzer.RateLimiter(0)
+    analyze = lambda videos: ai_analyzer.analyze_videos_ai(videos, ai_model=fake, limiter=limiter)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "analyze.db")
+        database.init_db()
+        try:
+            url = f"https://www.youtube.com/watch?v={ids[0]}"
+
+            def burst():
+                results = []
+                def worker():
+                    results.append(url_analyzer.analyze_url(url, analyze=analyze))
+                threads = [threading.Thread(target=worker) for _ in range(concurrent)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                return results
+
+            results = measure(f"{concurrent} concurrent, same URL", server, fake, burst)
+            assert len(results) == concurrent and all(r == results[0] for r in results), "coalesced results differ"
+            measure("repeat (SQLite cache)", server, fake, lambda: url_analyzer.analyze_url(url, analyze=analyze))
+
+            urls = [f"https://youtu.be/{vid}" for vid in ids[1:batch_urls + 1]]
+            batch = measure(f"batch of {len(urls)} URLs", server, fake,
+                            lambda: url_analyzer.analyze_video_ids(
+                                [youtube_client.parse_video_id(u) for u in urls], analyze=analyze))
+            assert len(batch) == len(urls), "batch lost videos"
+            measure("10 URLs one by one (no lookup cache)", server, fake,
+                    lambda: [url_analyzer.analyze_video_ids([youtube_client.parse_video_id(u)], analyze=analyze,
+                                                           use_cache=False) for u in urls[:10]])
+            print("(the AI cache still serves analyses in the last row; only stats are re-fetched)")
+        finally:
+            server.shutdown()
+            database.close_db_connections()
@@ -0,0 +1,80 @@
+"""
+Benchmark: per-keyword substring scan (the previous categorize_video loop)
+vs. the compiled token matcher, on a synthetic corpus, with the keyword
+lists grown to show how each scales.
+
+Usage:
+    python benchmarks/bench_categorize.py [num_videos] [extra_keywords_per_category]
+"""
+import copy
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import category_engine
+
+def legacy_first_hit(text_content):
+    # The old loop: a padded string and an `in` check per keyword, first hit wins
+    for category, keywords in category_engine.CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            if f" {keyword} " in f" {text_content} ":
+                return category
+    return "Entertainment"
+
+def legacy_scores(text_content):
+    # The same scan extended to per-category scores (every keyword checked)
+    scores = {}
+    for category, keywords in category_engine.CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            if f" {keyword} " in f" {text_content} ":
+                scores[category] = scores.get(category, 0) + 1
+    return scores
+
+def make_corpus(n, keyword_rate=0.02, seed=42):
+    """Titles/descriptions/tags of pseudo-words with a sprinkling of real keywords."""
+    rnd = random.Random(seed)
+    vocabulary = ["".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(2, 9)))
+                  for _ in range(5000)]
+    keywords = [k for kws in category_engine.CATEGORY_KEYWORDS.values() for k in kws]
+
+    def words(count):
+        return " ".join(rnd.choice(keywords) if rnd.random() < keyword_rate else rnd.choice(vocabulary)
+                        for _ in range(count))
+
+    return [{'title': words(10), 'description': words(150), 'tags': words(8).split()} for _ in range(n)]
+
+def timed(label, fn, corpus):
+    start = time.perf_counter()
+    for video in corpus:
+        fn(video)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms  {len(corpus) / elapsed:10.0f} videos/s")
+    return elapsed
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    extra = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    corpus = make_corpus(n)
+    texts = [category_engine._text_content(v) for v in corpus]
+    original = copy.deepcopy(category_engine.CATEGORY_KEYWORDS)
+
+    for grow in sorted({0, extra}):
+        category_engine.CATEGORY_KEYWORDS.clear()
+        category_engine.CATEGORY_KEYWORDS.update(copy.deepcopy(original))
+        for category, keywords in category_engine.CATEGORY_KEYWORDS.items():
+            keywords.extend(f"{category.split()[0].lower()}kw{i}" for i in range(grow))
+        category_engine.keywords_changed()
+        total = sum(len(k) for k in category_engine.CATEGORY_KEYWORDS.values())
+        print(f"-- {total} keywords, {n} videos --")
+
+        build_start = time.perf_counter()
+        category_engine.get_matcher()
+        print(f"{'matcher build':<28} {(time.perf_counter() - build_start) * 1000:9.2f} ms")
+
+        timed("legacy scan, first hit", legacy_first_hit, texts)
+        legacy = timed("legacy scan, all scores", legacy_scores, texts)
+        compiled = timed("compiled matcher, all scores", lambda t: category_engine.score_categories(None, t), texts)
+        print(f"speedup (scores): {legacy / compiled:.1f}x")
@@ -0,0 +1,89 @@
+"""
+Benchmark: one full cycle through pipeline.run_cycle against the stub YouTube
+server, a fake AI model and a stub SMTP connection (each with simulated latency).
+Compares a stage-barrier run (whole fetch first, one AI batch at a time) with
+the streamed pipeline and prints per-stage timings for both.
+
+Usage:
+    python benchmarks/bench_cycle.py [num_regions] [api_latency] [ai_latency]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_analyzer
+import database
+import outbox
+import pipeline
+import youtube_client
+from fakes import FakeModel
+from stub_youtube_server import make_synthetic_recordings, start_stub_server
+
+class StubConnection:
+    """Stands in for email_sender.SMTPConnection."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.sent = []
+
+    def send(self, msg):
+        time.sleep(self.latency)
+        self.sent.append(msg['Subject'])
+
+    def close(self):
+        pass
+
+def run(label, regions, fetch_pages, ai_workers, ai_latency):
+    fake = FakeModel(latency=ai_latency, seed=1)
+    limiter = ai_analyzer.RateLimiter(0) # Unthrottled for the benchmark
+    def analyze(videos):
+        return ai_analyzer.analyze_videos_ai(videos, ai_model=fake, max_workers=1, limiter=limiter)
+
+    ai_analyzer.AI_MAX_WORKERS = ai_workers
+    mailer = StubConnection(0.05)
+    summary = pipeline.run_cycle(fetch_pages=fetch_pages, analyze=analyze,
+                                 deliver=lambda: outbox.deliver_due(mailer), recipient="bench@example.com")
+    t = summary['timings']
+    print(f"\n{label:<10} total={t['total'] * 1000:8.1f} ms  fetched={summary['fetched']} "
+          f"emailed={summary['emailed']} ai requests={fake.calls} emails={len(mailer.sent)}")
+    print("           " + "  ".join(f"{k}={v * 1000:.1f}ms" for k, v in t.items() if k != 'total'))
+    return summary
+
+if __name__ == "__main__":
+    num_regions = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    api_latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    ai_latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    regions = [f"R{i:02d}" for i in range(num_regions)]
+
+    recordings = make_synthetic_recordings(regions)
+    # Spread videos over several YouTube categories so every email section fills
+    category_ids = ["20", "28", "25", "27", "24"]
+    for body in recordings.values():
+        for i, item in enumerate(body["items"]):
+            item["snippet"]["categoryId"] = category_ids[i % len(category_ids)]
+
+    server, base_url = start_stub_server(recordings, latency=api_latency)
+    youtube_client.YOUTUBE_API_URL = base_url
+    workers = ai_analyzer.AI_MAX_WORKERS
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            database.DB_NAME = os.path.join(tmp, "barrier.db")
+            results['barrier'] = run("barrier", regions,
+                                     lambda: [youtube_client.fetch_trending_multi(regions)], 1, ai_latency)
+            database.close_db_connections()
+
+            database.DB_NAME = os.path.join(tmp, "pipelined.db")
+            results['pipelined'] = run("pipelined", regions,
+                                       lambda: youtube_client.iter_trending_pages(regions), workers, ai_latency)
+        finally:
+            server.shutdown()
+            database.close_db_connections()
+
+    # Both runs must pick the same videos to email
+    barrier, pipelined = results['barrier'], results['pipelined']
+    assert (barrier['fetched'], barrier['emailed']) == (pipelined['fetched'], pipelined['emailed']), "cycle mismatch"
+    print(f"\nspeedup {barrier['timings']['total'] / pipelined['timings']['total']:.2f}x")
@@ -0,0 +1,64 @@
+"""
+Micro-benchmark: per-row vs. batched persistence on a temp DB.
+
+Usage:
+    python benchmarks/bench_database.py [num_videos]
+"""
+import os
+import sys
+import tempfile
+import time
+
+# Allow running from the project root or from benchmarks/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+def make_videos(n):
+    return [{
+        'video_id': f"vid{i:08d}",
+        'title': f"Synthetic trending video {i}",
+        'channel_title': f"Channel {i % 500}",
+        'published_at': "2024-01-01T00:00:00Z",
+        'view_count': 1000 + i,
+        'like_count': 100 + i,
+        'comment_count': 10 + i,
+        'engagement_score': float(i),
+        'viral_probability': i % 100,
+        'trend_type': "Regular",
+        'thumbnail_url': "",
+        'duration': "PT5M",
+        'hours_since_upload': 1.0,
+        'category': "Entertainment",
+    } for i in range(n)]
+
+def run_per_row(videos):
+    for video in videos:
+        database.save_video(video)
+        database.is_video_sent(video['video_id'])
+    for video in videos:
+        database.mark_video_as_sent(video['video_id'])
+
+def run_batched(videos):
+    database.save_videos(videos)
+    database.get_sent_ids(v['video_id'] for v in videos)
+    database.mark_sent(v['video_id'] for v in videos)
+
+def bench(label, fn, videos):
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "bench.db")
+        database.init_db()
+        start = time.perf_counter()
+        fn(videos)
+        elapsed = time.perf_counter() - start
+        database.close_db_connections()
+    rate = len(videos) / elapsed if elapsed else float('inf')
+    print(f"{label:<10} {len(videos):>7} videos  {elapsed * 1000:9.1f} ms  {rate:12.0f} videos/s")
+    return elapsed
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    videos = make_videos(n)
+    per_row = bench("per-row", run_per_row, videos)
+    batched = bench("batched", run_batched, videos)
+    print(f"speedup: {per_row / batched:.1f}x")
@@ -0,0 +1,198 @@
+"""
+Benchmark: rendering the report email for many videos with the old f-string
+`+=` renderer vs. the precompiled templates (list + join, escaped), plus the
+plain-text part and a digest of several cycles. Also checks escaping.
+
+Usage:
+    python benchmarks/bench_email.py [num_videos] [repeats]
+"""
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import email_sender
+
+CATEGORIES = ["Gaming", "Technology", "News & Politics", "Entertainment", "Education", "Finance", "Shorts"]
+TREND_TYPES = ["🔥 Exploding", "🚀 Fast Rising", "📈 Steady Growth", "Regular"]
+
+def legacy_email_html(categories_data, total_videos):
+    """The f-string += renderer this module replaced (unescaped), kept as the baseline."""
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #121212; color: #ffffff; padding: 20px; }}
+            .container {{ max-width: 800px; margin: 0 auto; background-color: #1e1e1e; border-radius: 10px; overflow: hidden; }}
+            .header {{ background-color: #ff0000; padding: 20px; text-align: center; }}
+            .header h1 {{ margin: 0; color: white; }}
+            .stats {{ background-color: #2d2d2d; padding: 10px; text-align: center; font-size: 0.9em; }}
+            .category-section {{ padding: 20px; border-bottom: 1px solid #333; }}
+            .category-title {{ color: #ff4d4d; border-bottom: 2px solid #ff4d4d; padding-bottom: 5px; margin-bottom: 15px; }}
+            .video-card {{ background-color: #252525; margin-bottom: 15px; padding: 15px; border-radius: 8px; display: flex; gap: 15px; }}
+            .thumbnail {{ flex: 0 0 160px; }}
+            .thumbnail img {{ width: 100%; border-radius: 5px; }}
+            .content {{ flex: 1; }}
+            .video-title {{ margin: 0 0 5px 0; font-size: 1.1em; color: #4dabf7; text-decoration: none; display: block; }}
+            .channel {{ color: #aaa; font-size: 0.85em; margin-bottom: 8px; }}
+            .metrics {{ display: flex; gap: 15px; font-size: 0.85em; color: #ccc; margin-bottom: 10px; }}
+            .badge {{ padding: 3px 8px; border-radius: 4px; font-size: 0.75em; font-weight: bold; }}
+            .badge-exploding {{ background-color: #e03131; color: white; }}
+            .badge-rising {{ background-color: #f08c00; color: white; }}
+            .badge-steady {{ background-color: #2f9e44; color: white; }}
+            .badge-short {{ background-color: #1098ad; color: white; }}
+            .badge-news {{ background-color: #5c7cfa; color: white; }}
+            .badge-gaming {{ background-color: #be4bdb; color: white; }}
+            .ai-insight {{ background-color: #333; padding: 10px; border-radius: 5px; font-size: 0.9em; border-left: 3px solid #ffd43b; }}
+            .footer {{ text-align: center; padding: 20px; color: #666; font-size: 0.8em; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>🚀 YouTube Viral Pulse</h1>
+            </div>
+            <div class="stats">
+                Region: IN | Videos Analyzed: {total_videos} | Time: {timestamp}
+            </div>
+    """
+    
+    if not categories_data:
+        html += """
+        <div style="padding: 40px; text-align: center; color: #888;">
+            <h3>No significant viral spikes detected in this cycle.</h3>
+            <p>Monitoring continues...</p>
+        </div>
+        """
+    else:
+        for category, videos in categories_data.items():
+            if not videos: continue
+            
+            html += f"""
+            <div class="category-section">
+                <h2 class="category-title">{category}</h2>
+            """
+            
+            for idx, video in enumerate(videos):
+                # Badge Logic
+                trend_type = video.get('trend_type', 'Regular')
+                badge_class = 'badge-steady'
+                if 'Exploding' in trend_type: badge_class = 'badge-exploding'
+                elif 'Fast' in trend_type: badge_class = 'badge-rising'
+                elif 'Short' in trend_type: badge_class = 'badge-short'
+                elif 'Gaming' in trend_type: badge_class = 'badge-gaming'
+                elif 'News' in trend_type: badge_class = 'badge-news'
+                
+                # AI Insights
+                ai_data = video.get('ai_analysis', {})
+                why_trending = ai_data.get('why_trending', 'N/A')
+                viral_score = ai_data.get('viral_score', 0)
+                
+                leader_tag = '<span style="color:#ffd43b;">👑 Category Leader</span><br>' if idx == 0 else ''
+                
+                html += f"""
+                <div class="video-card">
+                    <div class="thumbnail">
+                        <a href="https://youtu.be/{video['video_id']}">
+                            <img src="{video['thumbnail_url']}" alt="Thumbnail">
+                        </a>
+                    </div>
+                    <div class="content">
+                        {leader_tag}
+                        <a href="https://youtu.be/{video['video_id']}" class="video-title">{video['title']}</a>
+                        <div class="channel">{video['channel_title']}</div>
+                        
+                        <div class="metrics">
+                            <span>👀 {video['view_count']:,}</span>
+                            <span>👍 {video['like_count']:,}</span>
+                            <span>💬 {video['comment_count']:,}</span>
+                            <span>⚡ Score: {int(video.get('engagement_score', 0))}</span>
+                        </div>
+                        
+                        <div style="margin-bottom: 8px;">
+                            <span class="badge {badge_class}">{trend_type}</span>
+                            <span class="badge" style="background-color: #444;">Viral Prob: {viral_score}%</span>
+                        </div>
+                        
+                        <div class="ai-insight">
+                            <strong>AI Insight:</strong> {why_trending}<br>
+                            <small>Trigger: {ai_data.get('emotional_trigger', 'N/A')} | Audience: {ai_data.get('target_audience', 'N/A')}</small>
+                        </div>
+                    </div>
+                </div>
+                """
+            html += "</div>"
+            
+    html += """
+            <div class="footer">
+                Automated Report by Autonomous Real-Time YouTube Trend Intelligence System
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    return html
+
+
+def make_selection(num_videos, cycle=0):
+    selection = {cat: [] for cat in CATEGORIES}
+    for i in range(num_videos):
+        selection[CATEGORIES[i % len(CATEGORIES)]].append({
+            'video_id': f"vid{i:08d}",
+            'title': f"Video {i} <b>\"quoted\"</b> & more " + "x" * 40,
+            'channel_title': f"Channel {i % 50}",
+            'thumbnail_url': f"https://i.ytimg.com/vi/vid{i:08d}/hqdefault.jpg",
+            'view_count': 1000 * i + cycle, 'like_count': 10 * i, 'comment_count': i,
+            'engagement_score': (i * 37 + cycle) % 100,
+            'trend_type': TREND_TYPES[i % len(TREND_TYPES)],
+            'ai_analysis': {'viral_score': i % 100, 'why_trending': "Because " * 20,
+                            'emotional_trigger': "Curiosity", 'target_audience': "Gen Z"},
+        })
+    return selection
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - start) / repeats * 1000, result
+
+if __name__ == "__main__":
+    num_videos = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    selection = make_selection(num_videos)
+
+    legacy_ms, legacy_html = timed(lambda: legacy_email_html(selection, num_videos), repeats)
+    new_ms, html = timed(lambda: email_sender.generate_viral_email_html(selection, num_videos), repeats)
+    text_ms, text = timed(lambda: email_sender.generate_viral_email_text(selection, num_videos), repeats)
+    print(f"{num_videos} videos")
+    print(f"legacy f-string +=     {legacy_ms:8.2f} ms  {len(legacy_html) / 1024:8.1f} KiB (unescaped)")
+    print(f"templates (html)       {new_ms:8.2f} ms  {len(html) / 1024:8.1f} KiB")
+    print(f"templates (plain text) {text_ms:8.2f} ms  {len(text) / 1024:8.1f} KiB")
+
+    assert "<b>" in legacy_html and "<b>" not in html and "&lt;b&gt;" in html, "titles not escaped"
+    assert html.count('class="video-card"') == num_videos and text.count("https://youtu.be/") == num_videos
+
+    # Digest: 6 cycles, overlapping selections, one email
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "digest.db")
+        database.init_db()
+        email_sender.EMAIL_DIGEST_CYCLES = 6
+        start = time.perf_counter()
+        for cycle in range(6):
+            delivered = email_sender.add_to_digest(make_selection(35 + cycle * 5, cycle), 200,
+                                                   recipient="bench@example.com")
+        elapsed = (time.perf_counter() - start) * 1000
+        sent = [m['html'] for m in database.claim_due_emails(10, 60)]
+        cards = sent[0].count('class="video-card"') if sent else 0
+        print(f"digest of 6 cycles     {elapsed:8.2f} ms  emails queued={len(sent)}  unique videos={cards}  "
+              f"pending={len(database.get_digest_entries())}")
+        assert delivered and len(sent) == 1 and cards == 35 + 5 * 5, "digest did not merge cycles"
+        database.close_db_connections()
@@ -0,0 +1,108 @@
+"""
+Benchmark: several whole cycles (fetch -> metrics -> AI -> outbox -> mail)
+through pipeline.run_cycle with every external service on its fake backend
+(backends.py / fakes.py), so no API keys or network are needed. Prints stage
+timings, quota, AI requests and emails per cycle.
+
+A second run turns on fetch, AI and mail errors with a daily quota too small
+for all cycles, and checks the app degrades the way it should: cycles finish,
+quota is never overspent, and every queued email is delivered by the retries.
+
+Usage:
+    python benchmarks/bench_end_to_end.py [cycles] [num_regions] [subscribers]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_analyzer
+import backends
+import database
+import outbox
+import pipeline
+import youtube_client
+
+CATEGORIES = ["Gaming", "Tech & AI", "News & Politics", "Education", "Entertainment"]
+
+def use_fakes(fetch_error=0.0, ai_error=0.0, mail_error=0.0):
+    backends.FETCH_BACKEND = backends.AI_BACKEND = backends.MAIL_BACKEND = "fake"
+    backends.FAKE_FETCH_LATENCY, backends.FAKE_AI_LATENCY, backends.FAKE_MAIL_LATENCY = 0.02, 0.05, 0.002
+    backends.FAKE_FETCH_ERROR_RATE = fetch_error
+    backends.FAKE_AI_ERROR_RATE = ai_error
+    backends.FAKE_MAIL_ERROR_RATE = mail_error
+    backends._fake_fetcher = backends._fake_mailer = ai_analyzer._model = None
+
+def add_subscribers(count):
+    for i in range(count):
+        database.upsert_subscriber(f"user{i}@example.com", categories=[CATEGORIES[i % len(CATEGORIES)]],
+                                   min_viral_probability=(i % 3) * 20)
+
+def run_cycles(label, cycles, subscribers):
+    database.init_db()
+    add_subscribers(subscribers)
+    fetcher, mailer = backends.get_fetcher(), backends.create_mail_connection()
+    print(f"\n{label}")
+    summaries = []
+    for n in range(cycles):
+        model = ai_analyzer.get_model()
+        calls, sent = model.calls, len(mailer.sent)
+        summary = pipeline.run_cycle(deliver=outbox.deliver_due, recipient="owner@example.com")
+        t = summary['timings']
+        print(f"  cycle {n + 1}: total={t['total'] * 1000:7.1f} ms  fetched={summary['fetched']:4d} "
+              f"emailed={summary['emailed']:3d} quota={summary['quota_used']:3d} "
+              f"ai requests={model.calls - calls:3d} mails sent={len(mailer.sent) - sent:3d}")
+        print("           " + "  ".join(f"{k}={v * 1000:.1f}ms" for k, v in t.items() if k != 'total'))
+        summaries.append(summary)
+    print(f"  fetch requests={fetcher.requests} errors={fetcher.errors}  "
+          f"ai failures={ai_analyzer.get_model().failures}  mail failures={mailer.failures}  "
+          f"outbox={database.get_outbox_counts()}")
+    return summaries, mailer
+
+if __name__ == "__main__":
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    num_regions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    subscribers = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    os.environ["REGION_CODES"] = ",".join(f"R{i:02d}" for i in range(num_regions))
+    ai_analyzer.rate_limiter = ai_analyzer.RateLimiter(0) # Unthrottled for the benchmark
+    ai_analyzer.AI_BACKOFF_BASE = 0.01
+
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            database.DB_NAME = os.path.join(tmp, "clean.db")
+            use_fakes()
+            start = time.perf_counter()
+            clean, mailer = run_cycles(f"{cycles} cycles, {num_regions} regions, {subscribers} subscribers",
+                                       cycles, subscribers)
+            print(f"  wall {time.perf_counter() - start:.2f} s")
+            assert clean[0]['fetched'] > 0 and clean[0]['emailed'] > 0, "first cycle found nothing to email"
+            conn = database.get_db_connection()
+            sent_videos = conn.execute('SELECT COUNT(*) FROM videos WHERE is_sent = 1').fetchone()[0]
+            assert sent_videos == sum(s['emailed'] for s in clean), "a video was emailed twice"
+            assert database.get_outbox_counts() == {'sent': len(mailer.sent)}
+            database.close_db_connections()
+
+            # Errors everywhere and quota for about a cycle and a half
+            database.DB_NAME = os.path.join(tmp, "faulty.db")
+            use_fakes(fetch_error=0.1, ai_error=0.2, mail_error=0.2)
+            pages_per_cycle = num_regions * -(-backends.FAKE_VIDEOS_PER_CHART // youtube_client.IDS_PER_REQUEST)
+            youtube_client.DAILY_QUOTA = int(pages_per_cycle * 1.5)
+            faulty, mailer = run_cycles(f"faulty: 10% fetch / 20% AI / 20% mail errors, "
+                                        f"quota {youtube_client.DAILY_QUOTA} units", cycles, subscribers)
+            used = database.get_quota_used(youtube_client.quota_day())
+            assert used <= youtube_client.DAILY_QUOTA, f"quota overspent: {used}"
+            assert cycles < 3 or faulty[-1]['fetched'] == 0, "fetched past the quota"
+
+            # Retries with backoff deliver everything that was queued
+            offset = 0
+            for _ in range(outbox.EMAIL_MAX_ATTEMPTS):
+                offset += outbox.EMAIL_RETRY_MAX
+                outbox.deliver_due(clock=lambda: time.time() + offset)
+            counts = database.get_outbox_counts()
+            print(f"  after retries: outbox={counts} mail failures={mailer.failures}")
+            assert set(counts) == {'sent'} and counts['sent'] == len(mailer.sent), "emails left undelivered"
+        finally:
+            database.close_db_connections()
+    print("\nOK")
@@ -0,0 +1,103 @@
+"""
+Benchmark: queuing one cycle's report for many subscribers. The naive way
+filters the selection and renders a full report per subscriber; FanOut
+renders each (category, filters) section once and shares whole bodies
+between subscribers with the same filters. Also compares outbox size with
+and without shared bodies, and checks every subscriber gets the same
+videos either way.
+
+Usage:
+    python benchmarks/bench_fanout.py [subscribers] [filter_sets] [videos]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import email_sender
+from bench_email import CATEGORIES, make_selection
+
+REGIONS = ["IN", "US", "GB", "BR", "JP"]
+
+def make_subscribers(count, filter_sets, seed=1):
+    rng = random.Random(seed)
+    filters = [
+        {
+            'categories': rng.sample(CATEGORIES, rng.randint(1, 4)) if rng.random() < 0.7 else None,
+            'regions': rng.sample(REGIONS, rng.randint(1, 2)) if rng.random() < 0.5 else None,
+            'trend_types': ["Exploding", "Fast Rising"] if rng.random() < 0.3 else None,
+            'min_viral_probability': rng.choice([0, 0, 30, 60]),
+        }
+        for _ in range(filter_sets)
+    ]
+    return [{'email': f"user{i}@example.com", **filters[i % filter_sets]} for i in range(count)]
+
+def naive_messages(selection, total, subscribers, subject):
+    messages = []
+    for sub in subscribers:
+        filtered = {
+            cat: [v for v in videos if email_sender.video_matches(
+                v, sub['regions'], sub['trend_types'], sub['min_viral_probability'])]
+            for cat, videos in selection.items()
+            if not sub['categories'] or cat in sub['categories']
+        }
+        if not any(filtered.values()):
+            continue
+        messages.append({
+            'key': email_sender.message_key('naive', sub['email']), 'recipient': sub['email'], 'subject': subject,
+            'html': email_sender.generate_viral_email_html(filtered, total),
+            'text': email_sender.generate_viral_email_text(filtered, total),
+        })
+    return messages
+
+def card_ids(html):
+    return [part.split('"', 1)[0] for part in html.split('href="https://youtu.be/')[1::2]]
+
+if __name__ == "__main__":
+    num_subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    filter_sets = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    num_videos = int(sys.argv[3]) if len(sys.argv) > 3 else 35
+
+    selection = make_selection(num_videos)
+    for i, video in enumerate(v for videos in selection.values() for v in videos):
+        video['regions'] = [REGIONS[i % len(REGIONS)]]
+        video['viral_probability'] = (i * 17) % 100
+    subscribers = make_subscribers(num_subscribers, filter_sets)
+    subject = "Viral Trend Alert"
+    print(f"{num_subscribers} subscribers, {filter_sets} distinct filter sets, {num_videos} videos")
+
+    start = time.perf_counter()
+    naive = naive_messages(selection, 200, subscribers, subject)
+    naive_ms = (time.perf_counter() - start) * 1000
+    print(f"render per subscriber   {naive_ms:9.1f} ms  messages={len(naive)}")
+
+    start = time.perf_counter()
+    fanout = email_sender.FanOut(selection, 200)
+    shared = email_sender.build_alert_messages(fanout, subscribers, subject, ('bench',))
+    fanout_ms = (time.perf_counter() - start) * 1000
+    print(f"fan-out                 {fanout_ms:9.1f} ms  messages={len(shared)}  "
+          f"sections rendered={fanout.section_renders}  bodies={len({m['body_id'] for m in shared})}")
+    print(f"speedup {naive_ms / fanout_ms:.1f}x")
+
+    # Same recipients, same videos in the same order
+    assert [m['recipient'] for m in naive] == [m['recipient'] for m in shared], "recipients differ"
+    for a, b in zip(naive, shared):
+        assert card_ids(a['html']) == card_ids(b['html']), f"videos differ for {a['recipient']}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, messages in (("bodies per message", naive), ("shared bodies", shared)):
+            database.DB_NAME = os.path.join(tmp, label.replace(" ", "_") + ".db")
+            database.init_db()
+            start = time.perf_counter()
+            queued = database.enqueue_emails(messages)
+            queue_ms = (time.perf_counter() - start) * 1000
+            database.get_db_connection().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            size = os.path.getsize(database.DB_NAME) / 1024 / 1024
+            claimed = database.claim_due_emails(5, 60)
+            assert queued == len(messages) and all(m['html'].startswith("<!DOCTYPE") for m in claimed)
+            print(f"outbox, {label:<18} {queue_ms:7.1f} ms  {size:6.1f} MiB")
+            database.close_db_connections()
@@ -0,0 +1,74 @@
+"""
+Benchmark: a burst of concurrent cycle triggers from several threads and
+processes sharing one DB. Every trigger should coalesce into a single job run
+(a fake cycle that sleeps) with no overlap.
+
+Usage:
+    python benchmarks/bench_jobs.py [triggers_per_process] [processes] [cycle_seconds]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import jobs
+
+def trigger_burst(db_name, triggers, cycle_seconds, runs_file):
+    database.DB_NAME = db_name
+    jobs.OWNER = f"bench:{os.getpid()}"
+
+    def fake_cycle():
+        with open(runs_file, "a") as f:
+            f.write(f"start {time.time()} {os.getpid()}\n")
+        time.sleep(cycle_seconds)
+        with open(runs_file, "a") as f:
+            f.write(f"end {time.time()} {os.getpid()}\n")
+        return {"fake": True}
+
+    def trigger():
+        jobs.request_cycle("bench")
+        jobs.run_pending(run=fake_cycle)
+
+    threads = [threading.Thread(target=trigger) for _ in range(triggers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    database.close_db_connections()
+
+if __name__ == "__main__":
+    triggers = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    cycle_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "jobs.db")
+        database.init_db()
+        runs_file = os.path.join(tmp, "runs.log")
+        open(runs_file, "w").close()
+
+        start = time.perf_counter()
+        procs = [multiprocessing.Process(target=trigger_burst, args=(database.DB_NAME, triggers, cycle_seconds, runs_file))
+                 for _ in range(processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        events = [line.split() for line in open(runs_file)]
+        starts = sorted(float(t) for kind, t, _ in events if kind == "start")
+        ends = sorted(float(t) for kind, t, _ in events if kind == "end")
+        overlaps = sum(1 for s, e in zip(starts[1:], ends) if s < e)
+        rows = database.get_db_connection().execute(
+            "SELECT status, COUNT(*) AS n FROM cycle_jobs GROUP BY status").fetchall()
+        database.close_db_connections()
+
+    print(f"{triggers * processes} triggers from {processes} processes in {elapsed * 1000:.1f} ms -> "
+          f"{len(starts)} cycle run(s), overlaps={overlaps}, jobs={ {r['status']: r['n'] for r in rows} }")
+    assert overlaps == 0, "cycles overlapped"
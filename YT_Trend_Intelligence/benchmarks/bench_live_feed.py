@@ -0,0 +1,98 @@
+"""
+Benchmark: dashboards polling /trends vs. the live feed broadcaster. Each
+simulated cycle re-scores part of the DB; polling costs one query + one full
+JSON encode per client, the broadcaster one query + one delta encode shared by
+all clients. Also checks that replaying the deltas reproduces the list.
+
+Usage:
+    python benchmarks/bench_live_feed.py [clients] [cycles] [num_videos]
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import live_feed
+
+def make_video(i, rnd):
+    return {
+        'video_id': f"vid{i:06d}", 'title': f"Video {i}", 'channel_title': "Channel",
+        'published_at': "2024-01-01T00:00:00Z", 'view_count': rnd.randint(1000, 10**7),
+        'like_count': rnd.randint(10, 10**5), 'comment_count': rnd.randint(0, 10**4),
+        'engagement_score': rnd.random() * 100, 'viral_probability': rnd.randint(0, 100),
+        'trend_type': "Regular", 'category': "Entertainment", 'view_velocity': None,
+    }
+
+def apply_delta(state, delta):
+    """Client-side replay: state is {video_id: row}."""
+    for vid in delta['removed']:
+        state.pop(vid, None)
+    for row in delta['new']:
+        state[row['video_id']] = dict(row)
+    for move in delta['moved']:
+        state[move['video_id']]['rank'] = move['rank']
+    for change in delta['rescored']:
+        state[change['video_id']].update(change)
+
+if __name__ == "__main__":
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    num_videos = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    rnd = random.Random(7)
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "live.db")
+        database.init_db()
+        videos = [make_video(i, rnd) for i in range(num_videos)]
+        database.save_videos(videos)
+
+        broadcaster = live_feed.Broadcaster(client_queue=cycles + 2)
+        broadcaster.refresh()
+        queues = [broadcaster.subscribe(loop) for _ in range(clients)]
+        replay = {vid: dict(row) for vid, row in broadcaster.rows.items()}
+
+        poll_time = push_time = 0.0
+        poll_bytes = push_bytes = 0
+        for _ in range(cycles):
+            for video in rnd.sample(videos, num_videos // 10):
+                video['engagement_score'] = rnd.random() * 100
+                video['view_count'] += rnd.randint(0, 10**5)
+            database.save_videos(videos)
+
+            start = time.perf_counter()
+            for _ in range(clients):
+                body = json.dumps([dict(row) for row in database.get_trending_videos(limit=live_feed.LIVE_FEED_TOP_N)])
+                poll_bytes += len(body)
+            poll_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            delta = broadcaster.refresh()
+            push_time += time.perf_counter() - start
+            if delta:
+                apply_delta(replay, delta)
+                push_bytes += clients * len(json.dumps(delta))
+
+        time.sleep(0.2) # let the loop drain call_soon_threadsafe callbacks
+        received = sum(q.qsize() for q, _ in queues)
+        loop.call_soon_threadsafe(loop.stop)
+        final = {vid: row for vid, row in broadcaster.rows.items()}
+        database.close_db_connections()
+
+    mismatched = [vid for vid in final if replay.get(vid, {}).get('rank') != final[vid]['rank']
+                  or replay[vid]['engagement_score'] != final[vid]['engagement_score']]
+    print(f"{clients} clients, {cycles} cycles, top {live_feed.LIVE_FEED_TOP_N} of {num_videos}")
+    print(f"polling    {poll_time * 1000:9.1f} ms  DB reads={clients * cycles:<6} bytes sent={poll_bytes}")
+    print(f"broadcast  {push_time * 1000:9.1f} ms  DB reads={cycles:<6} bytes sent={push_bytes} "
+          f"(messages queued={received})")
+    assert not mismatched and len(replay) == len(final), "delta replay diverged from the published list"
+    print("delta replay matches the published list")
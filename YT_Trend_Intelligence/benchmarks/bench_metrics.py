@@ -0,0 +1,79 @@
+"""
+Parity check + benchmark: scalar metrics_engine.analyze_video_metrics vs. the
+vectorized analyze_metrics_batch over columnar NumPy arrays.
+
+Usage:
+    python benchmarks/bench_metrics.py [num_videos]
+"""
+import copy
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics_engine
+
+CATEGORIES = ["Gaming", "Technology", "News & Politics", "Entertainment", "Education", "Finance", "Shorts"]
+
+def make_videos(n, now, seed=42):
+    rnd = random.Random(seed)
+    videos = []
+    for i in range(n):
+        published = now - datetime.timedelta(seconds=rnd.randint(-600, 7 * 24 * 3600))
+        videos.append({
+            'video_id': f"vid{i:07d}",
+            'published_at': published.strftime("%Y-%m-%dT%H:%M:%SZ") if i % 97 else "not-a-date",
+            'view_count': int(10 ** rnd.uniform(2, 8)),
+            'like_count': int(10 ** rnd.uniform(1, 6)),
+            'comment_count': int(10 ** rnd.uniform(0, 5)),
+            'category': rnd.choice(CATEGORIES),
+            'captured_at': int(now.timestamp()),
+        })
+    snapshots = {
+        v['video_id']: {'captured_at': v['captured_at'] - 1800, 'views': int(v['view_count'] * rnd.uniform(0.5, 1))}
+        for v in videos if rnd.random() < 0.5
+    }
+    return videos, snapshots
+
+def check_parity(videos, snapshots, now):
+    scalar = [metrics_engine.analyze_video_metrics(copy.copy(v), snapshots.get(v['video_id']), now) for v in videos]
+    batch = metrics_engine.analyze_videos_metrics([copy.copy(v) for v in videos], snapshots, now)
+    keys = ('hours_since_upload', 'engagement_score', 'viral_probability', 'view_velocity', 'trend_type')
+    mismatches = 0
+    for s, b in zip(scalar, batch):
+        mismatches += any(s[k] != b[k] for k in keys)
+    return mismatches
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    now = datetime.datetime.now(datetime.timezone.utc)
+    videos, snapshots = make_videos(n, now)
+
+    mismatches = check_parity(videos, snapshots, now)
+    print(f"parity: {n - mismatches}/{n} videos identical")
+    if mismatches:
+        sys.exit(1)
+
+    start = time.perf_counter()
+    for v in videos:
+        metrics_engine.analyze_video_metrics(v, snapshots.get(v['video_id']))
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    metrics_engine.analyze_videos_metrics(videos, snapshots, now)
+    batch_dicts = time.perf_counter() - start
+
+    columns = (
+        [v['view_count'] for v in videos], [v['like_count'] for v in videos],
+        [v['comment_count'] for v in videos], metrics_engine.parse_published_at(v['published_at'] for v in videos),
+    )
+    start = time.perf_counter()
+    metrics_engine.analyze_metrics_batch(*columns, categories=[v['category'] for v in videos], now=now)
+    batch_columns = time.perf_counter() - start
+
+    print(f"scalar (per dict)        {scalar * 1000:9.1f} ms")
+    print(f"batch  (dicts in/out)    {batch_dicts * 1000:9.1f} ms  {scalar / batch_dicts:5.1f}x")
+    print(f"batch  (columnar arrays) {batch_columns * 1000:9.1f} ms  {scalar / batch_columns:5.1f}x")
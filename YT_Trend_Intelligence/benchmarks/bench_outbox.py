@@ -0,0 +1,165 @@
+"""
+Benchmark: delivering queued emails through the outbox over one reused SMTP
+connection vs. the old connect-and-login per message, against a local
+debugging SMTP server with simulated handshake latency. Also checks retries
+with backoff, a server that is down, idempotency keys and reclaiming
+messages left behind by a crashed sender.
+
+Usage:
+    python benchmarks/bench_outbox.py [recipients] [messages_each] [handshake_latency]
+"""
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import email_sender
+import outbox
+
+class DebugSMTPServer(socketserver.ThreadingTCPServer):
+    """Just enough SMTP to accept mail; counts connections and messages."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_latency):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.handshake_latency = handshake_latency
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []
+        self.fail_next = 0 # DATA commands to answer with 451
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.handshake_latency) # TLS + AUTH round trips on a real server
+        self.reply("220 debug ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 debug")
+            elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk in (b".\r\n", b""):
+                        break
+                    data.append(chunk)
+                with server.lock:
+                    failing = server.fail_next > 0
+                    if failing:
+                        server.fail_next -= 1
+                    else:
+                        server.messages.append(b"".join(data))
+                self.reply("451 Try again later" if failing else "250 Queued")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Not implemented")
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+def queue(count, recipients, tag):
+    messages = [
+        {'key': email_sender.message_key(tag, i, r), 'recipient': f"user{r}@example.com",
+         'subject': f"{tag} {i}", 'html': f"<p>{tag} {i}</p>", 'text': f"{tag} {i}"}
+        for i in range(count) for r in range(recipients)
+    ]
+    return database.enqueue_emails(messages)
+
+if __name__ == "__main__":
+    recipients = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    per_recipient = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    handshake = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    total = recipients * per_recipient
+
+    server = DebugSMTPServer(handshake)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    email_sender.SMTP_HOST, email_sender.SMTP_PORT = server.server_address
+    email_sender.SMTP_SSL = False
+    email_sender.EMAIL_USER = "bot@example.com"
+    email_sender.EMAIL_PASSWORD = None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "outbox.db")
+        database.init_db()
+        try:
+            # Old behaviour: a new connection (and login) per message
+            start = time.perf_counter()
+            for i in range(total):
+                email_sender.send_email(f"direct {i}", f"<p>{i}</p>", f"user{i % recipients}@example.com", f"{i}")
+            direct_ms = (time.perf_counter() - start) * 1000
+            direct_connections = server.connections
+            print(f"{total} messages to {recipients} recipients, {handshake * 1000:.0f} ms handshake")
+            print(f"connection per message   {direct_ms:8.1f} ms  connections={direct_connections}")
+
+            # Outbox: queued in one transaction, then delivered over one connection
+            assert queue(per_recipient, recipients, "outbox") == total
+            assert queue(per_recipient, recipients, "outbox") == 0, "idempotency key did not dedupe"
+            start = time.perf_counter()
+            counts = outbox.deliver_due()
+            outbox_ms = (time.perf_counter() - start) * 1000
+            outbox_connections = server.connections - direct_connections
+            print(f"outbox, one connection   {outbox_ms:8.1f} ms  connections={outbox_connections}  {counts}")
+            assert counts['sent'] == total and outbox_connections == 1, "outbox did not reuse the connection"
+            print(f"speedup {direct_ms / outbox_ms:.1f}x")
+
+            # Temporary failures: backoff, then delivered
+            server.fail_next = 2
+            queue(3, 1, "retry")
+            clock = FakeClock()
+            first = outbox.deliver_due(clock=clock)
+            clock.now += outbox.retry_delay(1) - 1
+            early = outbox.deliver_due(clock=clock)
+            clock.now += 1
+            second = outbox.deliver_due(clock=clock)
+            print(f"451 twice                first={first} before backoff={early} after={second}")
+            assert first == {'sent': 1, 'retry': 2, 'failed': 0} and early['sent'] == 0 and second['sent'] == 2
+
+            # Server down: the whole round is rescheduled after one failed connect
+            email_sender.SMTP_PORT = 1
+            queue(5, 1, "down")
+            clock.now = max(clock.now, time.time())
+            down = outbox.deliver_due(clock=clock)
+            email_sender.SMTP_PORT = server.server_address[1]
+            clock.now += outbox.retry_delay(1)
+            recovered = outbox.deliver_due(clock=clock)
+            print(f"server down              {down}, then {recovered}")
+            assert down['retry'] == 5 and recovered['sent'] == 5
+
+            # A sender that died mid-round: its claims are picked up after the timeout
+            queue(2, 1, "crash")
+            clock.now = max(clock.now, time.time())
+            claimed = database.claim_due_emails(10, outbox.OUTBOX_CLAIM_TIMEOUT, clock())
+            clock.now += outbox.OUTBOX_CLAIM_TIMEOUT + 1
+            reclaimed = outbox.deliver_due(clock=clock)
+            print(f"crashed sender           claimed={len(claimed)} reclaimed={reclaimed}")
+            assert reclaimed['sent'] == 2
+
+            print(f"outbox {database.get_outbox_counts()}")
+            assert database.get_outbox_counts() == {'sent': total + 3 + 5 + 2}
+        finally:
+            server.shutdown()
+            database.close_db_connections()
@@ -0,0 +1,100 @@
+"""
+Benchmark: dashboard refreshes of /trends, /stats and /reports served by
+query + dict + JSON encode every time vs. the response cache (pre-serialized
+bytes, dropped when a write bumps the data generation). A cycle write lands
+every `write_every` requests. Also checks cached bodies match fresh ones.
+
+Usage:
+    python benchmarks/bench_response_cache.py [requests] [write_every] [num_videos]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from response_cache import ResponseCache
+
+def make_video(i, rnd):
+    return {
+        'video_id': f"vid{i:06d}", 'title': f"Video {i}", 'channel_title': "Channel",
+        'published_at': "2024-01-01T00:00:00Z", 'view_count': rnd.randint(1000, 10**7),
+        'like_count': rnd.randint(10, 10**5), 'comment_count': rnd.randint(0, 10**4),
+        'engagement_score': rnd.random() * 100, 'viral_probability': rnd.randint(0, 100),
+        'trend_type': "Regular", 'category': rnd.choice(["Gaming", "Technology", "Entertainment"]),
+    }
+
+def builders():
+    def trends(category):
+        return lambda: ([dict(r) for r in database.get_trending_videos(limit=50, category=category)], {})
+
+    def stats():
+        stats = database.get_stats_aggregates()
+        return {"total_analyzed": stats['total'], "emails_sent": stats['sent'],
+                "virality_rate": stats['virality']['24h']['rate'], "virality": stats['virality'],
+                "by_category": stats['by_category'], "by_trend_type": stats['by_trend_type'],
+                "bot_active": database.is_bot_active()}, {}
+
+    def reports():
+        rows = database.get_db_connection().execute(
+            'SELECT * FROM videos WHERE is_sent = 1 ORDER BY timestamp DESC LIMIT 20').fetchall()
+        return [dict(r) for r in rows], {}
+
+    return {
+        ("trends", None): trends(None), ("trends", "Gaming"): trends("Gaming"),
+        ("trends", "Technology"): trends("Technology"), ("stats",): stats, ("reports",): reports,
+    }
+
+def run(label, requests, write_every, videos, cache, rnd):
+    endpoints = builders()
+    keys = list(endpoints)
+    start = time.perf_counter()
+    sent = 0
+    for i in range(requests):
+        if i and i % write_every == 0:
+            for video in rnd.sample(videos, 50):
+                video['engagement_score'] = rnd.random() * 100
+            database.save_videos(videos[:200])
+            database.mark_sent([videos[i % len(videos)]['video_id']])
+        key = rnd.choice(keys)
+        if cache is None:
+            data, _ = endpoints[key]()
+            body = json.dumps(data).encode()
+        else:
+            body = cache.get_or_build(key, endpoints[key]).body
+        sent += len(body)
+    elapsed = time.perf_counter() - start
+    extra = f"hits={cache.hits} misses={cache.misses}" if cache else ""
+    print(f"{label:<10} {elapsed * 1000:9.1f} ms  {requests / elapsed:9.0f} req/s  {extra}")
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    write_every = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    num_videos = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for label in ("uncached", "cached"):
+            rnd = random.Random(3)
+            database.DB_NAME = os.path.join(tmp, f"{label}.db")
+            database.init_db()
+            videos = [make_video(i, rnd) for i in range(num_videos)]
+            database.save_videos(videos)
+            database.mark_sent(v['video_id'] for v in videos[:100])
+            # check_seconds=0: re-read the generation on every request, so no stale reads at all
+            cache = ResponseCache(check_seconds=0) if label == "cached" else None
+            run(label, requests, write_every, videos, cache, rnd)
+
+        # Freshness: after a write the cache must serve the new data
+        cache = ResponseCache(check_seconds=0)
+        key, build = ("trends", None), builders()[("trends", None)]
+        before = cache.get_or_build(key, build)
+        database.save_videos([dict(videos[0], engagement_score=1000.0)])
+        after = cache.get_or_build(key, build)
+        assert before.etag != after.etag and after.body == json.dumps(build()[0]).encode(), "stale cache entry"
+        print("cache invalidated on write; cached body matches a fresh build")
+        database.close_db_connections()
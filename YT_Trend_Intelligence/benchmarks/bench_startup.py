@@ -0,0 +1,92 @@
+"""
+Benchmark: import cost of the API process, measured with `python -X
+importtime` in fresh interpreters with no API keys set. Counts only modules
+loaded on top of what the web stack imports anyway (FastAPI, or asyncio when
+FastAPI is not installed), fails if that exceeds the budget, and fails if
+any module that should load lazily (AI SDK, NumPy, SMTP, the cycle pipeline)
+is imported.
+
+Without FastAPI the API's own top-level imports are measured instead of api.py.
+
+Usage:
+    python benchmarks/bench_startup.py [budget_ms] [runs]
+"""
+import ast
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy or side-effecting modules the API must not need to start
+LAZY_MODULES = (
+    "google.generativeai", "numpy", "urllib.request", "smtplib",
+    "pipeline", "jobs", "outbox", "email_sender",
+)
+SECRETS = ("GEMINI_API_KEY", "YOUTUBE_API_KEY", "EMAIL_USER", "EMAIL_PASSWORD")
+
+def api_local_imports():
+    """Top-level imports in api.py that are modules of this app."""
+    with open(os.path.join(APP_DIR, "api.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.append(node.module)
+    return [n for n in dict.fromkeys(names) if os.path.exists(os.path.join(APP_DIR, n + ".py"))]
+
+def import_times(statement):
+    """{module: self microseconds} for one fresh interpreter running statement."""
+    env = {k: v for k, v in os.environ.items() if k not in SECRETS}
+    env["DB_NAME"] = os.devnull # nothing may touch a database at import time
+    check = f"{statement}; import sys; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", check], cwd=APP_DIR, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"import failed:\n{proc.stderr[-2000:]}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.split("|")
+        times[name.strip()] = int(self_us.split(":")[1])
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return times, loaded
+
+def median_cost(baseline, statement, runs):
+    costs, loaded = [], []
+    for _ in range(runs):
+        base, _ = import_times(baseline)
+        full, loaded = import_times(f"{baseline}; {statement}")
+        extra = {m: us for m, us in full.items() if m not in base}
+        costs.append((sum(extra.values()) / 1000, extra))
+    costs.sort(key=lambda c: c[0])
+    return costs[len(costs) // 2], loaded
+
+if __name__ == "__main__":
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else float(os.getenv("STARTUP_BUDGET_MS", "40"))
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    try:
+        import fastapi # noqa: F401
+        baseline, target = "import fastapi, fastapi.responses, fastapi.middleware.cors, pydantic", "import api"
+    except ImportError:
+        baseline, target = "import asyncio", "import " + ", ".join(api_local_imports())
+    print(f"baseline: {baseline}\ntarget:   {target}")
+
+    (cost_ms, extra), loaded = median_cost(baseline, target, runs)
+    print(f"\napp import cost (median of {runs}): {cost_ms:.1f} ms, budget {budget_ms:.0f} ms")
+    for name, us in sorted(extra.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {us / 1000:7.2f} ms  {name}")
+
+    ok = True
+    if loaded:
+        print(f"\nFAIL: imported at startup: {', '.join(loaded)}")
+        ok = False
+    if cost_ms > budget_ms:
+        print(f"\nFAIL: {cost_ms:.1f} ms is over the {budget_ms:.0f} ms budget")
+        ok = False
+    print("\nOK" if ok else "")
+    sys.exit(0 if ok else 1)
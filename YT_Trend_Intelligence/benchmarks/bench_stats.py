@@ -0,0 +1,78 @@
+"""
+Benchmark: /stats from COUNT(*) scans vs. the trigger-maintained aggregates,
+as the videos table grows. Also checks the aggregates equal fresh GROUP BY
+counts after a mix of inserts, re-scores and mark-sent updates.
+
+Usage:
+    python benchmarks/bench_stats.py [max_videos] [calls]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+TREND_TYPES = ["🔥 Exploding", "🚀 Fast Rising", "📈 Steady Growth", "Regular"]
+CATEGORIES = ["Gaming", "Technology", "News & Politics", "Entertainment", "Education", "Finance", "Shorts"]
+
+def make_video(i, rnd):
+    return {
+        'video_id': f"vid{i:07d}", 'title': f"Video {i}", 'channel_title': "Channel",
+        'published_at': "2024-01-01T00:00:00Z", 'view_count': rnd.randint(1000, 10**7),
+        'like_count': rnd.randint(10, 10**5), 'comment_count': rnd.randint(0, 10**4),
+        'trend_type': rnd.choice(TREND_TYPES), 'category': rnd.choice(CATEGORIES),
+    }
+
+def scan_stats(conn):
+    total = conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+    sent = conn.execute("SELECT COUNT(*) FROM videos WHERE is_sent=1").fetchone()[0]
+    by_category = {r[0]: {'videos': r[1], 'sent': r[2]} for r in conn.execute(
+        "SELECT category, COUNT(*), SUM(is_sent) FROM videos GROUP BY category")}
+    by_trend_type = {r[0]: {'videos': r[1], 'sent': r[2]} for r in conn.execute(
+        "SELECT trend_type, COUNT(*), SUM(is_sent) FROM videos GROUP BY trend_type")}
+    return total, sent, by_category, by_trend_type
+
+def timed(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+if __name__ == "__main__":
+    max_videos = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rnd = random.Random(5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "stats.db")
+        database.init_db()
+        conn = database.get_db_connection()
+        videos = []
+        size = 1000
+        while size <= max_videos:
+            new = [make_video(i, rnd) for i in range(len(videos), size)]
+            videos.extend(new)
+            database.save_videos(new)
+            # Re-score a slice and send a few, like a cycle would
+            changed = rnd.sample(videos, min(500, len(videos)))
+            for video in changed:
+                video['trend_type'] = rnd.choice(TREND_TYPES)
+                video['category'] = rnd.choice(CATEGORIES)
+            database.save_videos(changed)
+            database.mark_sent(v['video_id'] for v in changed[:25])
+
+            scan_us = timed(lambda: scan_stats(conn), calls)
+            agg_us = timed(database.get_stats_aggregates, calls)
+            print(f"{len(videos):>8} videos  COUNT(*) scans {scan_us:10.1f} us  aggregates {agg_us:8.1f} us")
+
+            total, sent, by_category, by_trend_type = scan_stats(conn)
+            agg = database.get_stats_aggregates()
+            assert (agg['total'], agg['sent'], agg['by_category'], agg['by_trend_type']) == \
+                (total, sent, by_category, by_trend_type), "aggregates drifted from the videos table"
+            size *= 10
+        print("aggregates match GROUP BY counts")
+        database.close_db_connections()
@@ -0,0 +1,88 @@
+"""
+Benchmark: cost of the telemetry calls (inc, observe, timed) with metrics
+enabled and disabled, and of a whole cycle on the fake backends (no simulated
+latency, so instrumentation overhead is not hidden behind I/O). Also times
+rendering /metrics and checks every sample line is valid exposition format.
+
+Usage:
+    python benchmarks/bench_telemetry.py [calls] [cycles]
+"""
+import contextlib
+import io
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_analyzer
+import backends
+import database
+import outbox
+import pipeline
+import telemetry
+
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? -?[0-9.e+-]+$')
+
+def per_call_ns(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+def timed_block():
+    with telemetry.timed('ai_request_seconds', mode='batch'):
+        pass
+
+def cycle_ms(cycles):
+    samples = []
+    for _ in range(cycles):
+        backends._fake_fetcher = backends._fake_mailer = ai_analyzer._model = None
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DB_NAME = os.path.join(tmp, "telemetry.db")
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                pipeline.run_cycle(deliver=outbox.deliver_due, recipient="bench@example.com")
+            samples.append((time.perf_counter() - start) * 1000)
+            database.close_db_connections()
+    return statistics.median(samples)
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    ops = {
+        'inc': lambda: telemetry.inc('emails_sent_total'),
+        'inc (labels)': lambda: telemetry.inc('ai_requests_total', mode='batch', result='ok'),
+        'observe': lambda: telemetry.observe('email_send_seconds', 0.02),
+        'timed': timed_block,
+    }
+    print(f"{'call':<14} {'enabled':>10} {'disabled':>10}   ({calls} calls)")
+    for name, fn in ops.items():
+        telemetry.METRICS_ENABLED = True
+        enabled = per_call_ns(fn, calls)
+        telemetry.METRICS_ENABLED = False
+        disabled = per_call_ns(fn, calls)
+        print(f"{name:<14} {enabled:8.0f}ns {disabled:8.0f}ns")
+
+    backends.FETCH_BACKEND = backends.AI_BACKEND = backends.MAIL_BACKEND = "fake"
+    backends.FAKE_FETCH_LATENCY = backends.FAKE_AI_LATENCY = backends.FAKE_MAIL_LATENCY = 0
+    ai_analyzer.rate_limiter = ai_analyzer.RateLimiter(0)
+    os.environ["REGION_CODES"] = "IN,US,GB,BR,JP"
+    results = {}
+    for enabled in (False, True, False, True): # interleaved against drift
+        telemetry.METRICS_ENABLED = enabled
+        results.setdefault(enabled, []).append(cycle_ms(cycles))
+    off, on = min(results[False]), min(results[True])
+    print(f"\ncycle, metrics off  {off:8.1f} ms\ncycle, metrics on   {on:8.1f} ms  ({(on / off - 1) * 100:+.1f}%)")
+
+    start = time.perf_counter()
+    text = telemetry.render()
+    render_ms = (time.perf_counter() - start) * 1000
+    samples = [line for line in text.splitlines() if line and not line.startswith("#")]
+    bad = [line for line in samples if not SAMPLE_LINE.match(line)]
+    print(f"\nrender /metrics     {render_ms:8.2f} ms  {len(samples)} samples")
+    assert not bad, f"invalid sample lines: {bad[:3]}"
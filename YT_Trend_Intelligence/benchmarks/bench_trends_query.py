@@ -0,0 +1,84 @@
+"""
+Benchmark: /trends query on a large synthetic videos table, comparing the
+old unindexed sort + Python category filter with the indexed SQL-side
+filters and keyset pagination.
+
+Usage:
+    python benchmarks/bench_trends_query.py [num_rows]   (default 1,000,000)
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+CATEGORIES = ["Gaming", "Technology", "News & Politics", "Entertainment", "Education", "Finance", "Shorts"]
+TREND_TYPES = ["🔥 Exploding", "🚀 Fast Rising", "📈 Steady Growth", "Regular"]
+INDEXES = ["idx_videos_score", "idx_videos_category_score", "idx_videos_sent_timestamp"]
+
+def populate(conn, n, batch=50000):
+    rnd = random.Random(42)
+    for start in range(0, n, batch):
+        rows = [(
+            f"vid{i:09d}", f"Video {i}", f"Channel {i % 5000}", "2024-01-01T00:00:00Z",
+            rnd.randint(0, 10**7), rnd.randint(0, 10**5), rnd.randint(0, 10**4),
+            rnd.random() * 10**6, rnd.randint(0, 100), rnd.choice(TREND_TYPES),
+            rnd.choice(CATEGORIES), rnd.random() < 0.1,
+        ) for i in range(start, min(start + batch, n))]
+        with conn:
+            conn.executemany('''
+                INSERT INTO videos (video_id, title, channel_title, published_at,
+                    view_count, like_count, comment_count, engagement_score,
+                    viral_probability, trend_type, category, is_sent)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+
+def old_get_trends(conn, limit, category):
+    rows = conn.execute("SELECT * FROM videos ORDER BY engagement_score DESC LIMIT ?", (limit,)).fetchall()
+    return [dict(r) for r in rows if dict(r)['category'] == category]
+
+def new_get_trends(limit, category, pages):
+    after = None
+    results = []
+    for _ in range(pages):
+        rows = database.get_trending_videos(limit=limit, category=category, after=after)
+        results.extend(dict(r) for r in rows)
+        if len(rows) < limit:
+            break
+        after = (rows[-1]['engagement_score'], rows[-1]['video_id'])
+    return results
+
+def timed(label, fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<45} {best * 1000:9.2f} ms  ({len(result)} rows)")
+    return best
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "bench.db")
+        database.init_db()
+        conn = database.get_db_connection()
+        for name in INDEXES:
+            conn.execute(f"DROP INDEX {name}")
+
+        print(f"Populating {n:,} rows...")
+        populate(conn, n)
+
+        old = timed("old: full sort + Python filter (Gaming, 50)", lambda: old_get_trends(conn, 50, "Gaming"))
+
+        conn.execute("ANALYZE")
+        database.init_db() # Recreate indexes
+        new = timed("new: indexed SQL filter (Gaming, 50)", lambda: new_get_trends(50, "Gaming", 1))
+        timed("new: 5 keyset pages (Gaming, 5x50)", lambda: new_get_trends(50, "Gaming", 5))
+        timed("new: 5 keyset pages (All, 5x50)", lambda: new_get_trends(50, None, 5))
+        print(f"speedup (first page): {old / new:.0f}x")
+        database.close_db_connections()
@@ -0,0 +1,143 @@
+"""
+Local stub of the YouTube Data API `videos` endpoint that replays recorded
+responses, for exercising youtube_client without network or quota.
+
+Recordings are JSON files shaped like:
+    {"request": {"regionCode": "IN", "videoCategoryId": null, "pageToken": null},
+     "response": {...raw videos.list body...}}
+
+Usage:
+    server, base_url = start_stub_server(load_recordings("path/to/recordings"))
+    youtube_client.YOUTUBE_API_URL = base_url
+"""
+import glob
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def recording_key(region_code, category_id=None, page_token=None):
+    return (region_code, category_id or None, page_token or None)
+
+def load_recordings(directory):
+    recordings = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        req = data["request"]
+        key = recording_key(req.get("regionCode"), req.get("videoCategoryId"), req.get("pageToken"))
+        recordings[key] = data["response"]
+    return recordings
+
+def make_synthetic_recordings(regions, pages=4, per_page=50, overlap=0.2, seed=42):
+    """
+    Builds videos.list pages for each region; `overlap` of each page is shared
+    across regions so de-duplication has something to do.
+    """
+    rnd = random.Random(seed)
+    recordings = {}
+    shared = int(per_page * overlap)
+    for region in regions:
+        for page in range(pages):
+            items = []
+            for i in range(per_page):
+                vid = f"shared{page:02d}{i:04d}" if i < shared else f"{region}{page:02d}{i:04d}"
+                items.append({
+                    "id": vid,
+                    "snippet": {
+                        "title": f"Video {vid}",
+                        "channelTitle": f"Channel {rnd.randint(1, 500)}",
+                        "publishedAt": "2024-01-01T00:00:00Z",
+                        "description": "synthetic",
+                        "tags": ["synthetic"],
+                        "categoryId": "24",
+                        "thumbnails": {"high": {"url": f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"}},
+                    },
+                    "statistics": {
+                        "viewCount": str(rnd.randint(1000, 10**7)),
+                        "likeCount": str(rnd.randint(10, 10**5)),
+                        "commentCount": str(rnd.randint(0, 10**4)),
+                    },
+                    "contentDetails": {"duration": "PT5M"},
+                })
+            token = f"page{page}" if page else None
+            body = {"kind": "youtube#videoListResponse", "etag": f"etag-{region}-{page}", "items": items}
+            if page + 1 < pages:
+                body["nextPageToken"] = f"page{page + 1}"
+            recordings[recording_key(region, None, token)] = body
+    return recordings
+
+def _filter_parts(item, parts):
+    keep = {"id"} | set(parts.split(","))
+    return {k: v for k, v in item.items() if k in keep}
+
+def start_stub_server(recordings, latency=0.0, host="127.0.0.1", port=0):
+    """
+    Serves `recordings` on a background thread. Returns (server, base_url);
+    call server.shutdown() when done. `latency` seconds are added per request.
+
+    Supports chart pages (regionCode/videoCategoryId/pageToken), `id=` lookups
+    against every recorded item, `part` filtering and If-None-Match -> 304.
+    Request counts are kept in server.stats.
+    """
+    items_by_id = {}
+    for body in recordings.values():
+        for item in body.get("items", []):
+            items_by_id.setdefault(item["id"], item)
+    stats = {"requests": 0, "not_modified": 0}
+    stats_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            parts = params.get("part", "snippet,statistics,contentDetails")
+            with stats_lock:
+                stats["requests"] += 1
+            if latency:
+                time.sleep(latency)
+            if not url.path.endswith("/videos"):
+                self.send_error(404, "Unknown resource")
+                return
+
+            if "id" in params:
+                ids = params["id"].split(",")
+                items = [_filter_parts(items_by_id[i], parts) for i in ids if i in items_by_id]
+                body = {"kind": "youtube#videoListResponse", "items": items}
+            else:
+                key = recording_key(params.get("regionCode"), params.get("videoCategoryId"), params.get("pageToken"))
+                if key not in recordings:
+                    self.send_error(404, "No recording for request")
+                    return
+                body = dict(recordings[key])
+                body["items"] = [_filter_parts(item, parts) for item in body.get("items", [])]
+
+            payload = json.dumps(body, sort_keys=True).encode()
+            etag = '"%s"' % hashlib.sha1(payload).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                with stats_lock:
+                    stats["not_modified"] += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
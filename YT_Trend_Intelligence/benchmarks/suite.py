@@ -0,0 +1,345 @@
+"""
+Benchmark suite: times the paths the deployment depends on and writes the
+results as JSON, compared against a stored baseline so regressions fail the
+run. Unlike the bench_*.py scripts (which compare old and new approaches and
+print), every number here is a median of repeated runs of the current code.
+
+Cases:
+    categorize   category_engine.categorize_video
+    metrics      metrics_engine.analyze_video_metrics and the batch path
+    email        email_sender.generate_viral_email_html
+    database     save_video / is_video_sent / get_sent_ids at 10k, 100k (and 1M) rows
+    cycle        main.main() on the fake backends with no simulated latency
+    http         concurrent clients on /trends, /stats and /reports (needs
+                 fastapi and uvicorn; skipped otherwise)
+
+All metrics are milliseconds (lower is better) for a fixed amount of work.
+
+Usage:
+    python benchmarks/suite.py [--quick | --full] [--only case,...] [--output results.json]
+                               [--baseline benchmarks/baseline.json] [--save-baseline]
+                               [--threshold 0.25]
+
+Exits 1 if any metric is more than `threshold` slower than the baseline.
+"""
+import argparse
+import contextlib
+import datetime
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+
+import database
+import fakes
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results.json")
+
+SCALES = {
+    'quick': {'repeats': 3, 'videos': 1000, 'db_rows': [10_000], 'cycle_regions': 2, 'http_requests': 200},
+    'default': {'repeats': 5, 'videos': 2000, 'db_rows': [10_000, 100_000], 'cycle_regions': 5, 'http_requests': 1000},
+    'full': {'repeats': 7, 'videos': 5000, 'db_rows': [10_000, 100_000, 1_000_000], 'cycle_regions': 10,
+             'http_requests': 5000},
+}
+HTTP_CLIENTS = 8
+HTTP_PATHS = ["/trends", "/trends?category=Gaming", "/stats", "/reports"]
+CATEGORIES = ["Gaming", "Technology", "News & Politics", "Entertainment", "Education", "Finance", "Shorts"]
+TREND_TYPES = ["🔥 Exploding", "🚀 Fast Rising", "📈 Steady Growth", "Regular"]
+
+def median_ms(fn, repeats):
+    """Median wall time of fn() in ms, after one warm-up call."""
+    fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+@contextlib.contextmanager
+def temp_db():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "suite.db")
+        database.init_db()
+        try:
+            yield
+        finally:
+            database.close_db_connections()
+
+def synthetic_videos(count, seed=42):
+    now = time.time()
+    return [fakes.synthetic_video(fakes.synthetic_video_id(f"suite:{seed}", i), now, seed) for i in range(count)]
+
+# -------------------------------------------------------------------
+# Cases: each returns {metric: ms}
+# -------------------------------------------------------------------
+def case_categorize(scale):
+    import category_engine
+    videos = synthetic_videos(scale['videos'])
+    ms = median_ms(lambda: [category_engine.categorize_video(v) for v in videos], scale['repeats'])
+    return {'categorize_video_per_1k': ms * 1000 / len(videos)}
+
+def case_metrics(scale):
+    import metrics_engine
+    videos = synthetic_videos(scale['videos'])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    single = median_ms(lambda: [metrics_engine.analyze_video_metrics(dict(v), now=now) for v in videos],
+                       scale['repeats'])
+    batch = median_ms(lambda: metrics_engine.analyze_videos_metrics([dict(v) for v in videos], now=now),
+                      scale['repeats'])
+    return {'analyze_video_metrics_per_1k': single * 1000 / len(videos),
+            'analyze_videos_metrics_per_1k': batch * 1000 / len(videos)}
+
+def case_email(scale):
+    import email_sender
+    from bench_email import make_selection
+    results = {}
+    for size in (35, 1000):
+        selection = make_selection(size)
+        results[f'generate_viral_email_html_{size}_videos'] = median_ms(
+            lambda: email_sender.generate_viral_email_html(selection, 200), scale['repeats'])
+    return results
+
+def fill_videos(start, end, batch=50_000):
+    """Inserts rows vid{start}..vid{end-1} directly (much faster than save_videos)."""
+    rnd = random.Random(start)
+    conn = database.get_db_connection()
+    for first in range(start, end, batch):
+        rows = [(
+            f"vid{i:09d}", f"Video {i}", f"Channel {i % 5000}", "2024-01-01T00:00:00Z",
+            rnd.randint(0, 10**7), rnd.randint(0, 10**5), rnd.randint(0, 10**4),
+            rnd.random() * 100, rnd.randint(0, 100), rnd.choice(TREND_TYPES),
+            rnd.choice(CATEGORIES), int(rnd.random() < 0.1),
+        ) for i in range(first, min(first + batch, end))]
+        with conn:
+            conn.executemany('''
+                INSERT INTO videos (video_id, title, channel_title, published_at,
+                    view_count, like_count, comment_count, engagement_score,
+                    viral_probability, trend_type, category, is_sent)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+
+def case_database(scale):
+    results = {}
+    ops = 1000
+    with temp_db():
+        filled = 0
+        for rows in scale['db_rows']:
+            fill_videos(filled, rows)
+            filled = rows
+            rnd = random.Random(rows)
+            # Half updates of existing rows, half new rows; new ones get fresh IDs every round
+            rounds = iter(range(10**6))
+            def save():
+                r = next(rounds)
+                for i in range(ops):
+                    video_id = f"vid{rnd.randrange(rows):09d}" if i % 2 else f"new{rows}-{r}-{i}"
+                    database.save_video({
+                        'video_id': video_id, 'title': "Video", 'channel_title': "Channel",
+                        'published_at': "2024-01-01T00:00:00Z", 'view_count': i, 'like_count': i,
+                        'comment_count': i, 'engagement_score': float(i), 'viral_probability': i % 100,
+                        'trend_type': "Regular", 'category': "Gaming",
+                    })
+            # Half hits, half misses
+            lookups = [f"vid{rnd.randrange(rows):09d}" if i % 2 else f"missing{i}" for i in range(ops)]
+            label = f"{rows // 1000}k" if rows < 1_000_000 else f"{rows // 1_000_000}M"
+            results[f'save_video_per_1k_at_{label}'] = median_ms(save, scale['repeats'])
+            results[f'is_video_sent_per_1k_at_{label}'] = median_ms(
+                lambda: [database.is_video_sent(v) for v in lookups], scale['repeats'])
+            results[f'get_sent_ids_per_1k_at_{label}'] = median_ms(
+                lambda: database.get_sent_ids(lookups), scale['repeats'])
+    return results
+
+def case_cycle(scale):
+    import ai_analyzer
+    import backends
+    import main
+    backends.FETCH_BACKEND = backends.AI_BACKEND = backends.MAIL_BACKEND = "fake"
+    backends.FAKE_FETCH_LATENCY = backends.FAKE_AI_LATENCY = backends.FAKE_MAIL_LATENCY = 0
+    backends.FAKE_FETCH_ERROR_RATE = backends.FAKE_AI_ERROR_RATE = backends.FAKE_MAIL_ERROR_RATE = 0
+    ai_analyzer.rate_limiter = ai_analyzer.RateLimiter(0)
+    os.environ["REGION_CODES"] = ",".join(f"R{i:02d}" for i in range(scale['cycle_regions']))
+    os.environ.setdefault("EMAIL_USER", "bench@example.com")
+
+    runs = []
+    for _ in range(scale['repeats']):
+        backends._fake_fetcher = backends._fake_mailer = ai_analyzer._model = None
+        with temp_db():
+            runs.append(main.main()['timings'])
+    stages = {stage for timings in runs for stage in timings}
+    return {f'cycle_{stage}': statistics.median(t.get(stage, 0) for t in runs) * 1000 for stage in sorted(stages)}
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def case_http(scale):
+    try:
+        import uvicorn
+        import api
+    except ImportError as e:
+        return {'skipped': f"{e.name} is not installed"}
+    api.API_BACKGROUND_JOBS = False # No cycles or email delivery in the benchmark server
+
+    with temp_db():
+        fill_videos(0, 10_000)
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+        try:
+            per_client = max(1, scale['http_requests'] // HTTP_CLIENTS)
+            def client(n):
+                conn = http.client.HTTPConnection("127.0.0.1", port) # keep-alive, like a browser
+                latencies = {path: [] for path in HTTP_PATHS}
+                for i in range(per_client):
+                    path = HTTP_PATHS[(n + i) % len(HTTP_PATHS)]
+                    start = time.perf_counter()
+                    conn.request("GET", path)
+                    response = conn.getresponse()
+                    response.read()
+                    latencies[path].append((time.perf_counter() - start) * 1000)
+                    if response.status != 200:
+                        raise RuntimeError(f"GET {path}: HTTP {response.status}")
+                conn.close()
+                return latencies
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=HTTP_CLIENTS) as pool:
+                per_thread = list(pool.map(client, range(HTTP_CLIENTS)))
+            wall_ms = (time.perf_counter() - start) * 1000
+        finally:
+            server.should_exit = True
+            thread.join()
+
+    results = {'http_wall_per_1k_requests': wall_ms * 1000 / (per_client * HTTP_CLIENTS)}
+    for path in HTTP_PATHS:
+        samples = sorted(ms for latencies in per_thread for ms in latencies[path])
+        name = path.strip("/").replace("?category=", "_")
+        results[f'http_{name}_p50'] = samples[len(samples) // 2]
+        results[f'http_{name}_p95'] = samples[int(len(samples) * 0.95)]
+    return results
+
+CASES = {
+    'categorize': case_categorize,
+    'metrics': case_metrics,
+    'email': case_email,
+    'database': case_database,
+    'cycle': case_cycle,
+    'http': case_http,
+}
+
+# -------------------------------------------------------------------
+# Baseline comparison
+# -------------------------------------------------------------------
+def compare(results, baseline, threshold):
+    """{case: {metric: {'baseline', 'current', 'ratio', 'status'}}} for metrics in both runs."""
+    comparison = {}
+    for case, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(case, {}).get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(base, (int, float)) or base <= 0:
+                continue
+            ratio = value / base
+            status = ("regression" if ratio > 1 + threshold else
+                      "improvement" if ratio < 1 - threshold else "ok")
+            comparison.setdefault(case, {})[metric] = {
+                'baseline': round(base, 3), 'current': round(value, 3), 'ratio': round(ratio, 3), 'status': status,
+            }
+    return comparison
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sqlite': sqlite3.sqlite_version,
+        'cpus': os.cpu_count(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and compare with a baseline.")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--quick", action="store_const", dest="scale", const="quick")
+    size.add_argument("--full", action="store_const", dest="scale", const="full")
+    parser.add_argument("--only", help="comma-separated cases: " + ", ".join(CASES))
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown ratio (default 0.25)")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own output while running")
+    args = parser.parse_args()
+
+    scale_name = args.scale or 'default'
+    scale = SCALES[scale_name]
+    names = args.only.split(",") if args.only else list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        print(f"{name} ...", flush=True)
+        start = time.perf_counter()
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            results[name] = CASES[name](scale)
+        for metric, value in results[name].items():
+            print(f"  {metric:<44} {value:10.3f} ms" if isinstance(value, float) else f"  {metric}: {value}")
+        print(f"  ({time.perf_counter() - start:.1f} s)")
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    comparison = compare(results, baseline['results'], args.threshold) if baseline else {}
+    if baseline and baseline.get('scale') != scale_name:
+        print(f"\nnote: baseline was recorded at scale {baseline.get('scale')!r}, this run is {scale_name!r}")
+
+    report = {'scale': scale_name, 'environment': environment(), 'results': results,
+              'threshold': args.threshold, 'comparison': comparison}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({k: report[k] for k in ('scale', 'environment', 'results')}, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+
+    if not baseline:
+        print("no baseline to compare with (run with --save-baseline to record one)")
+        return 0
+    regressions = [(case, metric, c) for case, metrics in comparison.items()
+                   for metric, c in metrics.items() if c['status'] != 'ok']
+    for case, metric, c in regressions:
+        print(f"{c['status']:<12} {case}.{metric}: {c['baseline']} -> {c['current']} ms ({c['ratio']:.2f}x)")
+    failed = any(c['status'] == 'regression' for _, _, c in regressions)
+    print("FAIL" if failed else f"OK (within {args.threshold:.0%} of baseline {baseline['environment'].get('commit')})")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
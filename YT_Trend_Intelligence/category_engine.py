@@ -1,4 +1,5 @@
 import re
+import string
 
 # Category Mapping (Standard YouTube Category IDs to our definitions)
 # 1: Film & Animation, 2: Autos & Vehicles, 10: Music, 15: Pets & Animals, 17: Sports, 
@@ -31,17 +32,112 @@ def parse_duration(duration_str):
     
     return total_seconds
 
+# -------------------------------------------------------------------
+# Compiled keyword matcher (built once, rebuilt after keywords_changed())
+# -------------------------------------------------------------------
+_matcher = None
+_keywords_version = 0
+
+def keywords_changed():
+    """Call after editing CATEGORY_KEYWORDS/GAMING_KEYWORDS so the matcher is rebuilt."""
+    global _keywords_version
+    _keywords_version += 1
+
+# ASCII punctuation splits words ("gta," -> "gta"); str.split does the rest
+_PUNCTUATION_TO_SPACE = str.maketrans({ch: " " for ch in string.punctuation})
+
+def _tokenize(text):
+    return text.translate(_PUNCTUATION_TO_SPACE).split()
+
+def _build_matcher():
+    # Keywords are keyed by their word tokens, so "free fire" is the 2-gram
+    # "free fire". One set intersection over the text's tokens finds the single
+    # words and the first words of phrases; a phrase is only looked for when
+    # its first word is there.
+    keyword_categories = {}
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            key = " ".join(_tokenize(keyword.lower()))
+            if key:
+                keyword_categories.setdefault(key, []).append(category)
+
+    phrases = {}
+    for key in keyword_categories:
+        if " " in key:
+            words = key.split(" ")
+            phrases.setdefault(words[0], []).append((key, words))
+
+    gaming = sorted(set(k.lower() for k in GAMING_KEYWORDS), key=len, reverse=True)
+    return {
+        'version': _keywords_version,
+        'keyword_categories': keyword_categories,
+        # Single-word keywords, plus the first word of every phrase
+        'words': frozenset(k for k in keyword_categories if " " not in k) | phrases.keys(),
+        'phrases': phrases, # first word -> [(phrase, its words)]
+        'order': {category: i for i, category in enumerate(CATEGORY_KEYWORDS)},
+        # Gaming titles/tags are matched anywhere (e.g. "#gtav", "bgmilive");
+        # a handful of substring checks beats one alternation regex here
+        'gaming': tuple(gaming),
+    }
+
+def _count_phrase(tokens, first, words):
+    count = 0
+    n = len(words)
+    i = tokens.index(first)
+    while True:
+        if tokens[i:i + n] == words:
+            count += 1
+        try:
+            i = tokens.index(first, i + 1)
+        except ValueError:
+            return count
+
+def get_matcher():
+    """Returns the compiled matcher, rebuilding it only after keywords_changed()."""
+    global _matcher
+    if _matcher is None or _matcher['version'] != _keywords_version:
+        _matcher = _build_matcher()
+    return _matcher
+
+def _text_content(video_data):
+    title = video_data['title'].lower()
+    description = video_data['description'].lower()
+    tags = [tag.lower() for tag in video_data.get('tags', [])]
+    return title + " " + description + " " + " ".join(tags)
+
+def score_categories(video_data, text_content=None):
+    """
+    Counts keyword hits per category in one pass over the text.
+    Returns {category: hits} for categories with at least one hit.
+    """
+    matcher = get_matcher()
+    if text_content is None:
+        text_content = _text_content(video_data)
+
+    keyword_categories = matcher['keyword_categories']
+    tokens = _tokenize(text_content)
+    scores = {}
+    phrases = matcher['phrases']
+    hits = []
+    for word in matcher['words'].intersection(tokens):
+        if word in keyword_categories:
+            hits.append((word, tokens.count(word)))
+        if word in phrases:
+            hits += [(phrase, _count_phrase(tokens, word, words)) for phrase, words in phrases[word]]
+    for keyword, count in hits:
+        if count:
+            for category in keyword_categories[keyword]:
+                scores[category] = scores.get(category, 0) + count
+    return scores
+
 def categorize_video(video_data):
     """
     Categorizes video based on title, tags, description, duration, and category ID.
     """
-    title = video_data['title'].lower()
-    description = video_data['description'].lower()
-    tags = [tag.lower() for tag in video_data.get('tags', [])]
     category_id = str(video_data.get('category_id'))
     duration_str = video_data.get('duration', '')
     
-    text_content = title + " " + description + " " + " ".join(tags)
+    text_content = _text_content(video_data)
     
     # 1. Shorts Detection
     duration_seconds = parse_duration(duration_str)
@@ -49,9 +145,8 @@ def categorize_video(video_data):
         return "Shorts"
 
     # 2. Gaming Sub-Detection
-    for keyword in GAMING_KEYWORDS:
-        if keyword in text_content:
-            return "Gaming"
+    if any(keyword in text_content for keyword in get_matcher()['gaming']):
+        return "Gaming"
     
     if category_id == "20": # Gaming
         return "Gaming"
@@ -63,12 +158,11 @@ def categorize_video(video_data):
     if category_id == "27": return "Education"
     if category_id == "24": return "Entertainment" # Generic
     
-    # Keyword based
-    for category, keywords in CATEGORY_KEYWORDS.items():
-        for keyword in keywords:
-            # Use word boundary check for better accuracy? For now simple inclusion.
-            if f" {keyword} " in f" {text_content} ": # simple boundary check
-                return category
+    # Keyword based: most hits wins, ties go to the earlier category in CATEGORY_KEYWORDS
+    scores = score_categories(video_data, text_content)
+    if scores:
+        order = get_matcher()['order']
+        return max(scores, key=lambda cat: (scores[cat], -order[cat]))
     
     # Default fallback
     return "Entertainment"
@@ -1,14 +1,93 @@
 import sqlite3
 import os
 import datetime
+import json
+import threading
+import time
+import weakref
+
+import category_engine
 
 DB_NAME = os.getenv("DB_NAME", "trends.db")
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
+# Connection tuning (WAL lets dashboard reads run while a cycle is writing)
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "20000"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# -------------------------------------------------------------------
+# Connection Manager: one pooled connection per (thread, DB file)
+# -------------------------------------------------------------------
+_local = threading.local()
+_pool_lock = threading.Lock()
+_all_pools = weakref.WeakSet()
+
+class _ThreadPool:
+    """
+    A thread's connections. Only the thread-local holds it, so it is freed
+    when the thread exits and the finalizer closes its connections; short-lived
+    threads (cycle stages, executor workers, heartbeats) leave nothing open.
+    """
+    __slots__ = ('conns', '__weakref__')
+
+    def __init__(self):
+        self.conns = {}
+        weakref.finalize(self, _close_all, self.conns)
+
+def _close_all(conns):
+    for conn in list(conns.values()):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    conns.clear()
+
+def _connect(db_name):
+    # check_same_thread=False only so close_db_connections() and the
+    # finalizer of an exited thread can close it; each connection is used by
+    # its owner thread.
+    conn = sqlite3.connect(db_name, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL') # Durable enough in WAL mode, far fewer fsyncs
+    conn.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
     return conn
 
+def get_db_connection():
+    """
+    Returns the calling thread's pooled connection, opening it on first use.
+    Callers must not close it; use `with conn:` to scope write transactions.
+    It is closed when the thread exits.
+    """
+    pool = getattr(_local, 'pool', None)
+    if pool is None:
+        pool = _local.pool = _ThreadPool()
+        with _pool_lock:
+            _all_pools.add(pool)
+
+    conn = pool.conns.get(DB_NAME)
+    if conn is None:
+        conn = pool.conns[DB_NAME] = _connect(DB_NAME)
+    return conn
+
+def close_db_connections():
+    """
+    Closes every pooled connection (all live threads). Call on shutdown or
+    when switching DB_NAME; threads that keep running reconnect on next use.
+    """
+    with _pool_lock:
+        pools = list(_all_pools)
+    for pool in pools:
+        _close_all(pool.conns)
+
+def open_connection_count():
+    """Pooled connections currently open, across threads (for leak checks)."""
+    with _pool_lock:
+        return sum(len(pool.conns) for pool in _all_pools)
+
 def init_db():
     conn = get_db_connection()
     c = conn.cursor()
@@ -30,11 +109,185 @@ def init_db():
             duration TEXT,
             category TEXT,
             hours_since_upload REAL,
+            view_velocity REAL,
             is_sent INTEGER DEFAULT 0,
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     ''')
     
+    # Migrate older DBs created before these columns existed
+    _ensure_columns(c, 'videos', {
+        'thumbnail_url': 'TEXT',
+        'duration': 'TEXT',
+        'category': 'TEXT',
+        'hours_since_upload': 'REAL',
+        'view_velocity': 'REAL',
+    })
+    
+    # Append-only stats history. The (video_id, captured_at) primary key of a
+    # WITHOUT ROWID table is the clustered, covering index: "latest snapshot
+    # for a video" is a single B-tree seek. captured_at is unix epoch seconds.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS video_snapshots (
+            video_id TEXT NOT NULL,
+            captured_at INTEGER NOT NULL,
+            views INTEGER NOT NULL,
+            likes INTEGER NOT NULL,
+            comments INTEGER NOT NULL,
+            PRIMARY KEY (video_id, captured_at)
+        ) WITHOUT ROWID
+    ''')
+    
+    # YouTube API bookkeeping: quota units spent per day, ETag'd responses
+    # and the immutable per-video parts (snippet, contentDetails) as JSON
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS api_quota (
+            day TEXT PRIMARY KEY,
+            units INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS api_etags (
+            cache_key TEXT PRIMARY KEY,
+            etag TEXT NOT NULL,
+            body TEXT NOT NULL,
+            fetched_at INTEGER NOT NULL
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS video_details (
+            video_id TEXT PRIMARY KEY,
+            details TEXT NOT NULL,
+            fetched_at INTEGER NOT NULL
+        )
+    ''')
+    
+    # AI analyses keyed by video and a hash of the text the prompt was built from
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS ai_analysis_cache (
+            video_id TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            analysis TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    ''')
+    
+    # Results of on-demand /analyze lookups (url_analyzer), kept for a TTL
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS video_lookups (
+            video_id TEXT PRIMARY KEY,
+            result TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    ''')
+    
+    # Cycle selections waiting to go out as one digest email
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS email_digest (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL NOT NULL,
+            total_videos INTEGER NOT NULL,
+            selection TEXT NOT NULL
+        )
+    ''')
+    
+    # Outgoing emails, one row per message and recipient, delivered by outbox.py
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            html TEXT NOT NULL,
+            text TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            claimed_at REAL,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            sent_at REAL
+        )
+    ''')
+    # Bodies shared by many outbox rows (subscribers with the same filters)
+    _ensure_columns(c, 'email_outbox', {'body_id': 'TEXT'})
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS email_bodies (
+            id TEXT PRIMARY KEY,
+            html TEXT NOT NULL,
+            text TEXT
+        ) WITHOUT ROWID
+    ''')
+    
+    # Alert recipients; NULL filters mean "everything"
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS subscribers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL UNIQUE,
+            categories TEXT,
+            regions TEXT,
+            trend_types TEXT,
+            min_viral_probability REAL NOT NULL DEFAULT 0,
+            active INTEGER NOT NULL DEFAULT 1,
+            created_at INTEGER NOT NULL
+        )
+    ''')
+    
+    # Cycle jobs (one row per requested run) and cross-process lease locks
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS cycle_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT NOT NULL,
+            trigger TEXT,
+            requested_at INTEGER NOT NULL,
+            started_at INTEGER,
+            finished_at INTEGER,
+            error TEXT,
+            summary TEXT
+        )
+    ''')
+    # One record per finished cycle: counts, stage timings and the counters it moved
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS cycle_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at REAL NOT NULL,
+            duration REAL NOT NULL,
+            fetched INTEGER,
+            new_candidates INTEGER,
+            emailed INTEGER,
+            quota_used INTEGER,
+            timings TEXT,
+            counters TEXT
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    
+    # Materialized counters for /stats, kept current by the triggers below
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS video_aggregates (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            videos INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS video_activity (
+            hour INTEGER PRIMARY KEY,
+            videos INTEGER NOT NULL DEFAULT 0,
+            viral INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for statement in AGGREGATE_TRIGGERS:
+        c.execute(statement)
+    
     # Create Settings Table
     c.execute('''
         CREATE TABLE IF NOT EXISTS settings (
@@ -46,23 +299,189 @@ def init_db():
     # Initialize default settings if not exists
     c.execute('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)', ('bot_active', '1'))
     
+    # Indexes for /trends (optionally by category) and /reports. video_id is
+    # the keyset tie-breaker, so pagination never needs a sort step.
+    c.execute('CREATE INDEX IF NOT EXISTS idx_videos_score ON videos (engagement_score, video_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_videos_category_score ON videos (category, engagement_score, video_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_videos_sent_timestamp ON videos (is_sent, timestamp)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_cycle_jobs_status ON cycle_jobs (status, id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)')
+    
     conn.commit()
-    conn.close()
+    
+    # One-time data migrations
+    if get_setting('migration_category_backfill') != '1':
+        backfill_missing_categories()
+        set_setting('migration_category_backfill', '1')
+    if get_setting('migration_video_aggregates') != '1':
+        rebuild_aggregates()
+        set_setting('migration_video_aggregates', '1')
+
+# -------------------------------------------------------------------
+# Aggregates: per-dimension counts and hourly viral activity
+# -------------------------------------------------------------------
+# A video counts as viral while its trend_type is Exploding or Fast Rising
+_VIRAL = "(COALESCE({row}.trend_type, '') LIKE '%Exploding%' OR COALESCE({row}.trend_type, '') LIKE '%Fast Rising%')"
+_NOW_HOUR = "(CAST(strftime('%s', 'now') AS INTEGER) / 3600)"
+_AGGREGATE_UPSERT = '''
+    ON CONFLICT(dimension, value) DO UPDATE SET
+        videos = videos + excluded.videos, sent = sent + excluded.sent
+'''
+_ACTIVITY_UPSERT = '''
+    ON CONFLICT(hour) DO UPDATE SET
+        videos = videos + excluded.videos, viral = viral + excluded.viral
+'''
+
+# Triggers run inside the writing transaction (save_videos, mark_sent, ...),
+# so the counters can never drift from the videos table. video_activity
+# counts each video once per hour it was saved in, and how many of those
+# were viral, for rolling virality rates.
+AGGREGATE_TRIGGERS = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_videos_aggregates_insert AFTER INSERT ON videos BEGIN
+        INSERT INTO video_aggregates (dimension, value, videos, sent) VALUES
+            ('all', '', 1, NEW.is_sent),
+            ('category', COALESCE(NEW.category, ''), 1, NEW.is_sent),
+            ('trend_type', COALESCE(NEW.trend_type, ''), 1, NEW.is_sent)
+        {_AGGREGATE_UPSERT};
+        INSERT INTO video_activity (hour, videos, viral) VALUES ({_NOW_HOUR}, 1, {_VIRAL.format(row='NEW')})
+        {_ACTIVITY_UPSERT};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_videos_aggregates_update
+    AFTER UPDATE OF category, trend_type, is_sent ON videos
+    WHEN OLD.category IS NOT NEW.category OR OLD.trend_type IS NOT NEW.trend_type OR OLD.is_sent IS NOT NEW.is_sent
+    BEGIN
+        INSERT INTO video_aggregates (dimension, value, videos, sent) VALUES
+            ('all', '', 0, NEW.is_sent - OLD.is_sent),
+            ('category', COALESCE(OLD.category, ''), -1, -OLD.is_sent),
+            ('category', COALESCE(NEW.category, ''), 1, NEW.is_sent),
+            ('trend_type', COALESCE(OLD.trend_type, ''), -1, -OLD.is_sent),
+            ('trend_type', COALESCE(NEW.trend_type, ''), 1, NEW.is_sent)
+        {_AGGREGATE_UPSERT};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_videos_activity_update AFTER UPDATE OF timestamp ON videos BEGIN
+        INSERT INTO video_activity (hour, videos, viral)
+        SELECT {_NOW_HOUR},
+               CASE WHEN same_hour THEN 0 ELSE 1 END,
+               CASE WHEN same_hour THEN {_VIRAL.format(row='NEW')} - {_VIRAL.format(row='OLD')}
+                    ELSE {_VIRAL.format(row='NEW')} END
+        FROM (SELECT CAST(strftime('%s', OLD.timestamp) AS INTEGER) / 3600 = {_NOW_HOUR} AS same_hour)
+        WHERE true
+        {_ACTIVITY_UPSERT};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_videos_aggregates_delete AFTER DELETE ON videos BEGIN
+        INSERT INTO video_aggregates (dimension, value, videos, sent) VALUES
+            ('all', '', -1, -OLD.is_sent),
+            ('category', COALESCE(OLD.category, ''), -1, -OLD.is_sent),
+            ('trend_type', COALESCE(OLD.trend_type, ''), -1, -OLD.is_sent)
+        {_AGGREGATE_UPSERT};
+    END
+    ''',
+)
+
+ACTIVITY_RETENTION_HOURS = 8 * 24
+VIRALITY_WINDOWS = (('1h', 1), ('24h', 24), ('7d', 7 * 24))
+
+def rebuild_aggregates():
+    """Recomputes video_aggregates from the videos table (migration / repair)."""
+    conn = get_db_connection()
+    with conn:
+        conn.execute('DELETE FROM video_aggregates')
+        conn.execute('''
+            INSERT INTO video_aggregates (dimension, value, videos, sent)
+            SELECT 'all', '', COUNT(*), COALESCE(SUM(is_sent), 0) FROM videos
+            UNION ALL
+            SELECT 'category', COALESCE(category, ''), COUNT(*), SUM(is_sent) FROM videos GROUP BY 1, 2
+            UNION ALL
+            SELECT 'trend_type', COALESCE(trend_type, ''), COUNT(*), SUM(is_sent) FROM videos GROUP BY 1, 2
+        ''')
+
+def get_stats_aggregates():
+    """
+    /stats numbers from the maintained counters: totals, per category and per
+    trend type, and the viral share of videos seen in each rolling window
+    (hour buckets, the current one included). Cost does not grow with the DB.
+    """
+    conn = get_db_connection()
+    stats = {'total': 0, 'sent': 0, 'by_category': {}, 'by_trend_type': {}}
+    for row in conn.execute('SELECT dimension, value, videos, sent FROM video_aggregates WHERE videos > 0 OR dimension = \'all\''):
+        if row['dimension'] == 'all':
+            stats['total'], stats['sent'] = row['videos'], row['sent']
+        else:
+            stats['by_' + row['dimension']][row['value']] = {'videos': row['videos'], 'sent': row['sent']}
+
+    now_hour = int(time.time()) // 3600
+    stats['virality'] = {}
+    for label, hours in VIRALITY_WINDOWS:
+        row = conn.execute(
+            'SELECT COALESCE(SUM(videos), 0) AS videos, COALESCE(SUM(viral), 0) AS viral '
+            'FROM video_activity WHERE hour > ?', (now_hour - hours,)
+        ).fetchone()
+        stats['virality'][label] = {
+            'videos': row['videos'],
+            'viral': row['viral'],
+            'rate': round(100.0 * row['viral'] / row['videos'], 1) if row['videos'] else 0.0,
+        }
+    return stats
+
+def _ensure_columns(cursor, table, columns):
+    existing = {row['name'] for row in cursor.execute(f'PRAGMA table_info({table})')}
+    for name, decl in columns.items():
+        if name not in existing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {decl}')
+
+def backfill_missing_categories():
+    """
+    Categorizes legacy rows saved before the category column existed,
+    so readers can filter on it in SQL. Returns the number of rows fixed.
+    """
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT video_id, title, duration FROM videos WHERE category IS NULL OR category = ''"
+    ).fetchall()
+    updates = [
+        (category_engine.categorize_video({
+            'title': row['title'] or '',
+            'description': '',
+            'duration': row['duration'] or '',
+        }), row['video_id'])
+        for row in rows
+    ]
+    with conn:
+        conn.executemany('UPDATE videos SET category = ? WHERE video_id = ?', updates)
+    return len(updates)
 
 def get_setting(key, default=None):
     conn = get_db_connection()
     c = conn.cursor()
     c.execute('SELECT value FROM settings WHERE key = ?', (key,))
     result = c.fetchone()
-    conn.close()
     return result['value'] if result else default
 
 def set_setting(key, value):
     conn = get_db_connection()
     c = conn.cursor()
     c.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, str(value)))
+    _bump_generation(conn)
     conn.commit()
-    conn.close()
+
+# Bumped in the same transaction as every write API responses depend on
+# (videos, sent flags, settings), so response caches in any process can tell
+# their data is stale by comparing one number.
+def _bump_generation(conn):
+    conn.execute(
+        "INSERT INTO settings (key, value) VALUES ('data_generation', '1') "
+        "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+    )
+
+def get_data_generation():
+    return int(get_setting('data_generation', '0'))
 
 def is_bot_active():
     val = get_setting('bot_active', '1')
@@ -73,51 +492,615 @@ def video_exists(video_id):
     c = conn.cursor()
     c.execute('SELECT 1 FROM videos WHERE video_id = ?', (video_id,))
     exists = c.fetchone() is not None
-    conn.close()
     return exists
 
 def is_video_sent(video_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('SELECT is_sent FROM videos WHERE video_id = ?', (video_id,))
-    result = c.fetchone()
-    conn.close()
-    
-    if result:
-        return bool(result['is_sent'])
-    return False
+    return video_id in get_sent_ids([video_id])
 
 def mark_video_as_sent(video_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('UPDATE videos SET is_sent = 1 WHERE video_id = ?', (video_id,))
-    conn.commit()
-    conn.close()
+    mark_sent([video_id])
 
 def save_video(video_data):
-    conn = get_db_connection()
-    c = conn.cursor()
-    
-    # Check if exists to update or insert
-    # Using REPLACE or INSERT OR REPLACE
-    # COALESCE for is_sent to preserve it if exists
-    c.execute('''
-        INSERT OR REPLACE INTO videos (
-            video_id, title, channel_title, published_at, 
-            view_count, like_count, comment_count, 
-            engagement_score, viral_probability, trend_type,
-            thumbnail_url, duration, hours_since_upload, category,
-            is_sent, timestamp
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE((SELECT is_sent FROM videos WHERE video_id = ?), 0), CURRENT_TIMESTAMP)
-    ''', (
-        video_data['video_id'], video_data['title'], video_data['channel_title'], 
-        video_data['published_at'], video_data['view_count'], video_data['like_count'], 
-        video_data['comment_count'], video_data.get('engagement_score', 0), 
+    save_videos([video_data])
+
+# -------------------------------------------------------------------
+# Bulk API: one connection, one transaction per call
+# -------------------------------------------------------------------
+# SQLite caps bound parameters per statement (999 on older builds)
+SQLITE_MAX_VARS = 900
+
+VIDEO_COLUMNS = (
+    'video_id', 'title', 'channel_title', 'published_at',
+    'view_count', 'like_count', 'comment_count',
+    'engagement_score', 'viral_probability', 'trend_type',
+    'thumbnail_url', 'duration', 'hours_since_upload', 'category',
+    'view_velocity',
+)
+
+# UPSERT keeps is_sent untouched on conflict, so no correlated subquery is needed
+UPSERT_VIDEO_SQL = '''
+    INSERT INTO videos ({cols}, is_sent, timestamp)
+    VALUES ({marks}, 0, CURRENT_TIMESTAMP)
+    ON CONFLICT(video_id) DO UPDATE SET {updates}, timestamp = CURRENT_TIMESTAMP
+'''.format(
+    cols=', '.join(VIDEO_COLUMNS),
+    marks=', '.join('?' for _ in VIDEO_COLUMNS),
+    updates=', '.join(f"{col} = excluded.{col}" for col in VIDEO_COLUMNS[1:]),
+)
+
+def _video_row(video_data):
+    return (
+        video_data['video_id'], video_data['title'], video_data['channel_title'],
+        video_data['published_at'], video_data['view_count'], video_data['like_count'],
+        video_data['comment_count'], video_data.get('engagement_score', 0),
         video_data.get('viral_probability', 0), video_data.get('trend_type', ''),
-        video_data.get('thumbnail_url', ''), video_data.get('duration', ''), 
+        video_data.get('thumbnail_url', ''), video_data.get('duration', ''),
         video_data.get('hours_since_upload', 0.0), video_data.get('category', 'Entertainment'),
-        video_data['video_id']
-    ))
+        video_data.get('view_velocity'),
+    )
+
+def _snapshot_row(video_data):
+    return (
+        video_data['video_id'], video_data['captured_at'],
+        video_data['view_count'], video_data['like_count'], video_data['comment_count'],
+    )
+
+def _chunks(items, size=SQLITE_MAX_VARS):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def save_videos(videos):
+    """
+    Upserts many videos in a single transaction (one commit / fsync).
+    Videos carrying a 'captured_at' also get a video_snapshots row.
+    Returns the number of rows written.
+    """
+    videos = list(videos)
+    rows = [_video_row(v) for v in videos]
+    if not rows:
+        return 0
+    snapshots = [_snapshot_row(v) for v in videos if v.get('captured_at')]
+
+    conn = get_db_connection()
+    with conn:
+        conn.executemany(UPSERT_VIDEO_SQL, rows)
+        if snapshots:
+            # Re-saving the same capture (e.g. after AI analysis) is a no-op
+            conn.executemany(
+                'INSERT OR IGNORE INTO video_snapshots (video_id, captured_at, views, likes, comments) '
+                'VALUES (?, ?, ?, ?, ?)', snapshots
+            )
+        conn.execute('DELETE FROM video_activity WHERE hour < ?',
+                     (int(time.time()) // 3600 - ACTIVITY_RETENTION_HOURS,))
+        _bump_generation(conn)
+    return len(rows)
+
+def get_latest_snapshots(video_ids):
+    """
+    Returns {video_id: row} with the most recent snapshot of each video.
+    Each lookup is one index seek, so cost does not grow with history length.
+    """
+    latest = {}
+    conn = get_db_connection()
+    for chunk in _chunks(set(video_ids)):
+        values = ', '.join('(?)' for _ in chunk)
+        rows = conn.execute(f'''
+            WITH ids(video_id) AS (VALUES {values})
+            SELECT s.video_id, s.captured_at, s.views, s.likes, s.comments
+            FROM ids
+            JOIN video_snapshots s
+              ON s.video_id = ids.video_id
+             AND s.captured_at = (SELECT MAX(captured_at) FROM video_snapshots WHERE video_id = ids.video_id)
+        ''', chunk).fetchall()
+        latest.update((row['video_id'], row) for row in rows)
+    return latest
+
+def get_videos(video_ids):
+    """
+    Returns the stored rows for video_ids as dicts (unknown IDs are skipped).
+    """
+    videos = []
+    conn = get_db_connection()
+    for chunk in _chunks(list(dict.fromkeys(video_ids))):
+        marks = ', '.join('?' for _ in chunk)
+        rows = conn.execute(f'SELECT * FROM videos WHERE video_id IN ({marks})', chunk).fetchall()
+        videos.extend(dict(row) for row in rows)
+    return videos
+
+def get_sent_ids(video_ids):
+    """
+    Returns the subset of video_ids already marked as sent.
+    """
+    sent = set()
+    conn = get_db_connection()
+    for chunk in _chunks(set(video_ids)):
+        marks = ', '.join('?' for _ in chunk)
+        rows = conn.execute(
+            f'SELECT video_id FROM videos WHERE is_sent = 1 AND video_id IN ({marks})', chunk
+        ).fetchall()
+        sent.update(row['video_id'] for row in rows)
+    return sent
+
+def mark_sent(video_ids):
+    """
+    Marks many videos as sent in a single transaction.
+    """
+    ids = [(vid,) for vid in set(video_ids)]
+    if not ids:
+        return
+
+    conn = get_db_connection()
+    with conn:
+        conn.executemany('UPDATE videos SET is_sent = 1 WHERE video_id = ?', ids)
+        _bump_generation(conn)
+
+def get_trending_videos(limit=50, category=None, trend_type=None, since_hours=None, after=None):
+    """
+    Top videos by engagement score, filtered and paginated in SQL.
+    `after` is the (engagement_score, video_id) of the last row of the
+    previous page (keyset pagination).
+    """
+    query = "SELECT * FROM videos"
+    clauses = []
+    params = []
     
-    conn.commit()
-    conn.close()
+    if category:
+        clauses.append("category = ?")
+        params.append(category)
+    if trend_type:
+        clauses.append("trend_type LIKE ?")
+        params.append(f"%{trend_type}%")
+    if since_hours:
+        clauses.append("timestamp >= datetime('now', ?)")
+        params.append(f"-{float(since_hours)} hours")
+    if after:
+        clauses.append("(engagement_score, video_id) < (?, ?)")
+        params.extend(after)
+    
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY engagement_score DESC, video_id DESC LIMIT ?"
+    params.append(limit)
+    
+    conn = get_db_connection()
+    return conn.execute(query, params).fetchall()
+
+def get_category_leaders(k=5):
+    """
+    {category: top k rows by engagement score} for every category that has
+    videos. Each category is one walk down idx_videos_category_score that
+    stops after k rows, so nothing is sorted and the cost does not grow with
+    the table. Ties are ordered like /trends (video_id DESC).
+    """
+    conn = get_db_connection()
+    categories = [row[0] for row in conn.execute(
+        "SELECT value FROM video_aggregates WHERE dimension = 'category' AND videos > 0 AND value != '' ORDER BY value"
+    )]
+    return {category: get_trending_videos(limit=k, category=category) for category in categories}
+
+# -------------------------------------------------------------------
+# YouTube API quota, ETag cache and immutable video details
+# -------------------------------------------------------------------
+def consume_quota(day, units, budget):
+    """
+    Atomically reserves `units` of the day's quota. Returns False (and spends
+    nothing) if that would exceed `budget`. Safe across threads and processes.
+    """
+    conn = get_db_connection()
+    with conn:
+        conn.execute('INSERT OR IGNORE INTO api_quota (day, units) VALUES (?, 0)', (day,))
+        cur = conn.execute(
+            'UPDATE api_quota SET units = units + ? WHERE day = ? AND units + ? <= ?',
+            (units, day, units, budget)
+        )
+    return cur.rowcount == 1
+
+def get_quota_used(day):
+    conn = get_db_connection()
+    row = conn.execute('SELECT units FROM api_quota WHERE day = ?', (day,)).fetchone()
+    return row['units'] if row else 0
+
+def get_cached_response(cache_key):
+    conn = get_db_connection()
+    return conn.execute('SELECT etag, body FROM api_etags WHERE cache_key = ?', (cache_key,)).fetchone()
+
+def save_cached_response(cache_key, etag, body):
+    conn = get_db_connection()
+    with conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO api_etags (cache_key, etag, body, fetched_at) VALUES (?, ?, ?, ?)',
+            (cache_key, etag, body, int(time.time()))
+        )
+
+def get_video_details(video_ids, max_age=None):
+    """
+    Returns {video_id: details dict} for cached details younger than max_age seconds.
+    """
+    details = {}
+    min_fetched = int(time.time() - max_age) if max_age else 0
+    conn = get_db_connection()
+    for chunk in _chunks(set(video_ids)):
+        marks = ', '.join('?' for _ in chunk)
+        rows = conn.execute(
+            f'SELECT video_id, details FROM video_details WHERE fetched_at >= ? AND video_id IN ({marks})',
+            [min_fetched, *chunk]
+        ).fetchall()
+        details.update((row['video_id'], json.loads(row['details'])) for row in rows)
+    return details
+
+def save_video_details(details_list):
+    now = int(time.time())
+    rows = [(d['video_id'], json.dumps(d), now) for d in details_list]
+    if not rows:
+        return
+    conn = get_db_connection()
+    with conn:
+        conn.executemany(
+            'INSERT OR REPLACE INTO video_details (video_id, details, fetched_at) VALUES (?, ?, ?)', rows
+        )
+
+# -------------------------------------------------------------------
+# AI analysis cache
+# -------------------------------------------------------------------
+def get_cached_analyses(content_hashes, max_age):
+    """
+    content_hashes: {video_id: content_hash}. Returns {video_id: analysis} for
+    entries whose hash still matches and that are younger than max_age seconds.
+    """
+    cached = {}
+    min_created = int(time.time() - max_age)
+    conn = get_db_connection()
+    for chunk in _chunks(content_hashes):
+        marks = ', '.join('?' for _ in chunk)
+        rows = conn.execute(
+            f'SELECT video_id, content_hash, analysis FROM ai_analysis_cache '
+            f'WHERE created_at >= ? AND video_id IN ({marks})',
+            [min_created, *chunk]
+        ).fetchall()
+        for row in rows:
+            if content_hashes[row['video_id']] == row['content_hash']:
+                cached[row['video_id']] = json.loads(row['analysis'])
+    return cached
+
+def save_cached_analyses(entries):
+    """entries: iterable of (video_id, content_hash, analysis dict)."""
+    now = int(time.time())
+    rows = [(vid, content_hash, json.dumps(analysis), now) for vid, content_hash, analysis in entries]
+    if not rows:
+        return
+    conn = get_db_connection()
+    with conn:
+        conn.executemany(
+            'INSERT OR REPLACE INTO ai_analysis_cache (video_id, content_hash, analysis, created_at) '
+            'VALUES (?, ?, ?, ?)', rows
+        )
+
+# -------------------------------------------------------------------
+# On-demand video lookups (/analyze)
+# -------------------------------------------------------------------
+def get_video_lookups(video_ids, max_age):
+    """Returns {video_id: result} for lookups younger than max_age seconds."""
+    results = {}
+    min_created = int(time.time() - max_age)
+    conn = get_db_connection()
+    for chunk in _chunks(list(dict.fromkeys(video_ids))):
+        marks = ', '.join('?' for _ in chunk)
+        rows = conn.execute(
+            f'SELECT video_id, result FROM video_lookups WHERE created_at >= ? AND video_id IN ({marks})',
+            [min_created, *chunk]
+        ).fetchall()
+        results.update((row['video_id'], json.loads(row['result'])) for row in rows)
+    return results
+
+def save_video_lookups(results):
+    """results: {video_id: result dict}."""
+    now = int(time.time())
+    rows = [(vid, json.dumps(result), now) for vid, result in results.items()]
+    if not rows:
+        return
+    conn = get_db_connection()
+    with conn:
+        conn.executemany(
+            'INSERT OR REPLACE INTO video_lookups (video_id, result, created_at) VALUES (?, ?, ?)', rows
+        )
+
+# -------------------------------------------------------------------
+# Email digest
+# -------------------------------------------------------------------
+def add_digest_entry(selection, total_videos):
+    """selection: {category: [trimmed video dicts]} of one cycle."""
+    conn = get_db_connection()
+    with conn:
+        conn.execute(
+            'INSERT INTO email_digest (created_at, total_videos, selection) VALUES (?, ?, ?)',
+            (time.time(), total_videos, json.dumps(selection))
+        )
+
+def get_digest_entries():
+    """Pending digest entries, oldest first."""
+    conn = get_db_connection()
+    rows = conn.execute('SELECT id, created_at, total_videos, selection FROM email_digest ORDER BY id').fetchall()
+    return [{**dict(row), 'selection': json.loads(row['selection'])} for row in rows]
+
+def delete_digest_entries(up_to_id):
+    conn = get_db_connection()
+    with conn:
+        conn.execute('DELETE FROM email_digest WHERE id <= ?', (up_to_id,))
+
+# -------------------------------------------------------------------
+# Email outbox
+# -------------------------------------------------------------------
+def enqueue_emails(messages, video_ids=(), digest_up_to=None):
+    """
+    Stores messages ({key, recipient, subject, html, text, body_id}) for
+    delivery. Messages with the same body_id share one stored body. A key
+    that is already in the outbox is skipped, so re-queuing the same message
+    is harmless. In the same transaction video_ids are marked sent and digest
+    entries up to digest_up_to are cleared. Returns how many messages were new.
+    """
+    now = time.time()
+    conn = get_db_connection()
+    with conn:
+        bodies = {m['body_id']: (m['html'], m.get('text')) for m in messages if m.get('body_id')}
+        conn.executemany(
+            'INSERT OR IGNORE INTO email_bodies (id, html, text) VALUES (?, ?, ?)',
+            [(body_id, html, text) for body_id, (html, text) in bodies.items()]
+        )
+        before = conn.total_changes
+        conn.executemany('''
+            INSERT OR IGNORE INTO email_outbox
+                (idempotency_key, recipient, subject, html, text, body_id, next_attempt_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (m['key'], m['recipient'], m['subject'],
+             '' if m.get('body_id') else m['html'], None if m.get('body_id') else m.get('text'),
+             m.get('body_id'), now, now)
+            for m in messages
+        ])
+        created = conn.total_changes - before
+        ids = [(vid,) for vid in set(video_ids)]
+        if ids:
+            conn.executemany('UPDATE videos SET is_sent = 1 WHERE video_id = ?', ids)
+            _bump_generation(conn)
+        if digest_up_to is not None:
+            conn.execute('DELETE FROM email_digest WHERE id <= ?', (digest_up_to,))
+    return created
+
+def claim_due_emails(limit, stale_after, now=None):
+    """
+    Moves up to `limit` due messages to 'sending' and returns them (oldest
+    first). Messages left in 'sending' longer than stale_after seconds belong
+    to a sender that died and are claimed again.
+    """
+    now = now or time.time()
+    conn = get_db_connection()
+    with conn:
+        rows = conn.execute('''
+            UPDATE email_outbox SET status = 'sending', claimed_at = ?
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= ?)
+                   OR (status = 'sending' AND claimed_at < ?)
+                ORDER BY next_attempt_at, id LIMIT ?
+            )
+            RETURNING id, idempotency_key, recipient, subject, html, text, body_id, attempts
+        ''', (now, now, now - stale_after, limit)).fetchall()
+    messages = sorted((dict(row) for row in rows), key=lambda m: m['id'])
+    body_ids = list({m['body_id'] for m in messages if m['body_id']})
+    if body_ids:
+        placeholders = ','.join('?' * len(body_ids))
+        bodies = {
+            row['id']: row for row in
+            conn.execute(f'SELECT id, html, text FROM email_bodies WHERE id IN ({placeholders})', body_ids)
+        }
+        for m in messages:
+            if m['body_id'] in bodies:
+                m['html'], m['text'] = bodies[m['body_id']]['html'], bodies[m['body_id']]['text']
+    return messages
+
+def mark_email_sent(email_id, now=None):
+    conn = get_db_connection()
+    with conn:
+        conn.execute(
+            "UPDATE email_outbox SET status = 'sent', attempts = attempts + 1, sent_at = ?, last_error = NULL WHERE id = ?",
+            (now or time.time(), email_id)
+        )
+
+def mark_email_failed(email_id, error, next_attempt_at=None):
+    """Records a failed attempt; retried at next_attempt_at, or given up on if None."""
+    conn = get_db_connection()
+    with conn:
+        conn.execute('''
+            UPDATE email_outbox SET status = ?, attempts = attempts + 1, next_attempt_at = COALESCE(?, next_attempt_at),
+                claimed_at = NULL, last_error = ?
+            WHERE id = ?
+        ''', ('pending' if next_attempt_at is not None else 'failed', next_attempt_at, error, email_id))
+
+def next_email_due():
+    """Time of the next pending delivery attempt (None if the outbox is empty)."""
+    conn = get_db_connection()
+    row = conn.execute("SELECT MIN(next_attempt_at) FROM email_outbox WHERE status = 'pending'").fetchone()
+    return row[0]
+
+def prune_outbox(days=7):
+    """Drops sent/failed messages older than `days`, and bodies no message uses any more."""
+    conn = get_db_connection()
+    with conn:
+        conn.execute(
+            "DELETE FROM email_outbox WHERE status IN ('sent', 'failed') AND created_at < ?",
+            (time.time() - days * 86400,)
+        )
+        conn.execute('DELETE FROM email_bodies WHERE id NOT IN (SELECT body_id FROM email_outbox WHERE body_id IS NOT NULL)')
+
+def get_outbox_counts():
+    conn = get_db_connection()
+    rows = conn.execute('SELECT status, COUNT(*) FROM email_outbox GROUP BY status').fetchall()
+    return {status: count for status, count in rows}
+
+# -------------------------------------------------------------------
+# Subscribers
+# -------------------------------------------------------------------
+SUBSCRIBER_FILTERS = ('categories', 'regions', 'trend_types')
+
+def _subscriber_dict(row):
+    subscriber = dict(row)
+    for field in SUBSCRIBER_FILTERS:
+        subscriber[field] = json.loads(subscriber[field]) if subscriber[field] else None
+    subscriber['active'] = bool(subscriber['active'])
+    return subscriber
+
+def upsert_subscriber(email, categories=None, regions=None, trend_types=None, min_viral_probability=0, active=True):
+    """Adds a subscriber or replaces its filters. Empty or None filters match everything."""
+    filters = [json.dumps(list(values)) if values else None for values in (categories, regions, trend_types)]
+    conn = get_db_connection()
+    with conn:
+        conn.execute('''
+            INSERT INTO subscribers (email, categories, regions, trend_types, min_viral_probability, active, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(email) DO UPDATE SET
+                categories = excluded.categories, regions = excluded.regions, trend_types = excluded.trend_types,
+                min_viral_probability = excluded.min_viral_probability, active = excluded.active
+        ''', (email, *filters, min_viral_probability or 0, int(active), int(time.time())))
+    return get_subscriber(email)
+
+def get_subscriber(email):
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM subscribers WHERE email = ?', (email,)).fetchone()
+    return _subscriber_dict(row) if row else None
+
+def get_subscribers(active_only=True):
+    conn = get_db_connection()
+    query = 'SELECT * FROM subscribers' + (' WHERE active = 1' if active_only else '') + ' ORDER BY id'
+    return [_subscriber_dict(row) for row in conn.execute(query)]
+
+def delete_subscriber(email):
+    """Returns True if the subscriber existed."""
+    conn = get_db_connection()
+    with conn:
+        return conn.execute('DELETE FROM subscribers WHERE email = ?', (email,)).rowcount > 0
+
+# -------------------------------------------------------------------
+# Cycle run records
+# -------------------------------------------------------------------
+def _cycle_run_dict(row):
+    run = dict(row)
+    for field in ('timings', 'counters'):
+        run[field] = json.loads(run[field]) if run[field] else {}
+    return run
+
+def save_cycle_run(started_at, summary, counters=None, keep=2000):
+    """Stores one cycle's summary and drops all but the newest `keep` records. Returns its id."""
+    conn = get_db_connection()
+    with conn:
+        cur = conn.execute('''
+            INSERT INTO cycle_runs (started_at, duration, fetched, new_candidates, emailed, quota_used, timings, counters)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            started_at, summary['timings'].get('total', 0), summary.get('fetched'), summary.get('new_candidates'),
+            summary.get('emailed'), summary.get('quota_used'), json.dumps(summary['timings']),
+            json.dumps(counters or {}),
+        ))
+        conn.execute('DELETE FROM cycle_runs WHERE id <= ?', (cur.lastrowid - keep,))
+    return cur.lastrowid
+
+def get_cycle_runs(limit=20):
+    """Newest first."""
+    conn = get_db_connection()
+    rows = conn.execute('SELECT * FROM cycle_runs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+    return [_cycle_run_dict(row) for row in rows]
+
+# -------------------------------------------------------------------
+# Cycle jobs and lease locks (shared by the API and worker processes)
+# -------------------------------------------------------------------
+def _job_dict(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job['summary'] = json.loads(job['summary']) if job['summary'] else None
+    return job
+
+def get_job(job_id):
+    conn = get_db_connection()
+    return _job_dict(conn.execute('SELECT * FROM cycle_jobs WHERE id = ?', (job_id,)).fetchone())
+
+def get_active_job():
+    """The queued or running job, if any (oldest first)."""
+    conn = get_db_connection()
+    row = conn.execute(
+        "SELECT * FROM cycle_jobs WHERE status IN ('queued', 'running') ORDER BY id LIMIT 1"
+    ).fetchone()
+    return _job_dict(row)
+
+def enqueue_job(trigger):
+    """
+    Requests a cycle. If one is already queued or running the request coalesces
+    into it; the insert-unless-active is one statement, so it is atomic across
+    threads and processes. Returns (job, created).
+    """
+    conn = get_db_connection()
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO cycle_jobs (status, trigger, requested_at) "
+            "SELECT 'queued', ?, ? WHERE NOT EXISTS "
+            "(SELECT 1 FROM cycle_jobs WHERE status IN ('queued', 'running'))",
+            (trigger, int(time.time()))
+        )
+    return get_active_job(), cur.rowcount == 1
+
+def claim_next_job():
+    """Moves the oldest queued job to running and returns it (None if nothing is queued)."""
+    conn = get_db_connection()
+    row = conn.execute("SELECT id FROM cycle_jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+    if row is None:
+        return None
+    with conn:
+        cur = conn.execute(
+            "UPDATE cycle_jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+            (int(time.time()), row['id'])
+        )
+    return get_job(row['id']) if cur.rowcount == 1 else None
+
+def finish_job(job_id, status, summary=None, error=None):
+    conn = get_db_connection()
+    with conn:
+        conn.execute(
+            'UPDATE cycle_jobs SET status = ?, finished_at = ?, summary = ?, error = ? WHERE id = ?',
+            (status, int(time.time()), json.dumps(summary) if summary is not None else None, error, job_id)
+        )
+
+def fail_orphaned_jobs(reason):
+    """Marks jobs left 'running' by a holder whose lease expired as failed."""
+    conn = get_db_connection()
+    with conn:
+        cur = conn.execute(
+            "UPDATE cycle_jobs SET status = 'failed', finished_at = ?, error = ? WHERE status = 'running'",
+            (int(time.time()), reason)
+        )
+    return cur.rowcount
+
+def acquire_lease(name, owner, ttl):
+    """
+    Takes (or renews) the named lease for `owner` for ttl seconds. Succeeds only
+    if the lease is free, expired or already held by owner. Returns True/False.
+    """
+    now = time.time()
+    conn = get_db_connection()
+    with conn:
+        cur = conn.execute(
+            'INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+            'WHERE leases.expires_at < ? OR leases.owner = excluded.owner',
+            (name, owner, now + ttl, now)
+        )
+    return cur.rowcount == 1
+
+def lease_is_held(name):
+    conn = get_db_connection()
+    row = conn.execute('SELECT 1 FROM leases WHERE name = ? AND expires_at >= ?', (name, time.time())).fetchone()
+    return row is not None
+
+def release_lease(name, owner):
+    conn = get_db_connection()
+    with conn:
+        conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
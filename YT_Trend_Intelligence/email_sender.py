@@ -1,157 +1,515 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.utils import formatdate
 import os
+import time
+import hashlib
 import datetime
+from html import escape
 from dotenv import load_dotenv
 
+import backends
+import database
+
 load_dotenv()
 
 EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 
-def generate_viral_email_html(categories_data, total_videos):
+# Gmail by default; point at a local debugging server with SMTP_SSL=0
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "1") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# A connection idle for longer is checked with NOOP before reuse
+SMTP_IDLE_CHECK = float(os.getenv("SMTP_IDLE_CHECK", "60"))
+
+# Digest mode: collect this many cycles into one email (1 = an email per cycle)
+EMAIL_DIGEST_CYCLES = int(os.getenv("EMAIL_DIGEST_CYCLES", "1"))
+# ...or send once the oldest collected cycle is this many seconds old (0 = off)
+EMAIL_DIGEST_MAX_AGE = int(os.getenv("EMAIL_DIGEST_MAX_AGE", "0"))
+
+def _region_label():
+    return os.getenv("REGION_CODES") or os.getenv("REGION_CODE", "IN")
+
+# -------------------------------------------------------------------
+# Templates: str.format strings (parsed by C code at render time); rendering
+# appends pieces to a list that is joined once, so cost stays linear in the
+# number of videos. Text taken from videos is HTML-escaped. No indentation
+# inside the templates: Gmail clips messages over ~100 KB.
+# -------------------------------------------------------------------
+EMAIL_STYLE = """
+body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #121212; color: #ffffff; padding: 20px; }
+.container { max-width: 800px; margin: 0 auto; background-color: #1e1e1e; border-radius: 10px; overflow: hidden; }
+.header { background-color: #ff0000; padding: 20px; text-align: center; }
+.header h1 { margin: 0; color: white; }
+.stats { background-color: #2d2d2d; padding: 10px; text-align: center; font-size: 0.9em; }
+.category-section { padding: 20px; border-bottom: 1px solid #333; }
+.category-title { color: #ff4d4d; border-bottom: 2px solid #ff4d4d; padding-bottom: 5px; margin-bottom: 15px; }
+.video-card { background-color: #252525; margin-bottom: 15px; padding: 15px; border-radius: 8px; display: flex; gap: 15px; }
+.thumbnail { flex: 0 0 160px; }
+.thumbnail img { width: 100%; border-radius: 5px; }
+.content { flex: 1; }
+.video-title { margin: 0 0 5px 0; font-size: 1.1em; color: #4dabf7; text-decoration: none; display: block; }
+.channel { color: #aaa; font-size: 0.85em; margin-bottom: 8px; }
+.metrics { display: flex; gap: 15px; font-size: 0.85em; color: #ccc; margin-bottom: 10px; }
+.badge { padding: 3px 8px; border-radius: 4px; font-size: 0.75em; font-weight: bold; }
+.badge-exploding { background-color: #e03131; color: white; }
+.badge-rising { background-color: #f08c00; color: white; }
+.badge-steady { background-color: #2f9e44; color: white; }
+.badge-short { background-color: #1098ad; color: white; }
+.badge-news { background-color: #5c7cfa; color: white; }
+.badge-gaming { background-color: #be4bdb; color: white; }
+.ai-insight { background-color: #333; padding: 10px; border-radius: 5px; font-size: 0.9em; border-left: 3px solid #ffd43b; }
+.footer { text-align: center; padding: 20px; color: #666; font-size: 0.8em; }
+"""
+
+HTML_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<style>{style}</style>
+</head>
+<body>
+<div class="container">
+<div class="header">
+<h1>🚀 YouTube Viral Pulse</h1>
+</div>
+<div class="stats">
+Region: {region} | Videos Analyzed: {total_videos}{cycles} | Time: {timestamp}
+</div>
+"""
+
+HTML_EMPTY = """<div style="padding: 40px; text-align: center; color: #888;">
+<h3>No significant viral spikes detected in this cycle.</h3>
+<p>Monitoring continues...</p>
+</div>
+"""
+
+HTML_CATEGORY_OPEN = """<div class="category-section">
+<h2 class="category-title">{category}</h2>
+"""
+
+HTML_CATEGORY_CLOSE = "</div>"
+
+HTML_LEADER_TAG = '<span style="color:#ffd43b;">👑 Category Leader</span><br>'
+
+HTML_VIDEO = """<div class="video-card">
+<div class="thumbnail">
+<a href="{url}">
+<img src="{thumbnail_url}" alt="Thumbnail">
+</a>
+</div>
+<div class="content">
+{leader_tag}
+<a href="{url}" class="video-title">{title}</a>
+<div class="channel">{channel_title}</div>
+<div class="metrics">
+<span>👀 {views}</span>
+<span>👍 {likes}</span>
+<span>💬 {comments}</span>
+<span>⚡ Score: {score}</span>
+</div>
+<div style="margin-bottom: 8px;">
+<span class="badge {badge_class}">{trend_type}</span>
+<span class="badge" style="background-color: #444;">Viral Prob: {viral_score}%</span>
+</div>
+<div class="ai-insight">
+<strong>AI Insight:</strong> {why_trending}<br>
+<small>Trigger: {emotional_trigger} | Audience: {target_audience}</small>
+</div>
+</div>
+</div>
+"""
+
+HTML_FOOT = """<div class="footer">
+Automated Report by Autonomous Real-Time YouTube Trend Intelligence System
+</div>
+</div>
+</body>
+</html>
+"""
+
+TEXT_VIDEO = """{rank}. {title}
+   {channel_title} | {trend_type} | Viral Prob: {viral_score}% | Score: {score}
+   Views: {views}  Likes: {likes}  Comments: {comments}
+   Why: {why_trending}
+   {url}
+"""
+
+def badge_class(trend_type):
+    if 'Exploding' in trend_type: return 'badge-exploding'
+    if 'Fast' in trend_type: return 'badge-rising'
+    if 'Short' in trend_type: return 'badge-short'
+    if 'Gaming' in trend_type: return 'badge-gaming'
+    if 'News' in trend_type: return 'badge-news'
+    return 'badge-steady'
+
+# Fields that carry free text from YouTube or the model (numbers need no escaping)
+TEXT_FIELDS = ('thumbnail_url', 'title', 'channel_title', 'trend_type', 'why_trending',
+               'emotional_trigger', 'target_audience')
+
+def _video_fields(video):
+    """Raw (unescaped) template values for one video."""
+    ai_data = video.get('ai_analysis') or {}
+    return {
+        'url': f"https://youtu.be/{video['video_id']}",
+        'thumbnail_url': video.get('thumbnail_url') or '',
+        'title': video['title'],
+        'channel_title': video['channel_title'],
+        'views': f"{video['view_count']:,}",
+        'likes': f"{video['like_count']:,}",
+        'comments': f"{video['comment_count']:,}",
+        'score': int(video.get('engagement_score') or 0),
+        'trend_type': video.get('trend_type') or 'Regular',
+        'viral_score': ai_data.get('viral_score', 0),
+        'why_trending': str(ai_data.get('why_trending', 'N/A')),
+        'emotional_trigger': str(ai_data.get('emotional_trigger', 'N/A')),
+        'target_audience': str(ai_data.get('target_audience', 'N/A')),
+    }
+
+def _html_head(total_videos, cycles=None, timestamp=None, region=None):
+    return HTML_HEAD.format(
+        style=EMAIL_STYLE, region=escape(region or _region_label()), total_videos=total_videos,
+        cycles=f" | Cycles: {cycles}" if cycles else "",
+        timestamp=timestamp or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    )
+
+def _text_head(total_videos, cycles=None, timestamp=None, region=None):
+    timestamp = timestamp or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return (
+        "YouTube Viral Pulse\n"
+        f"Region: {region or _region_label()} | Videos Analyzed: {total_videos}"
+        f"{f' | Cycles: {cycles}' if cycles else ''} | Time: {timestamp}\n\n"
+    )
+
+TEXT_EMPTY = "No significant viral spikes detected in this cycle.\nMonitoring continues...\n"
+TEXT_FOOT = "Automated Report by Autonomous Real-Time YouTube Trend Intelligence System\n"
+
+def render_category_html(category, videos, out):
+    """Appends one category section (escaped) to the list `out`."""
+    out.append(HTML_CATEGORY_OPEN.format(category=escape(category)))
+    render_video = HTML_VIDEO.format_map
+    for idx, video in enumerate(videos):
+        fields = _video_fields(video)
+        for key in TEXT_FIELDS:
+            fields[key] = escape(fields[key])
+        fields['url'] = escape(fields['url'])
+        fields['badge_class'] = badge_class(video.get('trend_type') or 'Regular')
+        fields['leader_tag'] = HTML_LEADER_TAG if idx == 0 else ''
+        out.append(render_video(fields))
+    out.append(HTML_CATEGORY_CLOSE)
+    return out
+
+def render_category_text(category, videos, out):
+    out.append(f"== {category} ==\n")
+    for idx, video in enumerate(videos, start=1):
+        out.append(TEXT_VIDEO.format(rank=idx, **_video_fields(video)))
+    out.append("\n")
+    return out
+
+def render_viral_email_html(categories_data, total_videos, out=None, cycles=None, timestamp=None):
+    """
+    Appends the HTML report to `out` (a list, created if None) and returns it.
+    Every text value taken from a video is HTML-escaped.
+    """
+    out = [] if out is None else out
+    out.append(_html_head(total_videos, cycles, timestamp))
+    if not any(categories_data.values()):
+        out.append(HTML_EMPTY)
+    for category, videos in categories_data.items():
+        if videos:
+            render_category_html(category, videos, out)
+    out.append(HTML_FOOT)
+    return out
+
+def generate_viral_email_html(categories_data, total_videos, cycles=None):
     """
     Generates structured HTML email for viral trends.
     """
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #121212; color: #ffffff; padding: 20px; }}
-            .container {{ max-width: 800px; margin: 0 auto; background-color: #1e1e1e; border-radius: 10px; overflow: hidden; }}
-            .header {{ background-color: #ff0000; padding: 20px; text-align: center; }}
-            .header h1 {{ margin: 0; color: white; }}
-            .stats {{ background-color: #2d2d2d; padding: 10px; text-align: center; font-size: 0.9em; }}
-            .category-section {{ padding: 20px; border-bottom: 1px solid #333; }}
-            .category-title {{ color: #ff4d4d; border-bottom: 2px solid #ff4d4d; padding-bottom: 5px; margin-bottom: 15px; }}
-            .video-card {{ background-color: #252525; margin-bottom: 15px; padding: 15px; border-radius: 8px; display: flex; gap: 15px; }}
-            .thumbnail {{ flex: 0 0 160px; }}
-            .thumbnail img {{ width: 100%; border-radius: 5px; }}
-            .content {{ flex: 1; }}
-            .video-title {{ margin: 0 0 5px 0; font-size: 1.1em; color: #4dabf7; text-decoration: none; display: block; }}
-            .channel {{ color: #aaa; font-size: 0.85em; margin-bottom: 8px; }}
-            .metrics {{ display: flex; gap: 15px; font-size: 0.85em; color: #ccc; margin-bottom: 10px; }}
-            .badge {{ padding: 3px 8px; border-radius: 4px; font-size: 0.75em; font-weight: bold; }}
-            .badge-exploding {{ background-color: #e03131; color: white; }}
-            .badge-rising {{ background-color: #f08c00; color: white; }}
-            .badge-steady {{ background-color: #2f9e44; color: white; }}
-            .badge-short {{ background-color: #1098ad; color: white; }}
-            .badge-news {{ background-color: #5c7cfa; color: white; }}
-            .badge-gaming {{ background-color: #be4bdb; color: white; }}
-            .ai-insight {{ background-color: #333; padding: 10px; border-radius: 5px; font-size: 0.9em; border-left: 3px solid #ffd43b; }}
-            .footer {{ text-align: center; padding: 20px; color: #666; font-size: 0.8em; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>🚀 YouTube Viral Pulse</h1>
-            </div>
-            <div class="stats">
-                Region: IN | Videos Analyzed: {total_videos} | Time: {timestamp}
-            </div>
-    """
-    
-    if not categories_data:
-        html += """
-        <div style="padding: 40px; text-align: center; color: #888;">
-            <h3>No significant viral spikes detected in this cycle.</h3>
-            <p>Monitoring continues...</p>
-        </div>
+    return ''.join(render_viral_email_html(categories_data, total_videos, cycles=cycles))
+
+def generate_viral_email_text(categories_data, total_videos, cycles=None):
+    """
+    Plain-text alternative of the report, for clients that don't render HTML.
+    """
+    out = [_text_head(total_videos, cycles)]
+    if not any(categories_data.values()):
+        out.append(TEXT_EMPTY)
+    for category, videos in categories_data.items():
+        if videos:
+            render_category_text(category, videos, out)
+    out.append(TEXT_FOOT)
+    return ''.join(out)
+
+# -------------------------------------------------------------------
+# Subscriber fan-out: every (category, filters) section is rendered once and
+# shared by all subscribers with those filters; whole bodies are shared by
+# subscribers with the same categories too.
+# -------------------------------------------------------------------
+def _name_match(label, names):
+    # Trend labels carry an emoji prefix ("🔥 Exploding"), so match on the name
+    return any(name.lower() in (label or '').lower() for name in names)
+
+def video_matches(video, regions=None, trend_types=None, min_viral_probability=0):
+    if regions and not set(regions) & set(video.get('regions') or ()):
+        return False
+    if trend_types and not _name_match(video.get('trend_type'), trend_types):
+        return False
+    return (video.get('viral_probability') or 0) >= (min_viral_probability or 0)
+
+def _filters(subscriber):
+    """Hashable video filters of a subscriber (categories are handled per section)."""
+    return (
+        tuple(sorted(subscriber.get('regions') or ())),
+        tuple(sorted(subscriber.get('trend_types') or ())),
+        subscriber.get('min_viral_probability') or 0,
+    )
+
+class FanOut:
+    """
+    Composes per-subscriber reports for one selection ({category: [videos]}).
+    Sections and bodies are cached by filters, so the render cost grows with
+    the number of distinct filter sets, not with the number of subscribers.
+    """
+
+    def __init__(self, categories_data, total_videos, cycles=None, timestamp=None):
+        self.categories_data = {c: v for c, v in categories_data.items() if v}
+        self.total_videos = total_videos
+        self.cycles = cycles
+        self.timestamp = timestamp or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.sections = {} # (category, filters) -> (html, text, video_ids) or None
+        self.bodies = {} # (categories, filters) -> body dict or None
+        self.section_renders = 0
+
+    def section(self, category, filters):
+        key = (category, filters)
+        if key not in self.sections:
+            regions, trend_types, min_viral = filters
+            videos = [v for v in self.categories_data.get(category, ())
+                      if video_matches(v, regions, trend_types, min_viral)]
+            if videos:
+                self.section_renders += 1
+                self.sections[key] = (
+                    ''.join(render_category_html(category, videos, [])),
+                    ''.join(render_category_text(category, videos, [])),
+                    [v['video_id'] for v in videos],
+                )
+            else:
+                self.sections[key] = None
+        return self.sections[key]
+
+    def body(self, subscriber, send_empty=False):
         """
-    else:
-        for category, videos in categories_data.items():
-            if not videos: continue
-            
-            html += f"""
-            <div class="category-section">
-                <h2 class="category-title">{category}</h2>
-            """
-            
-            for idx, video in enumerate(videos):
-                # Badge Logic
-                trend_type = video.get('trend_type', 'Regular')
-                badge_class = 'badge-steady'
-                if 'Exploding' in trend_type: badge_class = 'badge-exploding'
-                elif 'Fast' in trend_type: badge_class = 'badge-rising'
-                elif 'Short' in trend_type: badge_class = 'badge-short'
-                elif 'Gaming' in trend_type: badge_class = 'badge-gaming'
-                elif 'News' in trend_type: badge_class = 'badge-news'
-                
-                # AI Insights
-                ai_data = video.get('ai_analysis', {})
-                why_trending = ai_data.get('why_trending', 'N/A')
-                viral_score = ai_data.get('viral_score', 0)
-                
-                leader_tag = '<span style="color:#ffd43b;">👑 Category Leader</span><br>' if idx == 0 else ''
-                
-                html += f"""
-                <div class="video-card">
-                    <div class="thumbnail">
-                        <a href="https://youtu.be/{video['video_id']}">
-                            <img src="{video['thumbnail_url']}" alt="Thumbnail">
-                        </a>
-                    </div>
-                    <div class="content">
-                        {leader_tag}
-                        <a href="https://youtu.be/{video['video_id']}" class="video-title">{video['title']}</a>
-                        <div class="channel">{video['channel_title']}</div>
-                        
-                        <div class="metrics">
-                            <span>👀 {video['view_count']:,}</span>
-                            <span>👍 {video['like_count']:,}</span>
-                            <span>💬 {video['comment_count']:,}</span>
-                            <span>⚡ Score: {int(video.get('engagement_score', 0))}</span>
-                        </div>
-                        
-                        <div style="margin-bottom: 8px;">
-                            <span class="badge {badge_class}">{trend_type}</span>
-                            <span class="badge" style="background-color: #444;">Viral Prob: {viral_score}%</span>
-                        </div>
-                        
-                        <div class="ai-insight">
-                            <strong>AI Insight:</strong> {why_trending}<br>
-                            <small>Trigger: {ai_data.get('emotional_trigger', 'N/A')} | Audience: {ai_data.get('target_audience', 'N/A')}</small>
-                        </div>
-                    </div>
-                </div>
-                """
-            html += "</div>"
-            
-    html += """
-            <div class="footer">
-                Automated Report by Autonomous Real-Time YouTube Trend Intelligence System
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    return html
-
-def send_email(subject, html_content, recipient_email):
-    """
-    Sends HTML email using SMTP.
+        {'body_id', 'html', 'text', 'video_ids'} for the subscriber, or None
+        when nothing matches their filters (unless send_empty).
+        """
+        filters = _filters(subscriber)
+        wanted = subscriber.get('categories')
+        categories = tuple(c for c in self.categories_data if not wanted or _name_match(c, wanted))
+        key = (categories, filters, send_empty)
+        if key not in self.bodies:
+            sections = [s for s in (self.section(c, filters) for c in categories) if s]
+            if not sections and not send_empty:
+                self.bodies[key] = None
+            else:
+                region = ', '.join(filters[0]) or None
+                html = [_html_head(self.total_videos, self.cycles, self.timestamp, region)]
+                text = [_text_head(self.total_videos, self.cycles, self.timestamp, region)]
+                if not sections:
+                    html.append(HTML_EMPTY)
+                    text.append(TEXT_EMPTY)
+                html.extend(s[0] for s in sections)
+                text.extend(s[1] for s in sections)
+                html.append(HTML_FOOT)
+                text.append(TEXT_FOOT)
+                html, text = ''.join(html), ''.join(text)
+                self.bodies[key] = {
+                    'body_id': message_key('body', html, text),
+                    'html': html, 'text': text,
+                    'video_ids': [vid for s in sections for vid in s[2]],
+                }
+        return self.bodies[key]
+
+def alert_recipients(owner=None):
     """
+    Active subscribers, plus the owner (EMAIL_USER) with no filters unless
+    the owner has a subscriber row. The owner also gets "no spikes" reports.
+    """
+    owner = owner or EMAIL_USER
+    subscribers = database.get_subscribers()
+    if owner and not any(s['email'] == owner for s in subscribers):
+        subscribers.append({'email': owner, 'send_empty': True})
+    return subscribers
+
+def build_alert_messages(fanout, recipients, subject, key_parts):
+    """Outbox messages for every recipient with something to read (see FanOut)."""
+    messages = []
+    for subscriber in recipients:
+        body = fanout.body(subscriber, subscriber.get('send_empty', False))
+        if body is None:
+            continue
+        messages.append({
+            'key': message_key(*key_parts, subscriber['email']),
+            'recipient': subscriber['email'], 'subject': subject,
+            'html': body['html'], 'text': body['text'], 'body_id': body['body_id'],
+        })
+    return messages
+
+# -------------------------------------------------------------------
+# Digest: several cycles' selections, persisted until delivered
+# -------------------------------------------------------------------
+DIGEST_FIELDS = (
+    'video_id', 'title', 'channel_title', 'thumbnail_url', 'view_count', 'like_count',
+    'comment_count', 'engagement_score', 'trend_type', 'ai_analysis', 'regions', 'viral_probability',
+)
+
+def merge_digest(entries):
+    """
+    Folds digest entries (oldest first) into one {category: [videos]}. A video
+    selected in several cycles appears once, with its latest numbers.
+    """
+    latest = {}
+    for entry in entries:
+        for category, videos in entry['selection'].items():
+            for video in videos:
+                latest.pop(video['video_id'], None) # re-insert so the latest cycle wins
+                latest[video['video_id']] = (category, video)
+    merged = {}
+    for category, video in latest.values():
+        merged.setdefault(category, []).append(video)
+    for videos in merged.values():
+        videos.sort(key=lambda v: v.get('engagement_score', 0), reverse=True)
+    return merged
+
+def add_to_digest(categories_data, total_videos, recipient=None, now=None):
+    """
+    Records one cycle's selection and, once EMAIL_DIGEST_CYCLES cycles are
+    collected (or the oldest is EMAIL_DIGEST_MAX_AGE old), queues the digest
+    for every recipient in the outbox; the collected entries are cleared in
+    the same transaction.
+    Returns True if the digest was queued.
+    """
+    now = now or time.time()
+    recipient = recipient or EMAIL_USER
+    selection = {
+        category: [{key: video.get(key) for key in DIGEST_FIELDS} for video in videos]
+        for category, videos in categories_data.items() if videos
+    }
+    database.add_digest_entry(selection, total_videos)
+
+    entries = database.get_digest_entries()
+    age = now - entries[0]['created_at']
+    if len(entries) < EMAIL_DIGEST_CYCLES and not (EMAIL_DIGEST_MAX_AGE and age >= EMAIL_DIGEST_MAX_AGE):
+        print(f"Digest: {len(entries)}/{EMAIL_DIGEST_CYCLES} cycles collected.")
+        return False
+
+    merged = merge_digest(entries)
+    analyzed = sum(entry['total_videos'] for entry in entries)
+    if merged:
+        subject = f"🔥 Viral Trend Digest ({len(entries)} cycles) - {datetime.datetime.now().strftime('%H:%M %p')}"
+    else:
+        subject = f"Viral Trend Digest ({len(entries)} cycles) - No Spikes"
+    fanout = FanOut(merged, analyzed, cycles=len(entries))
+    messages = build_alert_messages(fanout, alert_recipients(recipient), subject, ('digest', entries[-1]['id']))
+    database.enqueue_emails(messages, digest_up_to=entries[-1]['id'])
+    return True
+
+# -------------------------------------------------------------------
+# SMTP transport
+# -------------------------------------------------------------------
+def message_key(*parts):
+    """Idempotency key for an outgoing message, from whatever identifies it."""
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+def build_message(subject, html_content, recipient_email, text_content=None, key=None):
     msg = MIMEMultipart('alternative')
     msg['Subject'] = subject
     msg['From'] = EMAIL_USER
     msg['To'] = recipient_email
-    
-    part = MIMEText(html_content, 'html')
-    msg.attach(part)
-    
+    msg['Date'] = formatdate(localtime=True)
+    if key:
+        # Stable across retries, so a message delivered twice is recognisable
+        msg['Message-ID'] = f"<{key}@yt-trend-intelligence>"
+
+    # Clients show the last alternative they support, so plain text goes first
+    if text_content:
+        msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
+    msg.attach(MIMEText(html_content, 'html', 'utf-8'))
+    return msg
+
+class SMTPConnection:
+    """
+    One authenticated SMTP connection, opened on first use and reused for
+    every message and recipient after that. A dropped connection is
+    reopened once per message; close() when done.
+    """
+
+    def __init__(self, host=None, port=None, use_ssl=None, user=None, password=None, timeout=SMTP_TIMEOUT):
+        self.host = host or SMTP_HOST
+        self.port = port or SMTP_PORT
+        self.use_ssl = SMTP_SSL if use_ssl is None else use_ssl
+        self.user = user or EMAIL_USER
+        self.password = password or EMAIL_PASSWORD
+        self.timeout = timeout
+        self.server = None
+        self.last_used = 0
+        self.connects = 0
+
+    def connect(self):
+        self.close()
+        factory = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        server = factory(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        self.connects += 1
+
+    def _usable(self):
+        if self.server is None:
+            return False
+        if time.monotonic() - self.last_used < SMTP_IDLE_CHECK:
+            return True
+        try:
+            return self.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError): # A stale socket raises, e.g. ConnectionResetError
+            return False
+
+    def send(self, msg):
+        if not self._usable():
+            self.connect()
+        try:
+            self.server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.connect()
+            self.server.send_message(msg)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                self.server.close()
+            self.server = None
+
+def send_email(subject, html_content, recipient_email, text_content=None):
+    """
+    Sends one HTML email right away on its own connection (with a plain-text
+    alternative when given). Cycle reports go through outbox.py instead.
+    """
+    connection = backends.create_mail_connection()
     try:
-        # Using Gmail SMTP
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_USER, recipient_email, msg.as_string())
+        connection.send(build_message(subject, html_content, recipient_email, text_content))
         print(f"Email sent successfully to {recipient_email}")
         return True
     except Exception as e:
         print(f"Failed to send email: {e}")
         return False
+    finally:
+        connection.close()
@@ -0,0 +1,348 @@
+"""
+Deterministic local stand-ins for the three external services, selected
+through backends.py (FETCH_BACKEND / AI_BACKEND / MAIL_BACKEND = fake):
+
+- FakeFetcher: the youtube_client fetch API over synthetic trending charts,
+  with simulated latency, errors and quota (charged like real calls).
+- FakeModel: a Gemini GenerativeModel (generate_content(prompt).text).
+- FakeMailer: an email_sender.SMTPConnection (send(msg), close()).
+
+Everything is seeded, so the same seed gives the same videos, analyses and
+failures in every run.
+"""
+import json
+import math
+import queue
+import random
+import re
+import smtplib
+import threading
+import time
+import datetime
+
+import database
+import telemetry
+import youtube_client
+
+# -------------------------------------------------------------------
+# Synthetic trending data
+# -------------------------------------------------------------------
+# (YouTube categoryId, weight, title templates) roughly like a real chart
+CHART_MIX = (
+    ("24", 24, ["{Name} Reacts To {thing}", "We Tried {thing} For 24 Hours", "{thing} | Official Trailer"]),
+    ("10", 16, ["{Name} - {thing} (Official Video)", "{thing} | Lyrical Song", "{Name} Live Dance Performance"]),
+    ("20", 14, ["{game} Gameplay - {thing}", "I Beat {game} Without {thing}", "{game} Esports Finals Highlights"]),
+    ("25", 12, ["Breaking News: {thing} Live Updates", "{Name} On {thing} | Election Report", "{thing}: Government Responds"]),
+    ("28", 10, ["{gadget} Review - Worth It?", "{gadget} Unboxing & First Look", "AI Can Now Do {thing}"]),
+    ("27", 8, ["Learn {thing} In 10 Minutes", "How To {thing} - Full Tutorial", "{thing} Class 12 Exam Lecture"]),
+    ("22", 8, ["Day In My Life: {thing}", "{Name}'s Vlog - {thing}", "Storytime: {thing}"]),
+    ("17", 5, ["{Name} vs {Name2} | Highlights", "Best {thing} Of The Season"]),
+    ("23", 3, ["Funny {thing} Compilation", "{Name} Prank Gone Wrong"]),
+)
+NAMES = ["Aarav", "Maya", "Leo", "Priya", "Sam", "Zoe", "Kabir", "Nina", "Omar", "Ivy"]
+THINGS = ["The New Update", "Street Food", "A Budget Trip", "Stock Market Crash", "Monsoon", "Space Launch",
+          "Python", "Cricket World Cup", "Crypto", "Wedding Season", "Rain Dance", "Mega Sale"]
+GAMES = ["Minecraft", "GTA 6", "Valorant", "BGMI", "Free Fire", "Roblox"]
+GADGETS = ["iPhone 17", "Galaxy S26", "Pixel 10", "Budget Laptop", "Smartwatch"]
+
+_ID_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+
+def synthetic_video_id(seed, n):
+    """An 11-character YouTube-style ID, the same for the same (seed, n)."""
+    rng = random.Random(f"id:{seed}:{n}")
+    return ''.join(rng.choice(_ID_CHARS) for _ in range(11))
+
+def _iso(ts):
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _category_entry(rng):
+    return rng.choices(CHART_MIX, weights=[entry[1] for entry in CHART_MIX])[0]
+
+def synthetic_category_id(video_id, seed=42):
+    return _category_entry(random.Random(f"video:{seed}:{video_id}"))[0]
+
+def synthetic_video(video_id, now, seed=42, anchor=None):
+    """
+    A full video dict (youtube_client.parse_video shape) for video_id at time
+    `now`. Each video has a fixed publish time (before `anchor`, default now)
+    and view rate, so later calls with the same anchor see higher counts.
+    Views/hour is log-normal, a few videos go past the 100k/h "Exploding"
+    line, and about 1 in 8 is a Short.
+    """
+    rng = random.Random(f"video:{seed}:{video_id}")
+    cat_id, _, templates = _category_entry(rng)
+    title = rng.choice(templates).format(
+        Name=rng.choice(NAMES), Name2=rng.choice(NAMES), thing=rng.choice(THINGS),
+        game=rng.choice(GAMES), gadget=rng.choice(GADGETS),
+    )
+    is_short = rng.random() < 0.12
+    if is_short:
+        title += " #shorts"
+    if rng.random() < 0.05:
+        title += " <Live> & \"Uncut\"" # Markup and quotes, as real titles have
+
+    published = (anchor or now) - rng.uniform(0.5, 72) * 3600
+    age_hours = max((now - published) / 3600, 0.1)
+    views_per_hour = math.exp(rng.gauss(8.5, 1.6)) # median ~5k/h, long tail
+    views = int(views_per_hour * age_hours)
+    like_ratio = rng.uniform(0.01, 0.08)
+    return {
+        'video_id': video_id,
+        'title': title,
+        'channel_title': f"{rng.choice(NAMES)} {rng.choice(['TV', 'Official', 'Gaming', 'News', 'Tech', 'Vlogs'])}",
+        'published_at': _iso(published),
+        'description': f"{title}. Subscribe for more! #trending",
+        'tags': [word.lower() for word in re.findall(r"[A-Za-z]+", title)[:5]],
+        'category_id': cat_id,
+        'duration': f"PT{rng.randint(15, 59)}S" if is_short else f"PT{rng.randint(2, 45)}M{rng.randint(0, 59)}S",
+        'thumbnail_url': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+        'view_count': views,
+        'like_count': int(views * like_ratio),
+        'comment_count': int(views * like_ratio * rng.uniform(0.02, 0.15)),
+    }
+
+def _chart_ids(scope, count, seed, category_id):
+    ids, n = [], 0
+    while len(ids) < count:
+        vid = synthetic_video_id(f"{seed}:{scope}:{category_id}", n)
+        n += 1
+        if category_id is None or synthetic_category_id(vid, seed) == category_id:
+            ids.append(vid)
+    return ids
+
+def synthetic_chart(region, category_id=None, size=200, seed=42, overlap=0.2):
+    """
+    Video IDs of one trending chart (optionally one categoryId). `overlap` of
+    every chart is shared by all regions (global hits), so merging duplicates
+    has work to do.
+    """
+    shared = int(size * overlap)
+    return _chart_ids("global", shared, seed, category_id) + _chart_ids(region, size - shared, seed, category_id)
+
+def generate_trending(regions, size=200, now=None, seed=42, overlap=0.2):
+    """{region: [video dicts]}: whole synthetic charts, e.g. to seed a database."""
+    now = now or time.time()
+    return {
+        region: [dict(synthetic_video(vid, now, seed), regions=[region])
+                 for vid in synthetic_chart(region, None, size, seed, overlap)]
+        for region in regions
+    }
+
+# -------------------------------------------------------------------
+# Fetcher
+# -------------------------------------------------------------------
+class FakeFetcherError(Exception):
+    pass
+
+class FakeFetcher:
+    """
+    Same fetch API as youtube_client (iter_trending_pages, fetch_videos,
+    fetch_statistics) over synthetic charts. Every simulated request sleeps
+    `latency`, fails with probability `error_rate` (deterministic per seed)
+    and is charged against the real daily quota, so QuotaExceededError and
+    the scheduler's quota pacing behave as with the live API.
+    """
+
+    def __init__(self, latency=0.05, error_rate=0.0, seed=42, chart_size=200, overlap=0.2,
+                 max_workers=youtube_client.MAX_WORKERS, clock=time.time):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.chart_size = chart_size
+        self.overlap = overlap
+        self.max_workers = max_workers
+        self.clock = clock
+        self.anchor = clock() # publish times are fixed relative to this, so counts grow
+        self.charts = {}
+        self.random = random.Random(f"errors:{seed}")
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def _request(self, cost=youtube_client.VIDEOS_LIST_COST):
+        # Recorded in telemetry like youtube_client.api_get
+        if not database.consume_quota(youtube_client.quota_day(), cost, youtube_client.DAILY_QUOTA):
+            telemetry.inc('yt_api_requests_total', result='quota_exceeded')
+            raise youtube_client.QuotaExceededError(
+                f"Daily YouTube quota of {youtube_client.DAILY_QUOTA} units reached")
+        telemetry.inc('yt_quota_units_total', cost)
+        with self.lock:
+            self.requests += 1
+            fail = self.random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        with telemetry.timed('yt_api_request_seconds'):
+            time.sleep(self.latency)
+        if fail:
+            telemetry.inc('yt_api_requests_total', result='http_503')
+            raise FakeFetcherError("Simulated YouTube API error (503)")
+        telemetry.inc('yt_api_requests_total', result='ok')
+
+    def iter_chart_pages(self, region, category_id=None, max_pages=youtube_client.MAX_PAGES):
+        """Pages of full video dicts for one chart (one request per page)."""
+        key = (region, category_id)
+        if key not in self.charts:
+            self.charts[key] = synthetic_chart(region, category_id, self.chart_size, self.seed, self.overlap)
+        ids = self.charts[key]
+        per_page = youtube_client.IDS_PER_REQUEST
+        for page in range(min(max_pages, math.ceil(len(ids) / per_page))):
+            self._request()
+            now = self.clock()
+            yield [dict(synthetic_video(vid, now, self.seed, self.anchor), regions=[region])
+                   for vid in ids[page * per_page:(page + 1) * per_page]]
+
+    def iter_trending_pages(self, regions, category_ids=None, max_pages=youtube_client.MAX_PAGES,
+                            max_workers=None, queue_size=8):
+        """Charts fetched concurrently; pages are yielded as they arrive (see youtube_client)."""
+        charts = [(region, cat) for region in regions for cat in (category_ids or [None])]
+        pages_q = queue.Queue(maxsize=queue_size)
+        done = object()
+        stop = threading.Event() # Consumer went away: fetch nothing more
+
+        def fetch_chart(chart_q):
+            try:
+                while not stop.is_set():
+                    try:
+                        region, cat = chart_q.get_nowait()
+                    except queue.Empty:
+                        break
+                    try:
+                        for page in self.iter_chart_pages(region, cat, max_pages):
+                            pages_q.put(page)
+                            if stop.is_set():
+                                break
+                    except Exception as e:
+                        print(f"Error fetching trending videos ({region}, category {cat}): {e}")
+            finally:
+                pages_q.put(done)
+
+        chart_q = queue.Queue()
+        for chart in charts:
+            chart_q.put(chart)
+        workers = max(1, min(max_workers or self.max_workers, len(charts)))
+        for _ in range(workers):
+            threading.Thread(target=fetch_chart, args=(chart_q,), daemon=True).start()
+        finished = 0
+        try:
+            while finished < workers:
+                page = pages_q.get()
+                if page is done:
+                    finished += 1
+                else:
+                    yield page
+        finally:
+            # Consumer stopped early: stop the fetch threads and drain so blocked puts finish
+            stop.set()
+            while finished < workers:
+                if pages_q.get() is done:
+                    finished += 1
+
+    def fetch_videos(self, video_ids, max_workers=None):
+        ids = list(dict.fromkeys(video_ids))
+        for _ in range(math.ceil(len(ids) / youtube_client.IDS_PER_REQUEST)):
+            self._request()
+        now = self.clock()
+        return {vid: synthetic_video(vid, now, self.seed, self.anchor) for vid in ids}
+
+    def fetch_statistics(self, video_ids, max_workers=None):
+        videos = self.fetch_videos(video_ids)
+        return {vid: {k: v[k] for k in ('view_count', 'like_count', 'comment_count')} for vid, v in videos.items()}
+
+# -------------------------------------------------------------------
+# AI model
+# -------------------------------------------------------------------
+BATCH_MARKER = "Videos (JSON):"
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+def fake_analysis(title):
+    return {
+        "why_trending": f"Fake analysis of {title}",
+        "emotional_trigger": "Curiosity",
+        "target_audience": "General",
+        "thumbnail_psychology": "N/A",
+        "title_strategy": "N/A",
+        "predicted_performance": "Up",
+        "viral_score": 70,
+    }
+
+class FakeModel:
+    """
+    Stand-in for a google.generativeai GenerativeModel: same
+    generate_content(prompt).text interface, understands both the single-video
+    and the batch prompt from ai_analyzer.
+
+    latency: seconds per request; item_latency: extra seconds per video in a batch
+    (output tokens); failure_rate: whole-request errors; entry_failure_rate:
+    chance each batch entry comes back invalid. prompt_chars approximates input tokens x4.
+    """
+
+    def __init__(self, latency=0.2, failure_rate=0.0, seed=42, item_latency=0.0, entry_failure_rate=0.0):
+        self.latency = latency
+        self.item_latency = item_latency
+        self.failure_rate = failure_rate
+        self.entry_failure_rate = entry_failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.prompt_chars = 0
+
+    def generate_content(self, prompt):
+        batch = None
+        if BATCH_MARKER in prompt:
+            batch = json.loads(prompt.split(BATCH_MARKER, 1)[1].strip().splitlines()[0])
+
+        with self.lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+            fail = self.random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+            bad_entries = {e["video_id"] for e in batch or [] if self.random.random() < self.entry_failure_rate}
+
+        time.sleep(self.latency + self.item_latency * len(batch or [None]))
+        if fail:
+            raise RuntimeError("Simulated model error (429 / timeout)")
+
+        if batch is None:
+            title = re.search(r"Video Title: (.*)", prompt)
+            return FakeResponse(json.dumps(fake_analysis(title.group(1) if title else "video")))
+
+        entries = []
+        for entry in batch:
+            analysis = {"video_id": entry["video_id"], **fake_analysis(entry["title"])}
+            if entry["video_id"] in bad_entries:
+                analysis["viral_score"] = "very high" # Fails schema validation
+            entries.append(analysis)
+        return FakeResponse(json.dumps(entries))
+
+# -------------------------------------------------------------------
+# Mailer
+# -------------------------------------------------------------------
+class FakeMailer:
+    """
+    Stand-in for email_sender.SMTPConnection. Records what it "sends";
+    error_rate of messages get a 451 (retried by the outbox).
+    """
+
+    def __init__(self, latency=0.01, error_rate=0.0, seed=42):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(f"mail:{seed}")
+        self.lock = threading.Lock()
+        self.sent = [] # (recipient, subject)
+        self.failures = 0
+
+    def send(self, msg):
+        time.sleep(self.latency)
+        with self.lock:
+            if self.random.random() < self.error_rate:
+                self.failures += 1
+                raise smtplib.SMTPDataError(451, b"Simulated temporary failure")
+            self.sent.append((msg['To'], msg['Subject']))
+
+    def close(self):
+        pass
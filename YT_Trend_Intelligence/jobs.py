@@ -0,0 +1,150 @@
+import os
+import socket
+import threading
+import time
+import uuid
+
+import database
+import pipeline
+import scheduler
+import youtube_client
+
+# Only one cycle may run at a time across the API and worker processes. The
+# holder renews the lease while running; a crashed holder's lease just expires.
+CYCLE_LEASE = "cycle"
+JOB_LEASE_TTL = int(os.getenv("JOB_LEASE_TTL", "300"))
+# How often the scheduler checks for cycles queued by other processes while it waits
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+
+ORPHANED_ERROR = "Runner lost its lease (crashed or timed out)"
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_run_lock = threading.Lock() # One runner per process; others leave the queue to it
+_runner_lock = threading.Lock()
+_runner_thread = None
+
+_holding = threading.Event() # Set while this process holds the cycle lease
+_lease_lock = threading.Lock() # Renewals never race a release into re-taking the lease
+_heartbeat_thread = None
+
+def request_cycle(trigger="manual"):
+    """
+    Queues a cycle and returns its job. Triggers that arrive while a job is
+    queued or running coalesce into that job (job['coalesced'] is True).
+    """
+    active = database.get_active_job()
+    if active and active['status'] == 'running' and not database.lease_is_held(CYCLE_LEASE):
+        # Its runner died; don't let new requests coalesce into a dead job
+        database.fail_orphaned_jobs(ORPHANED_ERROR)
+    job, created = database.enqueue_job(trigger)
+    job['coalesced'] = not created
+    if not created:
+        print(f"Cycle request ({trigger}) joined job {job['id']} ({job['status']})")
+    return job
+
+def _heartbeat():
+    """Renews the cycle lease whenever this process holds it; one thread per process."""
+    while True:
+        _holding.wait()
+        time.sleep(JOB_LEASE_TTL / 3)
+        with _lease_lock:
+            if _holding.is_set() and not database.acquire_lease(CYCLE_LEASE, OWNER, JOB_LEASE_TTL):
+                print("Lost the cycle lease while running a job")
+                _holding.clear()
+
+def _start_heartbeat():
+    global _heartbeat_thread
+    with _runner_lock:
+        if _heartbeat_thread is None or not _heartbeat_thread.is_alive():
+            _heartbeat_thread = threading.Thread(target=_heartbeat, daemon=True)
+            _heartbeat_thread.start()
+
+def _release():
+    with _lease_lock:
+        _holding.clear()
+        database.release_lease(CYCLE_LEASE, OWNER)
+
+def _run_job(job, run):
+    print(f"Running cycle job {job['id']} ({job['trigger']})")
+    try:
+        summary = run()
+        database.finish_job(job['id'], 'succeeded', summary=summary)
+    except Exception as e:
+        print(f"Cycle job {job['id']} failed: {e}")
+        database.finish_job(job['id'], 'failed', error=str(e))
+
+def run_pending(run=None):
+    """
+    Runs queued jobs one after another while holding the cycle lease.
+    Returns how many jobs ran; 0 if another runner (this process or another)
+    holds the lease, in which case that runner picks the queue up.
+    """
+    run = run or pipeline.run_cycle
+    if not _run_lock.acquire(blocking=False):
+        return 0
+    ran = 0
+    try:
+        _start_heartbeat()
+        while database.acquire_lease(CYCLE_LEASE, OWNER, JOB_LEASE_TTL):
+            _holding.set()
+            try:
+                # Holding the lease with nothing running here: any 'running' job is orphaned
+                orphaned = database.fail_orphaned_jobs(ORPHANED_ERROR)
+                if orphaned:
+                    print(f"Marked {orphaned} orphaned cycle job(s) as failed")
+                job = database.claim_next_job()
+                while job:
+                    _run_job(job, run)
+                    ran += 1
+                    job = database.claim_next_job()
+            finally:
+                _release()
+            # A request that landed between the last claim and the release would
+            # otherwise wait for the next trigger
+            if database.get_active_job() is None:
+                break
+    finally:
+        _run_lock.release()
+    return ran
+
+def start_runner():
+    """Runs pending jobs on a background thread (no-op if one is already running)."""
+    global _runner_thread
+    with _runner_lock:
+        if _runner_thread is None or not _runner_thread.is_alive():
+            _runner_thread = threading.Thread(target=run_pending, daemon=True)
+            _runner_thread.start()
+
+def run_scheduled_cycle():
+    """
+    One scheduled tick: queues a cycle, runs it if this process gets the lease,
+    and returns its summary (None if paused, failed or run by another process).
+    """
+    if not database.is_bot_active():
+        print("Bot is PAUSED. Skipping cycle.")
+        return None
+    job = request_cycle("schedule")
+    run_pending()
+    job = database.get_job(job['id'])
+    return job['summary'] if job['status'] == 'succeeded' else None
+
+def run_queued():
+    """
+    Runs a job queued by another process (e.g. /run-cycle on an API replica
+    with API_BACKGROUND_JOBS=0) instead of leaving it for the next tick.
+    """
+    job = database.get_active_job()
+    if job and job['status'] == 'queued':
+        run_pending()
+
+def run_schedule_forever(policy=None):
+    """Scheduled cycles with the adaptive policy, plus stats-only refreshes of hot videos."""
+    return scheduler.run_schedule(
+        run_scheduled_cycle,
+        policy or scheduler.AdaptivePolicy(),
+        refresh_hot=pipeline.refresh_hot_videos,
+        quota_left=youtube_client.remaining_quota,
+        poll=run_queued,
+        poll_interval=JOB_POLL_INTERVAL,
+    )
@@ -0,0 +1,165 @@
+import os
+import json
+import asyncio
+import threading
+
+import database
+
+# Size of the ranked list the feed tracks (what the dashboard shows)
+LIVE_FEED_TOP_N = int(os.getenv("LIVE_FEED_TOP_N", "50"))
+# How often the publisher looks for writes made by other processes (worker.py)
+LIVE_FEED_POLL_SECONDS = float(os.getenv("LIVE_FEED_POLL_SECONDS", "5"))
+# Writes within this window are folded into one update
+LIVE_FEED_DEBOUNCE_SECONDS = float(os.getenv("LIVE_FEED_DEBOUNCE_SECONDS", "1"))
+# Messages buffered per client; a client that falls further behind is dropped
+# and gets a fresh snapshot when its EventSource reconnects
+LIVE_FEED_CLIENT_QUEUE = int(os.getenv("LIVE_FEED_CLIENT_QUEUE", "32"))
+
+# Fields whose change is sent as a score update
+SCORE_FIELDS = (
+    'engagement_score', 'viral_probability', 'view_count', 'like_count',
+    'comment_count', 'trend_type', 'view_velocity',
+)
+
+def sse_message(event, data, event_id=None):
+    """Formats one Server-Sent Events message (data already JSON-encoded)."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {data}\n\n"
+
+def diff_top(previous, rows):
+    """
+    Compares the previous ranked list ({video_id: row with 'rank'}) with the
+    new one (rows in rank order). Returns (current, delta) where delta has
+    'new' (full rows), 'moved' (rank changes), 'rescored' (changed score
+    fields only) and 'removed' (IDs that left the list).
+    """
+    current = {}
+    delta = {'new': [], 'moved': [], 'rescored': [], 'removed': []}
+    for rank, row in enumerate(rows, start=1):
+        row = dict(row, rank=rank)
+        current[row['video_id']] = row
+        old = previous.get(row['video_id'])
+        if old is None:
+            delta['new'].append(row)
+            continue
+        if old['rank'] != rank:
+            delta['moved'].append({'video_id': row['video_id'], 'rank': rank, 'previous_rank': old['rank']})
+        changed = {field: row[field] for field in SCORE_FIELDS if row.get(field) != old.get(field)}
+        if changed:
+            delta['rescored'].append({'video_id': row['video_id'], **changed})
+    delta['removed'] = [vid for vid in previous if vid not in current]
+    return current, delta
+
+class Broadcaster:
+    """
+    Keeps the last published top-N list and fans updates out to SSE clients.
+    One DB read and one JSON encode per update, whatever the number of clients.
+    Clients are asyncio queues; publishing is safe from any thread.
+    """
+
+    def __init__(self, top_n=LIVE_FEED_TOP_N, client_queue=LIVE_FEED_CLIENT_QUEUE):
+        self.top_n = top_n
+        self.client_queue = client_queue
+        self.lock = threading.Lock()
+        self.clients = {} # queue -> event loop
+        self.version = 0
+        self.rows = {}
+        self.snapshot = sse_message("snapshot", json.dumps({'version': 0, 'videos': []}), 0)
+        self.refreshes = 0
+
+    def subscribe(self, loop):
+        """Registers a client; returns (queue, snapshot message to send first)."""
+        queue = asyncio.Queue(maxsize=self.client_queue)
+        queue.dropped = False
+        with self.lock:
+            self.clients[queue] = loop
+            return queue, self.snapshot
+
+    def unsubscribe(self, queue):
+        with self.lock:
+            self.clients.pop(queue, None)
+
+    @staticmethod
+    def _offer(queue, message):
+        if queue.dropped:
+            return
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too slow: end its stream rather than buffer without bound
+            queue.dropped = True
+            queue.get_nowait()
+            queue.put_nowait(None)
+
+    def refresh(self):
+        """
+        Re-reads the top-N list once, and if anything changed publishes the
+        delta to every client. Returns the delta (None if nothing changed).
+        """
+        rows = database.get_trending_videos(limit=self.top_n)
+        self.refreshes += 1
+        with self.lock:
+            current, delta = diff_top(self.rows, rows)
+            if not any(delta.values()):
+                return None
+            self.version += 1
+            self.rows = current
+            ranked = sorted(current.values(), key=lambda r: r['rank'])
+            self.snapshot = sse_message("snapshot", json.dumps({'version': self.version, 'videos': ranked}), self.version)
+            message = sse_message("delta", json.dumps({'version': self.version, **delta}), self.version)
+            # Enqueued under the lock so a new client never sees a delta older than its snapshot
+            for queue, loop in list(self.clients.items()):
+                try:
+                    loop.call_soon_threadsafe(self._offer, queue, message)
+                except RuntimeError: # loop closed
+                    self.clients.pop(queue, None)
+        return delta
+
+broadcaster = Broadcaster()
+_changed = threading.Event()
+_publisher_lock = threading.Lock()
+_publisher = None
+
+def notify():
+    """Called after the pipeline saves videos; cheap no-op if no publisher runs."""
+    _changed.set()
+
+def _data_version():
+    # Changes whenever another connection (any process) commits to the DB
+    return database.get_db_connection().execute('PRAGMA data_version').fetchone()[0]
+
+def _publish_loop(stop):
+    # Any failure (e.g. a locked DB while reading data_version) is retried on
+    # the next poll, so one bad read never ends the feed for every client
+    last_version = None # None: refresh right away, without waiting for a change
+    while not stop.is_set():
+        try:
+            if last_version is not None:
+                notified = _changed.wait(LIVE_FEED_POLL_SECONDS)
+                if not notified and _data_version() == last_version:
+                    continue
+                stop.wait(LIVE_FEED_DEBOUNCE_SECONDS) # let the rest of the batch land
+            _changed.clear()
+            last_version = _data_version()
+            broadcaster.refresh()
+        except Exception as e:
+            print(f"Live feed refresh failed: {e}")
+            last_version = None
+            stop.wait(LIVE_FEED_POLL_SECONDS)
+
+def start_publisher():
+    """Starts the background publisher thread (once per process). Returns its stop event."""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None or not _publisher[0].is_alive():
+            stop = threading.Event()
+            thread = threading.Thread(target=_publish_loop, args=(stop,), daemon=True)
+            thread.start()
+            _publisher = (thread, stop)
+        return _publisher[1]
+
+def stop_publisher():
+    with _publisher_lock:
+        if _publisher is not None:
+            _publisher[1].set()
+            _changed.set()
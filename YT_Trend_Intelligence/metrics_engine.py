@@ -1,13 +1,23 @@
 import datetime
+import math
 
-def calculate_hours_since_upload(published_at_str):
+# NumPy is imported on the first batch call, not at import: importing it
+# costs ~100 ms and the API process only needs the scalar helpers
+np = None
+_numpy_checked = False
+
+# Views/hour between the last two snapshots that mark a real spike
+EXPLODING_VIEWS_PER_HOUR = 100000
+FAST_RISING_VIEWS_PER_HOUR = 50000
+
+def calculate_hours_since_upload(published_at_str, now=None):
     # standard format: 2023-10-27T10:00:00Z
     # python 3.7+ fromisoformat handles 'Z' if replaced by +00:00
     try:
         if published_at_str.endswith('Z'):
             published_at_str = published_at_str[:-1] + '+00:00'
         pub_date = datetime.datetime.fromisoformat(published_at_str)
-        now = datetime.datetime.now(datetime.timezone.utc)
+        now = now or datetime.datetime.now(datetime.timezone.utc)
         diff = now - pub_date
         return max(diff.total_seconds() / 3600, 0.1) # Avoid division by zero
     except Exception:
@@ -18,6 +28,18 @@ def calculate_engagement_score(views, likes, comments, hours_since_upload):
     score = (views + (likes * 2) + (comments * 3)) / hours_since_upload
     return round(score, 2)
 
+def calculate_view_velocity(views, captured_at, previous_snapshot):
+    """
+    Views/hour since the previous snapshot, or None if there isn't a usable one.
+    Only needs the latest stored snapshot, never the full history.
+    """
+    if previous_snapshot is None or captured_at is None:
+        return None
+    elapsed_hours = (captured_at - previous_snapshot['captured_at']) / 3600
+    if elapsed_hours <= 0:
+        return None
+    return round(max(views - previous_snapshot['views'], 0) / elapsed_hours, 2)
+
 def calculate_viral_probability(engagement_score, hours_since_upload, view_count):
     # Simple heuristic based on engagement density
     # Base probability
@@ -37,7 +59,14 @@ def calculate_viral_probability(engagement_score, hours_since_upload, view_count
     # Cap at 100
     return min(prob + 20, 100) # Base 20
 
-def determine_trend_type(viral_prob, hours):
+def determine_trend_type(viral_prob, hours, view_velocity=None):
+    # Measured velocity beats lifetime averages when we have it
+    if view_velocity is not None:
+        if view_velocity >= EXPLODING_VIEWS_PER_HOUR:
+            return "🔥 Exploding"
+        if view_velocity >= FAST_RISING_VIEWS_PER_HOUR and viral_prob >= 50:
+            return "🚀 Fast Rising"
+    
     if viral_prob >= 90 and hours < 4:
         return "🔥 Exploding"
     elif viral_prob >= 75:
@@ -49,11 +78,12 @@ def determine_trend_type(viral_prob, hours):
     else:
         return "Regular"
 
-def analyze_video_metrics(video):
+def analyze_video_metrics(video, previous_snapshot=None, now=None):
     """
     Enriches video object with metrics.
+    previous_snapshot is the latest stored snapshot (see database.get_latest_snapshots).
     """
-    hours = calculate_hours_since_upload(video['published_at'])
+    hours = calculate_hours_since_upload(video['published_at'], now)
     score = calculate_engagement_score(
         video['view_count'], 
         video['like_count'], 
@@ -61,11 +91,13 @@ def analyze_video_metrics(video):
         hours
     )
     prob = calculate_viral_probability(score, hours, video['view_count'])
-    trend = determine_trend_type(prob, hours)
+    velocity = calculate_view_velocity(video['view_count'], video.get('captured_at'), previous_snapshot)
+    trend = determine_trend_type(prob, hours, velocity)
     
     video['hours_since_upload'] = round(hours, 2)
     video['engagement_score'] = score
     video['viral_probability'] = prob
+    video['view_velocity'] = velocity
     # trend type logic might need category info, but for now simple
     # Special overrides
     if "Shorts" in str(video.get('category', '')):
@@ -78,3 +110,158 @@ def analyze_video_metrics(video):
         video['trend_type'] = trend
         
     return video
+
+# -------------------------------------------------------------------
+# Batch API: same rules as above, vectorized over columnar NumPy arrays
+# -------------------------------------------------------------------
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+def _epoch_us(dt):
+    # Integer microseconds, exactly as timedelta arithmetic in the scalar path
+    return (dt - EPOCH) // ONE_MICROSECOND
+
+def _published_us(published_at_str):
+    """Epoch microseconds for a tz-aware ISO timestamp, NaN where the scalar path would fall back."""
+    try:
+        if published_at_str.endswith('Z'):
+            published_at_str = published_at_str[:-1] + '+00:00'
+        pub_date = datetime.datetime.fromisoformat(published_at_str)
+        if pub_date.tzinfo is None:
+            return math.nan
+        return float(_epoch_us(pub_date))
+    except Exception:
+        return math.nan
+
+TREND_LABELS = None
+
+def _load_numpy():
+    """Imports NumPy once (None if it is not installed). Only the batch API needs it."""
+    global np, TREND_LABELS, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        if numpy is not None:
+            TREND_LABELS = numpy.array([
+                "🔥 Exploding", "🚀 Fast Rising", "📈 Steady Growth", "⚡ Viral Short", "News", "Regular",
+                "⚡ Viral Short", "🎮 Viral Gaming", "📰 Breaking News",
+            ], dtype=object)
+        np = numpy
+        _numpy_checked = True
+    return np
+
+def parse_published_at(published_at):
+    """
+    Converts publish timestamps (ISO strings as returned by the API) to a float
+    array of epoch microseconds (NaN if unparseable). The common all-'Z' case
+    is parsed in one NumPy call.
+    """
+    _load_numpy()
+    published_at = list(published_at)
+    if all(isinstance(p, str) and p.endswith('Z') for p in published_at):
+        try:
+            stamps = np.array([p[:-1] for p in published_at], dtype='datetime64[us]')
+            return stamps.astype('int64').astype(float)
+        except ValueError:
+            pass
+    return np.array([_published_us(p) for p in published_at], dtype=float)
+
+def analyze_metrics_batch(views, likes, comments, published_us, categories=None, view_velocity=None, now=None):
+    """
+    Vectorized analyze_video_metrics. Takes equal-length columns (views, likes,
+    comments, publish time in epoch microseconds from parse_published_at,
+    optional category strings and views/hour velocity with NaN for "unknown")
+    and one shared `now`.
+    Returns a dict of arrays: hours_since_upload, engagement_score,
+    viral_probability, trend_type.
+    """
+    if _load_numpy() is None:
+        raise RuntimeError("analyze_metrics_batch requires numpy (pip install numpy)")
+
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    views = np.asarray(views, dtype=float)
+    likes = np.asarray(likes, dtype=float)
+    comments = np.asarray(comments, dtype=float)
+    published_us = np.asarray(published_us, dtype=float)
+    n = len(views)
+
+    # Whole microseconds below 2**53 subtract exactly, so hours match the scalar path bit for bit
+    hours = np.maximum((_epoch_us(now) - published_us) / 1e6 / 3600, 0.1)
+    hours = np.where(np.isnan(published_us), 1.0, hours)
+
+    score = np.round((views + likes * 2 + comments * 3) / hours, 2)
+
+    views_per_hour = views / hours
+    prob = (
+        np.select([views_per_hour > 100000, views_per_hour > 50000, views_per_hour > 10000], [40, 30, 20], 0)
+        + np.select([score > 50000, score > 10000, score > 1000], [40, 30, 10], 0)
+    )
+    prob = np.minimum(prob + 20, 100)
+
+    if view_velocity is None:
+        velocity = np.full(n, np.nan)
+    else:
+        velocity = np.asarray(view_velocity, dtype=float)
+    has_velocity = ~np.isnan(velocity)
+
+    # Trend types are chosen as indexes into TREND_LABELS, then mapped once
+    trend = np.select(
+        [
+            has_velocity & (velocity >= EXPLODING_VIEWS_PER_HOUR),
+            has_velocity & (velocity >= FAST_RISING_VIEWS_PER_HOUR) & (prob >= 50),
+            (prob >= 90) & (hours < 4),
+            prob >= 75,
+            prob >= 50,
+            (hours < 24) & (hours < 0.1),
+            hours < 24,
+        ],
+        [0, 1, 0, 1, 2, 3, 4],
+        5,
+    )
+
+    # Category overrides (same order as the scalar path)
+    if categories is not None:
+        cats = np.asarray(categories, dtype=str)
+        trend = np.where(np.char.find(cats, "News") >= 0, np.where(hours < 5, 8, trend), trend)
+        trend = np.where((np.char.find(cats, "Gaming") >= 0) & (prob > 70), 7, trend)
+        trend = np.where(np.char.find(cats, "Shorts") >= 0, 6, trend)
+
+    return {
+        'hours_since_upload': np.round(hours, 2),
+        'engagement_score': score,
+        'viral_probability': prob.astype(int),
+        'trend_type': TREND_LABELS[trend],
+    }
+
+def analyze_videos_metrics(videos, previous_snapshots=None, now=None):
+    """
+    Enriches a list of video dicts in one pass with a shared `now`. Uses the
+    vectorized batch path when NumPy is installed, the scalar path otherwise.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    previous_snapshots = previous_snapshots or {}
+    if not videos or _load_numpy() is None:
+        return [analyze_video_metrics(v, previous_snapshots.get(v['video_id']), now) for v in videos]
+
+    velocities = [
+        calculate_view_velocity(v['view_count'], v.get('captured_at'), previous_snapshots.get(v['video_id']))
+        for v in videos
+    ]
+    result = analyze_metrics_batch(
+        [v['view_count'] for v in videos],
+        [v['like_count'] for v in videos],
+        [v['comment_count'] for v in videos],
+        parse_published_at(v['published_at'] for v in videos),
+        categories=[v.get('category', '') for v in videos],
+        view_velocity=[math.nan if vel is None else vel for vel in velocities],
+        now=now,
+    )
+    for i, video in enumerate(videos):
+        video['hours_since_upload'] = float(result['hours_since_upload'][i])
+        video['engagement_score'] = float(result['engagement_score'][i])
+        video['viral_probability'] = int(result['viral_probability'][i])
+        video['view_velocity'] = velocities[i]
+        video['trend_type'] = str(result['trend_type'][i])
+    return videos
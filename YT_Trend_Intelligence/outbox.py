@@ -0,0 +1,139 @@
+import os
+import time
+import smtplib
+import threading
+
+import backends
+import database
+import email_sender
+import telemetry
+
+# Delivery attempts per message before it is marked failed
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "8"))
+# Backoff after a failed attempt: base * 2^(attempt - 1), capped (seconds)
+EMAIL_RETRY_BASE = float(os.getenv("EMAIL_RETRY_BASE", "60"))
+EMAIL_RETRY_MAX = float(os.getenv("EMAIL_RETRY_MAX", "3600"))
+# Messages claimed per round; claims older than the timeout were left by a dead sender
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "50"))
+OUTBOX_CLAIM_TIMEOUT = float(os.getenv("OUTBOX_CLAIM_TIMEOUT", "600"))
+# Delivered and failed messages are kept this long
+OUTBOX_KEEP_DAYS = int(os.getenv("OUTBOX_KEEP_DAYS", "7"))
+# Longest the delivery thread sleeps when nothing is due
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "60"))
+
+def retry_delay(attempts):
+    """Wait after the attempts-th failed attempt."""
+    return min(EMAIL_RETRY_BASE * 2 ** (attempts - 1), EMAIL_RETRY_MAX)
+
+def is_permanent(error):
+    """5xx replies about the message or recipient won't get better by retrying."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return error.smtp_code >= 500
+    return False
+
+def _record_failure(message, error, now):
+    attempts = message['attempts'] + 1
+    if is_permanent(error) or attempts >= EMAIL_MAX_ATTEMPTS:
+        database.mark_email_failed(message['id'], str(error))
+        print(f"Giving up on email to {message['recipient']} after {attempts} attempt(s): {error}")
+        return 'failed'
+    database.mark_email_failed(message['id'], str(error), now + retry_delay(attempts))
+    return 'retry'
+
+def deliver_due(connection=None, clock=time.time):
+    """
+    Sends every message that is due, in rounds of OUTBOX_BATCH, over one
+    SMTP connection. When the server cannot be reached the rest of the round
+    is put back with the same backoff instead of failing one by one.
+    Returns counts of 'sent', 'retry' and 'failed'.
+    """
+    own_connection = connection is None
+    connection = connection or backends.create_mail_connection()
+    counts = {'sent': 0, 'retry': 0, 'failed': 0}
+    try:
+        while True:
+            started = clock()
+            messages = database.claim_due_emails(OUTBOX_BATCH, OUTBOX_CLAIM_TIMEOUT, started)
+            if not messages:
+                break
+            for i, message in enumerate(messages):
+                msg = email_sender.build_message(
+                    message['subject'], message['html'], message['recipient'],
+                    message['text'], key=message['idempotency_key']
+                )
+                try:
+                    with telemetry.timed('email_send_seconds'):
+                        connection.send(msg)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                    # Refused for this message only; the connection is still good
+                    outcome = _record_failure(message, e, started)
+                    telemetry.inc('email_failures_total', outcome=outcome)
+                    counts[outcome] += 1
+                    continue
+                except OSError as e: # socket errors and the other SMTP errors (connect, auth, disconnect)
+                    # Connection-level: nothing else in this round can go out either
+                    connection.close()
+                    for pending in messages[i:]:
+                        outcome = _record_failure(pending, e, started)
+                        telemetry.inc('email_failures_total', outcome=outcome)
+                        counts[outcome] += 1
+                    print(f"SMTP unavailable, {len(messages) - i} email(s) rescheduled: {e}")
+                    return counts
+                database.mark_email_sent(message['id'], clock())
+                telemetry.inc('emails_sent_total')
+                counts['sent'] += 1
+            if len(messages) < OUTBOX_BATCH:
+                break
+    finally:
+        if own_connection:
+            connection.close()
+    if counts['sent']:
+        print(f"Outbox: {counts['sent']} email(s) sent.")
+    if counts['sent'] or counts['failed']:
+        database.prune_outbox(OUTBOX_KEEP_DAYS)
+    return counts
+
+_wake = threading.Event()
+_delivery_lock = threading.Lock()
+_delivery = None
+
+def notify():
+    """Called after messages are queued; wakes the delivery thread if one runs."""
+    _wake.set()
+
+def _delivery_loop(stop):
+    connection = backends.create_mail_connection()
+    try:
+        while not stop.is_set():
+            _wake.clear()
+            try:
+                deliver_due(connection)
+            except Exception as e:
+                print(f"Outbox delivery failed: {e}")
+            due = database.next_email_due()
+            wait = OUTBOX_POLL_SECONDS if due is None else min(max(due - time.time(), 0), OUTBOX_POLL_SECONDS)
+            if wait > email_sender.SMTP_IDLE_CHECK:
+                # Nothing to send for a while: give the server its connection back
+                connection.close()
+            _wake.wait(wait)
+    finally:
+        connection.close()
+
+def start_delivery():
+    """Starts the background delivery thread (once per process). Returns its stop event."""
+    global _delivery
+    with _delivery_lock:
+        if _delivery is None or not _delivery[0].is_alive():
+            stop = threading.Event()
+            thread = threading.Thread(target=_delivery_loop, args=(stop,), daemon=True)
+            thread.start()
+            _delivery = (thread, stop)
+        return _delivery[1]
+
+def stop_delivery():
+    with _delivery_lock:
+        if _delivery is not None:
+            _delivery[1].set()
+            _wake.set()
@@ -0,0 +1,383 @@
+import os
+import time
+import queue
+import datetime
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+import backends
+import database
+import youtube_client
+import category_engine
+import metrics_engine
+import ai_analyzer
+import email_sender
+import outbox
+import live_feed
+import ranking
+import telemetry
+
+load_dotenv()
+
+# Pages buffered between stages before the producer blocks (backpressure)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+# Videos emailed per category, and how equal engagement scores are ordered
+# (ranking.TIE_BREAKS: video_id, view_velocity, view_count, newest)
+TOP_PER_CATEGORY = int(os.getenv("TOP_PER_CATEGORY", "5"))
+RANK_TIE_BREAK = os.getenv("RANK_TIE_BREAK", "video_id")
+# Per-cycle records kept in cycle_runs
+CYCLE_RUNS_KEEP = int(os.getenv("CYCLE_RUNS_KEEP", "2000"))
+HOT_TREND_TYPES = ("Exploding", "Fast Rising")
+
+CATEGORIES = ["Gaming", "Technology", "News & Politics", "Entertainment", "Education", "Finance", "Shorts"]
+
+_STAGE_DONE = object()
+
+def _env_list(name, default=""):
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+def get_regions():
+    # REGION_CODES=IN,US,GB fans out; REGION_CODE stays the single-region default
+    return _env_list("REGION_CODES") or [os.getenv("REGION_CODE", "IN")]
+
+def get_category_ids():
+    # Optional YouTube videoCategoryId charts (e.g. 20,28); empty = overall chart
+    return _env_list("YOUTUBE_CATEGORY_IDS")
+
+class StageTimer:
+    """Accumulates busy seconds per stage; safe to use from several threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+def _default_fetch_pages():
+    return backends.get_fetcher().iter_trending_pages(get_regions(), get_category_ids())
+
+def _default_analyze(videos):
+    # Concurrency comes from the AI stage pool; each call handles one batch
+    return ai_analyzer.analyze_videos_ai(videos, max_workers=1)
+
+def _fetch_stage(fetch_pages, pages_q, timer, stop):
+    try:
+        with timer.time('fetch'):
+            pages = iter(fetch_pages())
+        while not stop.is_set():
+            with timer.time('fetch'):
+                page = next(pages, _STAGE_DONE)
+            if page is _STAGE_DONE:
+                break
+            pages_q.put(page)
+    except Exception as e:
+        print(f"Fetch stage failed: {e}")
+    finally:
+        pages_q.put(_STAGE_DONE)
+
+def _writer_stage(writes_q, timer, errors):
+    # Writes the cycle's videos, digest entry and outbox rows, in queue order.
+    # The AI stage still stores its cache from the pool threads; those short
+    # writes wait on the busy timeout rather than contending here.
+    # Later writes depend on earlier ones (mark_sent after the digest entry,
+    # outbox rows after the video saves), so after the first failure the rest
+    # are skipped and the error is kept in `errors` for run_cycle to raise
+    while True:
+        task = writes_q.get()
+        if task is _STAGE_DONE:
+            return
+        fn, args = task
+        if errors:
+            print(f"DB write skipped after an earlier failure ({fn.__name__})")
+            continue
+        try:
+            with timer.time('db_write'):
+                fn(*args)
+            live_feed.notify() # Dashboards get the delta once the batch settles
+        except Exception as e:
+            print(f"DB write failed ({fn.__name__}): {e}")
+            errors.append(e)
+
+def run_cycle(fetch_pages=None, analyze=None, deliver=None, recipient=None):
+    """
+    Runs one trend cycle as a staged pipeline with bounded queues:
+
+        fetch pages -> categorize + metrics (per page) -> DB writer
+                    -> rank -> AI (concurrent batches) -> DB writer
+                    -> email outbox + mark sent (one transaction)
+
+    Categorization and metrics start on the first page while later pages are
+    still downloading, and AI results are persisted as each batch finishes.
+    Emails are queued in the outbox rather than sent, so SMTP latency and
+    failures never hold up or repeat a cycle; deliver() is called once they
+    are stored (default: wake the outbox delivery thread).
+    Backends can be swapped for stubs: fetch_pages() yields lists of video
+    dicts, analyze(videos) returns {video_id: analysis}.
+    Returns a summary with per-stage timings (seconds of work per stage).
+    """
+    fetch_pages = fetch_pages or _default_fetch_pages
+    analyze = analyze or _default_analyze
+    deliver = deliver or outbox.notify
+    recipient = recipient or os.getenv("EMAIL_USER") # Sending to self
+
+    timer = StageTimer()
+    cycle_start = time.perf_counter()
+    cycle_id = time.time()
+    counters_before = telemetry.counter_totals()
+    print(f"[{datetime.datetime.now()}] Starting Trend Intelligence System...")
+
+    # 1. Initialize Database
+    database.init_db()
+    quota_before = database.get_quota_used(youtube_client.quota_day())
+
+    pages_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    writes_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event() # Set when the cycle is over (or failed): fetch no more pages
+    fetcher = threading.Thread(target=_fetch_stage, args=(fetch_pages, pages_q, timer, stop), daemon=True)
+    write_errors = []
+    writer = threading.Thread(target=_writer_stage, args=(writes_q, timer, write_errors), daemon=True)
+    fetcher.start()
+    writer.start()
+
+    try:
+        # 2. Fetch Live Data + 3. Process Videos, page by page as they arrive
+        print("Fetching trending videos...")
+        seen = {}
+        merged_ids = set()
+        previous_by_id = {}
+        categories = {cat: [] for cat in CATEGORIES}
+        # Per-category leaders kept up to date as candidates arrive (no full sort)
+        rank_key = ranking.sort_key(RANK_TIE_BREAK)
+        leaders = {cat: ranking.TopK(TOP_PER_CATEGORY, rank_key, source=categories[cat]) for cat in CATEGORIES}
+        candidate_category = {}
+        analyzed_count = 0
+
+        while True:
+            page = pages_q.get()
+            if page is _STAGE_DONE:
+                break
+
+            with timer.time('process'):
+                new_videos = []
+                for video in page:
+                    if video['video_id'] in seen:
+                        # Same video trending in another region/chart
+                        youtube_client.merge_video(seen[video['video_id']], video)
+                        merged_ids.add(video['video_id'])
+                        continue
+                    seen[video['video_id']] = video
+                    new_videos.append(video)
+                if not new_videos:
+                    continue
+
+                captured_at = int(time.time())
+                with timer.time('db_read'):
+                    previous_snapshots = database.get_latest_snapshots(v['video_id'] for v in new_videos)
+                previous_by_id.update(previous_snapshots)
+                with timer.time('categorize'):
+                    for video in new_videos:
+                        # Categorize (Must be done before saving)
+                        video['category'] = category_engine.categorize_video(video)
+                        video['captured_at'] = captured_at
+
+                # Calculate Metrics in one batch (velocity against the last stored snapshot)
+                with timer.time('metrics'):
+                    metrics_engine.analyze_videos_metrics(new_videos, previous_snapshots)
+
+            # SAVE TO DB (Update stats for UI) on the writer thread
+            writes_q.put((database.save_videos, (new_videos,)))
+
+            # Check which were already sent for EMAIL purpose only
+            with timer.time('db_read'):
+                sent_ids = database.get_sent_ids(v['video_id'] for v in new_videos)
+            for video in new_videos:
+                if video['video_id'] in sent_ids:
+                    continue # Tracked but don't re-email
+                # Add to list for ranking (candidates for email)
+                cat = video['category'] if video['category'] in categories else "Entertainment"
+                categories[cat].append(video)
+                leaders[cat].offer(video)
+                candidate_category[video['video_id']] = cat
+                analyzed_count += 1
+
+        # Videos seen again in a later chart may have fresher stats: re-score and re-save
+        # (against the snapshots read before this cycle wrote its own)
+        merged = [seen[vid] for vid in merged_ids]
+        if merged:
+            with timer.time('process'), timer.time('metrics'):
+                metrics_engine.analyze_videos_metrics(merged, previous_by_id)
+                for video in merged:
+                    if video['video_id'] in candidate_category:
+                        leaders[candidate_category[video['video_id']]].update(video)
+            writes_q.put((database.save_videos, (merged,)))
+
+        print(f"Fetched {len(seen)} videos.")
+        print(f"New videos to analyze: {analyzed_count}")
+
+        # 4. Rank and Select (Top TOP_PER_CATEGORY per category, read from the heaps)
+        with timer.time('rank'):
+            final_selection = {}
+            videos_to_email = []
+            for cat in CATEGORIES:
+                top_vids = leaders[cat].leaders()
+                if not top_vids: continue
+                final_selection[cat] = top_vids
+                videos_to_email.extend(top_vids)
+
+        # 5. AI Analysis (Only for selected videos), batches run concurrently and
+        # each finished batch is handed to the DB writer while others are in flight
+        print(f"Running AI Analysis on {len(videos_to_email)} videos...")
+        ai_start = time.perf_counter()
+        batch_size = max(1, ai_analyzer.AI_BATCH_SIZE)
+        batches = [videos_to_email[i:i + batch_size] for i in range(0, len(videos_to_email), batch_size)]
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(ai_analyzer.AI_MAX_WORKERS, len(batches))) as pool:
+                futures = {pool.submit(analyze, batch): batch for batch in batches}
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    try:
+                        analyses = future.result()
+                    except Exception as e:
+                        print(f"AI stage batch failed: {e}")
+                        analyses = {}
+                    for video in batch:
+                        ai_data = analyses.get(video['video_id'], dict(ai_analyzer.FALLBACK_ANALYSIS))
+                        video['ai_analysis'] = ai_data
+                        # Report the stronger of the heuristic and the AI viral score
+                        if isinstance(ai_data.get('viral_score'), (int, float)):
+                            video['viral_probability'] = max(video['viral_probability'], ai_data['viral_score'])
+                    writes_q.put((database.save_videos, (batch,))) # Update DB with metrics
+        timer.add('ai', time.perf_counter() - ai_start)
+
+        # 6. Generate the email and queue it in the outbox
+        with timer.time('email'):
+            if email_sender.EMAIL_DIGEST_CYCLES > 1 or email_sender.EMAIL_DIGEST_MAX_AGE:
+                # Digest mode: the selection is stored and goes out with later cycles;
+                # mark it sent now so the next cycles pick new videos
+                writes_q.put((email_sender.add_to_digest, (final_selection, analyzed_count, recipient)))
+                if videos_to_email:
+                    writes_q.put((database.mark_sent, ([v['video_id'] for v in videos_to_email],)))
+            else:
+                video_ids = [v['video_id'] for v in videos_to_email]
+                if videos_to_email:
+                    print("Generating email report...")
+                    subject = f"🔥 Viral Trend Alert - {datetime.datetime.now().strftime('%H:%M %p')}"
+                    # The same selection is never queued twice for a recipient
+                    key_parts = ('alert', sorted(video_ids))
+                else:
+                    print("No new significant trends to report.")
+                    subject = "Viral Trend Update - No Spikes"
+                    key_parts = ('no-spikes', cycle_id)
+                # One render per distinct subscriber filter set, not per subscriber
+                fanout = email_sender.FanOut(final_selection, analyzed_count)
+                messages = email_sender.build_alert_messages(
+                    fanout, email_sender.alert_recipients(recipient), subject, key_parts
+                )
+                print(f"Queued report for {len(messages)} recipient(s) ({fanout.section_renders} sections rendered).")
+                # 7. Queued after the AI saves, so marking the videos sent lands last
+                writes_q.put((database.enqueue_emails, (messages, video_ids)))
+    finally:
+        # Runs on errors too: the writer flushes what was queued and exits, and
+        # the fetcher is told to stop and unblocked, so no stage thread is left
+        # waiting on a queue nobody serves
+        stop.set()
+        writes_q.put(_STAGE_DONE)
+        writer.join()
+        while fetcher.is_alive():
+            try:
+                pages_q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        fetcher.join()
+    if write_errors:
+        # The cycle's data is incomplete; fail it (and its job) instead of reporting success
+        raise write_errors[0]
+    deliver()
+
+    timings = {stage: round(seconds, 3) for stage, seconds in timer.timings.items()}
+    timings['total'] = round(time.perf_counter() - cycle_start, 3)
+    print("Stage timings (s): " + ", ".join(f"{k}={v}" for k, v in timings.items()))
+
+    summary = {
+        'fetched': len(seen),
+        'new_candidates': analyzed_count,
+        'emailed': len(videos_to_email),
+        'quota_used': max(0, database.get_quota_used(youtube_client.quota_day()) - quota_before),
+        'timings': timings,
+        **trend_signal(seen.values()),
+    }
+    record_cycle(cycle_id, summary, timer.timings, counters_before)
+    print("Cycle Completed.")
+    return summary
+
+def record_cycle(started_at, summary, stage_seconds, counters_before):
+    """Stage histograms for /metrics, and the cycle's record in cycle_runs."""
+    telemetry.inc('cycles_total')
+    for stage, seconds in stage_seconds.items():
+        telemetry.observe('cycle_stage_seconds', seconds, stage=stage)
+    try:
+        database.save_cycle_run(started_at, summary, telemetry.counter_delta(counters_before), CYCLE_RUNS_KEEP)
+    except Exception as e:
+        print(f"Could not store the cycle record: {e}")
+
+def is_hot_trend(trend_type):
+    # Labels carry an emoji prefix ("🔥 Exploding"), so match on the name
+    return any(name in (trend_type or '') for name in HOT_TREND_TYPES)
+
+def trend_signal(videos):
+    """
+    Summarizes how hot a batch of videos is, for the scheduler: counts per
+    trend type, how many exceed the Fast Rising velocity, and the hot video IDs
+    (fastest first).
+    """
+    trend_counts = {}
+    hot = []
+    spikes = 0
+    for video in videos:
+        trend_counts[video.get('trend_type')] = trend_counts.get(video.get('trend_type'), 0) + 1
+        velocity = video.get('view_velocity') or 0
+        if velocity >= metrics_engine.FAST_RISING_VIEWS_PER_HOUR:
+            spikes += 1
+        if velocity >= metrics_engine.FAST_RISING_VIEWS_PER_HOUR or is_hot_trend(video.get('trend_type')):
+            hot.append((velocity, video['video_id']))
+    hot.sort(reverse=True)
+    return {
+        'trend_counts': trend_counts,
+        'velocity_spikes': spikes,
+        'hot_video_ids': [vid for _, vid in hot],
+    }
+
+def refresh_hot_videos(video_ids, fetch_statistics=None):
+    """
+    Stats-only refresh of already-known videos (1 quota unit per 50 IDs instead
+    of a full cycle): re-scores them against their last snapshot and saves a new
+    snapshot. Returns the trend signal of the refreshed videos.
+    """
+    fetch_statistics = fetch_statistics or backends.get_fetcher().fetch_statistics
+    stats = fetch_statistics(video_ids)
+    videos = database.get_videos(stats)
+    if not videos:
+        return trend_signal([])
+
+    previous_snapshots = database.get_latest_snapshots(stats)
+    captured_at = int(time.time())
+    for video in videos:
+        video.update(stats[video['video_id']])
+        video['captured_at'] = captured_at
+    metrics_engine.analyze_videos_metrics(videos, previous_snapshots)
+    database.save_videos(videos)
+    live_feed.notify()
+    print(f"Refreshed stats for {len(videos)} hot videos.")
+    return trend_signal(videos)
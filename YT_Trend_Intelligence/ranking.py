@@ -0,0 +1,83 @@
+import heapq
+
+# Tie-breakers between equal engagement scores, applied before the final
+# video_id comparison. 'video_id' alone matches the /trends order
+# (engagement_score DESC, video_id DESC from idx_videos_category_score).
+TIE_BREAKS = {
+    'video_id': lambda v: (),
+    'view_velocity': lambda v: (v.get('view_velocity') or 0,),
+    'view_count': lambda v: (v.get('view_count') or 0,),
+    'newest': lambda v: (v.get('published_at') or '',), # ISO 8601 sorts as text
+}
+
+def sort_key(tie_break='video_id'):
+    """Key where larger is better: engagement score, then the tie-breaker, then video_id."""
+    if tie_break not in TIE_BREAKS:
+        raise ValueError(f"Unknown tie-break {tie_break!r}; expected one of: {', '.join(TIE_BREAKS)}")
+    extra = TIE_BREAKS[tie_break]
+    return lambda v: (v.get('engagement_score') or 0, *extra(v), v['video_id'])
+
+class TopK:
+    """
+    The k best videos by `key`, kept in a bounded min-heap as candidates
+    arrive: offer() is O(log k) and leaders() reads them in O(k log k),
+    without sorting the whole candidate set.
+
+    A leader whose score changes is re-ranked with update(). If it got
+    worse, a candidate that was turned away earlier might now beat it, so
+    the ranking is rebuilt from `source` (the full candidate list) on the
+    next read; without a source the heap just re-orders what it holds.
+    """
+
+    def __init__(self, k, key, source=None):
+        self.k = max(0, k)
+        self.key = key
+        self.source = source
+        self.heap = []     # (key, video_id, video); heap[0] is the weakest leader
+        self.members = {}  # video_id -> key it is ranked by
+        self.stale = False
+
+    def __len__(self):
+        return len(self.heap)
+
+    def offer(self, video):
+        video_id = video['video_id']
+        if video_id in self.members:
+            return self.update(video)
+        if self.stale or not self.k:
+            return
+        entry = (self.key(video), video_id, video)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry[0] > self.heap[0][0]:
+            del self.members[heapq.heapreplace(self.heap, entry)[1]]
+        else:
+            return
+        self.members[video_id] = entry[0]
+
+    def update(self, video):
+        """Re-ranks a video whose score changed (offers it if it is not a leader)."""
+        video_id = video['video_id']
+        if video_id not in self.members:
+            return self.offer(video)
+        new_key = self.key(video)
+        if new_key < self.members[video_id] and self.source is not None:
+            self.stale = True
+            return
+        self.members[video_id] = new_key
+        self.heap = [(new_key, vid, v) if vid == video_id else (k, vid, v) for k, vid, v in self.heap]
+        heapq.heapify(self.heap)
+
+    def rebuild(self, videos=None):
+        """Ranks from scratch over `videos` (default: the source)."""
+        videos = self.source if videos is None else videos
+        self.heap = [(self.key(v), v['video_id'], v) for v in heapq.nlargest(self.k, videos or [], key=self.key)]
+        heapq.heapify(self.heap)
+        self.members = {vid: k for k, vid, _ in self.heap}
+        self.stale = False
+
+    def leaders(self):
+        """The current top k, best first."""
+        if self.stale:
+            self.rebuild()
+        return [video for _, _, video in sorted(self.heap, reverse=True)]
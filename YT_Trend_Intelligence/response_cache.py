@@ -0,0 +1,100 @@
+import os
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import database
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+# How often the DB data generation is re-read (at most one tiny read per interval)
+RESPONSE_CACHE_CHECK_SECONDS = float(os.getenv("RESPONSE_CACHE_CHECK_SECONDS", "1"))
+# Upper bound on entry age, for responses that depend on the clock (since_hours)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+
+class CachedResponse:
+    __slots__ = ('body', 'etag', 'headers', 'created_at')
+
+    def __init__(self, body, etag, headers, created_at):
+        self.body = body
+        self.etag = etag
+        self.headers = headers
+        self.created_at = created_at
+
+class ResponseCache:
+    """
+    LRU cache of pre-serialized JSON responses, keyed by endpoint + params.
+    Entries belong to one data generation (database.get_data_generation);
+    when the generation moves on, the whole cache is dropped.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, check_seconds=RESPONSE_CACHE_CHECK_SECONDS,
+                 ttl=RESPONSE_CACHE_TTL, generation_source=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.check_seconds = check_seconds
+        self.ttl = ttl
+        self.generation_source = generation_source or database.get_data_generation
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.generation = None
+        self.checked_at = None
+        self.hits = self.misses = 0
+
+    def current_generation(self):
+        now = self.clock()
+        with self.lock:
+            if self.checked_at is not None and now - self.checked_at < self.check_seconds:
+                return self.generation
+        generation = self.generation_source()
+        with self.lock:
+            if generation != self.generation:
+                self.entries.clear()
+                self.generation = generation
+            self.checked_at = now
+            return generation
+
+    def invalidate(self):
+        """Drops everything and re-reads the generation on the next request (in-process writes)."""
+        with self.lock:
+            self.entries.clear()
+            self.checked_at = None
+
+    def get(self, key):
+        self.current_generation()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or self.clock() - entry.created_at > self.ttl:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, data, headers=None, generation=None):
+        """
+        Serializes data once and stores it. Pass the generation read before
+        building data: if a write landed meanwhile the entry is not kept.
+        """
+        body = json.dumps(data).encode()
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        entry = CachedResponse(body, etag, headers or {}, self.clock())
+        with self.lock:
+            if generation is None or generation == self.generation:
+                self.entries[key] = entry
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return entry
+
+    def get_or_build(self, key, build):
+        """Returns the cached entry for key, or calls build() -> (data, headers) and caches it."""
+        entry = self.get(key)
+        if entry is None:
+            generation = self.current_generation()
+            data, headers = build()
+            entry = self.put(key, data, headers, generation)
+        return entry
+
+response_cache = ResponseCache()
@@ -0,0 +1,148 @@
+import os
+import time
+import datetime
+
+# Interval bounds for full cycles (seconds). The base matches the old fixed 30 min.
+SCHEDULE_BASE_INTERVAL = int(os.getenv("SCHEDULE_BASE_INTERVAL", "1800"))
+SCHEDULE_MIN_INTERVAL = int(os.getenv("SCHEDULE_MIN_INTERVAL", "600"))
+SCHEDULE_MAX_INTERVAL = int(os.getenv("SCHEDULE_MAX_INTERVAL", "3600"))
+# Stats-only refreshes of hot videos between full cycles
+HOT_REFRESH_INTERVAL = int(os.getenv("HOT_REFRESH_INTERVAL", "300"))
+HOT_MAX_VIDEOS = int(os.getenv("HOT_MAX_VIDEOS", "50")) # 50 IDs = 1 quota unit per refresh
+# Units kept back for the rest of the day; hot refreshes stop below this
+QUOTA_RESERVE = int(os.getenv("SCHEDULE_QUOTA_RESERVE", "200"))
+
+def seconds_until_quota_reset(now):
+    """Seconds from epoch time `now` to the next UTC midnight (see youtube_client.quota_day)."""
+    current = datetime.datetime.fromtimestamp(now, datetime.timezone.utc)
+    midnight = (current + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - current).total_seconds()
+
+class FixedPolicy:
+    """The old behaviour: a full cycle every `interval` seconds, no hot refreshes."""
+
+    def __init__(self, interval=SCHEDULE_BASE_INTERVAL):
+        self.interval = interval
+
+    def plan(self, summary, quota_left, now):
+        return {'delay': self.interval, 'hot_ids': [], 'hot_interval': None}
+
+class AdaptivePolicy:
+    """
+    Picks the wait before the next full cycle from the last cycle's summary
+    (see pipeline.trend_signal):
+
+    - many Exploding/Fast Rising videos or velocity spikes -> min_interval
+    - some signal -> halfway between min and base
+    - nothing moving -> base, doubling per consecutive stable cycle up to max
+    - then stretched if the remaining quota can't pay for cycles at that pace
+      until the daily reset.
+
+    Hot videos are handed out for stats-only refreshes every hot_interval
+    while the quota stays above the reserve.
+    """
+
+    def __init__(self, base_interval=SCHEDULE_BASE_INTERVAL, min_interval=SCHEDULE_MIN_INTERVAL,
+                 max_interval=SCHEDULE_MAX_INTERVAL, hot_interval=HOT_REFRESH_INTERVAL,
+                 hot_max=HOT_MAX_VIDEOS, quota_reserve=QUOTA_RESERVE, busy_threshold=5):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.hot_interval = hot_interval
+        self.hot_max = hot_max
+        self.quota_reserve = quota_reserve
+        self.busy_threshold = busy_threshold
+        self.stable_streak = 0
+        self.cycle_cost = None
+
+    def plan(self, summary, quota_left, now):
+        if not summary:
+            # No information (paused, failed, or another process ran the cycle)
+            return {'delay': self.base_interval, 'hot_ids': [], 'hot_interval': None}
+
+        # trend_counts is keyed by label ("🔥 Exploding"), so match on the name
+        counts = summary.get('trend_counts', {})
+        exploding = sum(n for label, n in counts.items() if label and 'Exploding' in label)
+        fast_rising = sum(n for label, n in counts.items() if label and 'Fast Rising' in label)
+        signal = 2 * exploding + fast_rising + summary.get('velocity_spikes', 0)
+        if signal >= self.busy_threshold:
+            self.stable_streak = 0
+            delay = self.min_interval
+        elif signal > 0:
+            self.stable_streak = 0
+            delay = (self.min_interval + self.base_interval) / 2
+        else:
+            self.stable_streak += 1
+            delay = min(self.base_interval * 2 ** (self.stable_streak - 1), self.max_interval)
+
+        # Budget pacing: keep (cycles until reset) x (cost per cycle) within what is left
+        if summary.get('quota_used'):
+            self.cycle_cost = summary['quota_used']
+        spendable = quota_left - self.quota_reserve
+        if self.cycle_cost:
+            if spendable <= 0:
+                delay = seconds_until_quota_reset(now)
+            else:
+                delay = max(delay, seconds_until_quota_reset(now) * self.cycle_cost / spendable)
+
+        hot_ids = summary.get('hot_video_ids', [])[:self.hot_max] if spendable > 0 else []
+        return {'delay': delay, 'hot_ids': hot_ids, 'hot_interval': self.hot_interval}
+
+def run_schedule(run_cycle, policy, refresh_hot=None, quota_left=None,
+                 clock=time.time, sleep=time.sleep, max_cycles=None, poll=None, poll_interval=5):
+    """
+    Runs full cycles forever (or max_cycles), waiting policy.plan(...)['delay']
+    between them and refreshing hot videos every hot_interval in the meantime.
+
+    run_cycle() returns a cycle summary (or None), refresh_hot(ids) returns the
+    trend signal of the refreshed videos, quota_left() returns units left today.
+    While waiting, poll() is called every poll_interval seconds (e.g. to run
+    cycles requested through the API). clock/sleep can be swapped for a
+    simulated clock.
+    """
+    quota_left = quota_left or (lambda: float('inf'))
+    cycles = 0
+
+    def wait(seconds):
+        end = clock() + seconds
+        while True:
+            remaining = end - clock()
+            if remaining <= 0:
+                return
+            sleep(min(remaining, poll_interval) if poll else remaining)
+            if poll:
+                try:
+                    poll()
+                except Exception as e:
+                    print(f"Polling between cycles failed: {e}")
+
+    while max_cycles is None or cycles < max_cycles:
+        try:
+            summary = run_cycle()
+        except Exception as e:
+            print(f"Scheduled cycle failed: {e}")
+            summary = None
+        cycles += 1
+        if max_cycles is not None and cycles >= max_cycles:
+            break
+
+        plan = policy.plan(summary, quota_left(), clock())
+        deadline = clock() + plan['delay']
+        print(f"Next cycle in {plan['delay'] / 60:.1f} min ({len(plan['hot_ids'])} hot videos to watch)", flush=True)
+
+        hot_ids = plan['hot_ids']
+        while refresh_hot and hot_ids and clock() + plan['hot_interval'] < deadline:
+            wait(plan['hot_interval'])
+            if quota_left() <= getattr(policy, 'quota_reserve', 0):
+                break
+            try:
+                signal = refresh_hot(hot_ids)
+            except Exception as e:
+                print(f"Hot video refresh failed: {e}")
+                break
+            # Keep watching only what is still hot
+            still_hot = set(signal.get('hot_video_ids', []))
+            hot_ids = [vid for vid in hot_ids if vid in still_hot]
+
+        wait(deadline - clock())
+    return cycles
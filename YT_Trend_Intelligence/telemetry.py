@@ -0,0 +1,133 @@
+import os
+import time
+import bisect
+import threading
+import contextlib
+
+# 0 = every inc/observe/timed call returns at once and /metrics is off
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Histogram bucket upper bounds (seconds): SQLite reads to slow AI replies
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# name: (type, help) for everything the app records
+METRICS = {
+    'cycles_total': ('counter', "Trend cycles run by this process"),
+    'cycle_stage_seconds': ('histogram', "Busy seconds per cycle stage"),
+    'yt_api_requests_total': ('counter', "YouTube Data API requests by result"),
+    'yt_api_request_seconds': ('histogram', "YouTube Data API request latency"),
+    'yt_quota_units_total': ('counter', "YouTube quota units spent by this process"),
+    'ai_requests_total': ('counter', "Model requests by mode (single/batch) and result"),
+    'ai_request_seconds': ('histogram', "Model request latency by mode"),
+    'ai_cache_hits_total': ('counter', "Analyses served from the AI cache"),
+    'ai_cache_misses_total': ('counter', "Analyses that needed a model request"),
+    'ai_failures_total': ('counter', "Videos that got the fallback analysis"),
+    'emails_sent_total': ('counter', "Emails delivered from the outbox"),
+    'email_failures_total': ('counter', "Failed delivery attempts by outcome (retry/failed)"),
+    'email_send_seconds': ('histogram', "SMTP send latency per message"),
+    'api_db_query_seconds': ('histogram', "SQLite time to build an API response, by endpoint"),
+}
+
+_lock = threading.Lock()
+_counters = {}   # (name, labels) -> value
+_histograms = {} # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+
+_NOOP = contextlib.nullcontext()
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+def inc(name, value=1, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, seconds, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    slot = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        hist[slot] += 1
+        hist[-1] += seconds
+
+class _Timer:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+def timed(name, **labels):
+    """Context manager observing its duration into histogram `name`."""
+    return _Timer(name, labels) if METRICS_ENABLED else _NOOP
+
+def counter_totals():
+    """{'name{labels}': value} of every counter, e.g. for per-cycle deltas."""
+    with _lock:
+        return {_series(name, labels): value for (name, labels), value in _counters.items()}
+
+def counter_delta(before, after=None):
+    after = counter_totals() if after is None else after
+    return {series: value - before.get(series, 0) for series, value in after.items()
+            if value != before.get(series, 0)}
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+def _series(name, labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return name
+    return name + '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render(gauges=()):
+    """
+    Everything recorded so far in the Prometheus text format (0.0.4), plus
+    `gauges`: (name, help, [(labels dict, value)]) read at scrape time.
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(hist) for key, hist in _histograms.items()}
+
+    families = {}
+    for (name, labels), value in counters.items():
+        families.setdefault(name, []).append(f"{_series(name, labels)} {_number(value)}")
+    for (name, labels), hist in histograms.items():
+        lines = families.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), hist[:-1]):
+            cumulative += count
+            lines.append(f"{_series(name + '_bucket', labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{_series(name + '_sum', labels)} {_number(hist[-1])}")
+        lines.append(f"{_series(name + '_count', labels)} {cumulative}")
+
+    out = []
+    for name in sorted(families):
+        kind, help_text = METRICS.get(name, ('untyped', ''))
+        out += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", *families[name]]
+    for name, help_text, samples in gauges:
+        out += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        out += [f"{_series(name, sorted(labels.items()))} {_number(value)}" for labels, value in samples]
+    return "\n".join(out) + "\n"
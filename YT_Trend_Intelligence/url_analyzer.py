@@ -0,0 +1,125 @@
+import os
+import threading
+from concurrent.futures import Future
+
+import backends
+import database
+import youtube_client
+import category_engine
+import metrics_engine
+import ai_analyzer
+
+# Stats move quickly, so lookups are reused for minutes, not hours; the AI
+# part is cached separately for AI_CACHE_TTL by ai_analyzer.
+ANALYZE_CACHE_TTL = int(os.getenv("ANALYZE_CACHE_TTL", "900"))
+ANALYZE_MAX_BATCH = int(os.getenv("ANALYZE_MAX_BATCH", "50"))
+
+class VideoNotFoundError(Exception):
+    pass
+
+_inflight_lock = threading.Lock()
+_inflight = {} # video_id -> Future of its result
+
+def build_result(video, analysis):
+    """The /analyze response for one video (ai_insights keeps the dashboard's keys)."""
+    return {
+        'video_id': video['video_id'],
+        'title': video['title'],
+        'channel_title': video['channel_title'],
+        'thumbnail_url': video.get('thumbnail_url'),
+        'published_at': video['published_at'],
+        'category': video['category'],
+        'view_count': video['view_count'],
+        'like_count': video['like_count'],
+        'comment_count': video['comment_count'],
+        'hours_since_upload': video['hours_since_upload'],
+        'engagement_score': video['engagement_score'],
+        'view_velocity': video.get('view_velocity'),
+        'trend_type': video['trend_type'],
+        # Same rule as the cycle: the stronger of the heuristic and AI scores
+        'viral_score': max(video['viral_probability'], analysis.get('viral_score') or 0),
+        'ai_insights': {
+            'why_trending': analysis['why_trending'],
+            'emotional_trigger': analysis['emotional_trigger'],
+            'audience': analysis['target_audience'],
+            'thumbnail_psychology': analysis['thumbnail_psychology'],
+            'title_strategy': analysis['title_strategy'],
+            'predicted_performance': analysis['predicted_performance'],
+        },
+    }
+
+def _fetch_and_analyze(video_ids, fetch_videos, analyze):
+    """One videos.list round and one AI stage for all of video_ids."""
+    videos = fetch_videos(video_ids)
+    if not videos:
+        return {}
+    batch = list(videos.values())
+    for video in batch:
+        video['category'] = category_engine.categorize_video(video)
+    # Velocity against our own snapshots when the video has trended before
+    metrics_engine.analyze_videos_metrics(batch, database.get_latest_snapshots(videos))
+    analyses = analyze(batch)
+
+    results = {}
+    for video in batch:
+        analysis = analyses.get(video['video_id'], ai_analyzer.FALLBACK_ANALYSIS)
+        results[video['video_id']] = build_result(video, analysis)
+    # Fallback analyses are not worth keeping; retry them on the next lookup
+    database.save_video_lookups({
+        vid: result for vid, result in results.items()
+        if analyses.get(vid) is not None and analyses[vid] != ai_analyzer.FALLBACK_ANALYSIS
+    })
+    return results
+
+def analyze_video_ids(video_ids, fetch_videos=None, analyze=None, use_cache=True):
+    """
+    Returns {video_id: result} for many IDs. Fresh results come from SQLite;
+    IDs another request is already working on are waited for rather than
+    fetched again; the rest cost one batched videos.list and one AI stage.
+    IDs YouTube does not know are left out.
+    """
+    fetch_videos = fetch_videos or backends.get_fetcher().fetch_videos
+    analyze = analyze or ai_analyzer.analyze_videos_ai
+    ids = list(dict.fromkeys(video_ids))
+    results = database.get_video_lookups(ids, ANALYZE_CACHE_TTL) if use_cache else {}
+
+    owned, waiting = {}, {}
+    with _inflight_lock:
+        for vid in ids:
+            if vid in results:
+                continue
+            if vid in _inflight:
+                waiting[vid] = _inflight[vid]
+            else:
+                owned[vid] = _inflight[vid] = Future()
+
+    if owned:
+        try:
+            fresh = _fetch_and_analyze(list(owned), fetch_videos, analyze)
+        except Exception as e:
+            for future in owned.values():
+                future.set_exception(e)
+            raise
+        finally:
+            with _inflight_lock:
+                for vid in owned:
+                    _inflight.pop(vid, None)
+        for vid, future in owned.items():
+            future.set_result(fresh.get(vid))
+        results.update((vid, result) for vid, result in fresh.items())
+
+    for vid, future in waiting.items():
+        result = future.result()
+        if result is not None:
+            results[vid] = result
+    return {vid: results[vid] for vid in ids if vid in results}
+
+def analyze_url(url, **kwargs):
+    """Single-URL lookup. Raises ValueError for a bad URL, VideoNotFoundError if YouTube has no such video."""
+    video_id = youtube_client.parse_video_id(url)
+    if not video_id:
+        raise ValueError("Invalid YouTube URL")
+    result = analyze_video_ids([video_id], **kwargs).get(video_id)
+    if result is None:
+        raise VideoNotFoundError(f"Video {video_id} not found")
+    return result
@@ -1,61 +1,319 @@
-from googleapiclient.discovery import build
 import os
+import json
 import datetime
+import queue
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlparse
 from dotenv import load_dotenv
 
+import database
+import telemetry
+
 load_dotenv()
 
 API_KEY = os.getenv("YOUTUBE_API_KEY")
-YOUTUBE = build('youtube', 'v3', developerKey=API_KEY)
 
-def fetch_trending_videos(region_code="IN"):
+# Point YOUTUBE_API_URL at a local stub server to replay recorded responses
+YOUTUBE_API_URL = os.getenv("YOUTUBE_API_URL", "https://www.googleapis.com/youtube/v3")
+REQUEST_TIMEOUT = float(os.getenv("YOUTUBE_REQUEST_TIMEOUT", "10"))
+MAX_WORKERS = int(os.getenv("YOUTUBE_MAX_WORKERS", "8"))
+MAX_PAGES = int(os.getenv("YOUTUBE_MAX_PAGES", "4")) # mostPopular is capped at 200 results
+
+# Quota: videos.list costs 1 unit per call whatever the parts; the default
+# project budget is 10,000 units/day. A 304 is counted too (conservative).
+DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+VIDEOS_LIST_COST = 1
+
+# snippet/contentDetails barely change, so they are fetched once per video
+# and reused for DETAILS_TTL seconds; statistics are fetched every cycle.
+DETAILS_TTL = int(os.getenv("YOUTUBE_DETAILS_TTL", str(24 * 3600)))
+DETAIL_PARTS = "snippet,contentDetails"
+CHART_PARTS = "id,statistics"
+IDS_PER_REQUEST = 50
+
+class QuotaExceededError(Exception):
+    pass
+
+def quota_day():
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d")
+
+def remaining_quota():
+    return DAILY_QUOTA - database.get_quota_used(quota_day())
+
+def api_get(resource, params, cost=VIDEOS_LIST_COST, conditional=False, timeout=REQUEST_TIMEOUT):
     """
-    Fetches trending videos from YouTube Data API.
+    GETs a YouTube Data API v3 resource and returns the decoded JSON body.
+    Every call is charged against the daily budget first (QuotaExceededError if
+    it would overrun). With conditional=True the last ETag is sent as
+    If-None-Match and a 304 is answered from the stored body.
     """
+    if not database.consume_quota(quota_day(), cost, DAILY_QUOTA):
+        telemetry.inc('yt_api_requests_total', result='quota_exceeded')
+        raise QuotaExceededError(f"Daily YouTube quota of {DAILY_QUOTA} units reached")
+    telemetry.inc('yt_quota_units_total', cost)
+
+    cache_key = f"{resource}?{urlencode(sorted(params.items()))}"
+    cached = database.get_cached_response(cache_key) if conditional else None
+
+    # Imported here: urllib.request costs ~25 ms and read-only API processes never call out
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+
+    query = {**params, 'key': API_KEY} if API_KEY else params
+    request = Request(f"{YOUTUBE_API_URL}/{resource}?{urlencode(query)}")
+    if cached:
+        request.add_header('If-None-Match', cached['etag'])
+
     try:
-        request = YOUTUBE.videos().list(
-            part="snippet,statistics,contentDetails",
-            chart="mostPopular",
-            regionCode=region_code,
-            maxResults=50  # Fetch top 50
-        )
-        response = request.execute()
-        
-        videos = []
-        for item in response.get('items', []):
-            published_at = item['snippet']['publishedAt']
-            # Parse published_at to datetime object
-            # Format: 2023-10-27T10:00:00Z
-            pub_date = datetime.datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ")
-            now = datetime.datetime.utcnow()
-            
-            # Filter: Upload time within last 24 hours
-            # OR (implicitly) in trending chart (which they are by definition of the API call)
-            # The prompt says: "Upload time within last 24 hours OR Videos currently in trending chart."
-            # Since we are fetching from 'mostPopular' chart, they ARE in trending.
-            # But usually we want fresh trends. Let's keep all for now and let metrics engine decide viralness?
-            # Prompt says: "Fetch ONLY real-time public trending data... Filter: Upload time within last 24 hours OR Videos currently in trending chart."
-            # Since the API *is* the trending chart, the second condition is always met for these videos.
-            # So we pass them all. 
-            
-            video_data = {
-                'video_id': item['id'],
-                'title': item['snippet']['title'],
-                'channel_title': item['snippet']['channelTitle'],
-                'published_at': published_at,
-                'description': item['snippet'].get('description', ''),
-                'tags': item['snippet'].get('tags', []),
-                'category_id': item['snippet'].get('categoryId'),
-                'view_count': int(item['statistics'].get('viewCount', 0)),
-                'like_count': int(item['statistics'].get('likeCount', 0)),
-                'comment_count': int(item['statistics'].get('commentCount', 0)),
-                'duration': item['contentDetails']['duration'],
-                'thumbnail_url': item['snippet']['thumbnails']['high']['url']
-            }
-            videos.append(video_data)
-            
-        return videos
-
-    except Exception as e:
-        print(f"Error fetching trending videos: {e}")
+        with telemetry.timed('yt_api_request_seconds'), urlopen(request, timeout=timeout) as response:
+            etag = response.headers.get('ETag')
+            body = json.load(response)
+    except HTTPError as e:
+        if e.code == 304 and cached:
+            telemetry.inc('yt_api_requests_total', result='not_modified')
+            return json.loads(cached['body'])
+        telemetry.inc('yt_api_requests_total', result=f'http_{e.code}')
+        raise
+    except OSError:
+        telemetry.inc('yt_api_requests_total', result='error')
+        raise
+    telemetry.inc('yt_api_requests_total', result='ok')
+
+    etag = etag or body.get('etag')
+    if conditional and etag:
+        database.save_cached_response(cache_key, etag, json.dumps(body))
+    return body
+
+def parse_details(item):
+    return {
+        'video_id': item['id'],
+        'title': item['snippet']['title'],
+        'channel_title': item['snippet']['channelTitle'],
+        'published_at': item['snippet']['publishedAt'],
+        'description': item['snippet'].get('description', ''),
+        'tags': item['snippet'].get('tags', []),
+        'category_id': item['snippet'].get('categoryId'),
+        'duration': item['contentDetails']['duration'],
+        'thumbnail_url': item['snippet']['thumbnails']['high']['url']
+    }
+
+def parse_statistics(item):
+    return {
+        'view_count': int(item['statistics'].get('viewCount', 0)),
+        'like_count': int(item['statistics'].get('likeCount', 0)),
+        'comment_count': int(item['statistics'].get('commentCount', 0)),
+    }
+
+def parse_video(item):
+    return {**parse_details(item), **parse_statistics(item)}
+
+def _batches(ids, size=IDS_PER_REQUEST):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+def _run_concurrently(fn, jobs, max_workers):
+    """
+    Runs fn(*job) for each job on a bounded pool. Returns results in job order,
+    with None for jobs that raised (errors are logged, not fatal).
+    """
+    if not jobs:
         return []
+    results = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+        futures = [pool.submit(fn, *job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"YouTube API request failed for {fn.__name__}{job}: {e}")
+                results.append(None)
+    return results
+
+VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+VIDEO_PATH_PREFIXES = ('shorts', 'embed', 'live', 'v', 'e')
+
+def parse_video_id(url):
+    """
+    Extracts the 11-character video ID from a YouTube URL (watch?v=, youtu.be/,
+    /shorts/, /embed/, /live/) or a bare ID. Returns None if there is none.
+    """
+    url = (url or '').strip()
+    if VIDEO_ID_RE.match(url):
+        return url
+    parsed = urlparse(url if '://' in url else f"https://{url}")
+    host = (parsed.hostname or '').lower()
+    parts = [p for p in parsed.path.split('/') if p]
+
+    candidate = None
+    if host == 'youtu.be' or host.endswith('.youtu.be'):
+        candidate = parts[0] if parts else None
+    elif host == 'youtube.com' or host.endswith('.youtube.com') or host == 'youtube-nocookie.com' \
+            or host.endswith('.youtube-nocookie.com'):
+        if parts[:1] == ['watch']:
+            candidate = parse_qs(parsed.query).get('v', [None])[0]
+        elif len(parts) >= 2 and parts[0] in VIDEO_PATH_PREFIXES:
+            candidate = parts[1]
+    return candidate if candidate and VIDEO_ID_RE.match(candidate) else None
+
+def iter_chart_pages(region_code, category_id=None, max_pages=MAX_PAGES):
+    """
+    Yields one mostPopular chart (region + optional category) page by page as
+    [(video_id, statistics)], following nextPageToken. Only id and statistics
+    are requested; pages are ETag-cached.
+    """
+    page_token = None
+
+    for _ in range(max_pages):
+        params = {
+            'part': CHART_PARTS,
+            'chart': 'mostPopular',
+            'regionCode': region_code,
+            'maxResults': 50,
+        }
+        if category_id:
+            params['videoCategoryId'] = category_id
+        if page_token:
+            params['pageToken'] = page_token
+
+        response = api_get('videos', params, conditional=True)
+        yield [(item['id'], parse_statistics(item)) for item in response.get('items', [])]
+
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+
+def fetch_chart(region_code, category_id=None, max_pages=MAX_PAGES):
+    """
+    Fetches one whole chart as [(video_id, statistics)].
+    """
+    return [entry for page in iter_chart_pages(region_code, category_id, max_pages) for entry in page]
+
+def _fetch_by_ids(ids, parts):
+    response = api_get('videos', {'part': parts, 'id': ','.join(ids), 'maxResults': IDS_PER_REQUEST})
+    return response.get('items', [])
+
+def fetch_details(video_ids, max_workers=MAX_WORKERS):
+    """
+    Returns {video_id: details} for video_ids, reading the local cache first and
+    fetching only new or stale IDs in 50-ID videos.list batches.
+    """
+    ids = list(dict.fromkeys(video_ids))
+    details = database.get_video_details(ids, max_age=DETAILS_TTL)
+    missing = [vid for vid in ids if vid not in details]
+
+    fetched = []
+    for items in _run_concurrently(_fetch_by_ids, [(b, DETAIL_PARTS) for b in _batches(missing)], max_workers):
+        fetched.extend(parse_details(item) for item in items or [])
+    database.save_video_details(fetched)
+
+    details.update((d['video_id'], d) for d in fetched)
+    return details
+
+def fetch_videos(video_ids, max_workers=MAX_WORKERS):
+    """
+    Full video dicts for arbitrary IDs (not just charts): {video_id: video}.
+    IDs with cached details only need statistics; the rest are fetched with
+    every part in one call per 50 IDs. Unknown or private IDs are left out.
+    """
+    ids = list(dict.fromkeys(video_ids))
+    details = database.get_video_details(ids, max_age=DETAILS_TTL)
+    missing = [vid for vid in ids if vid not in details]
+
+    videos = {}
+    jobs = [(b, f"{DETAIL_PARTS},statistics") for b in _batches(missing)]
+    for items in _run_concurrently(_fetch_by_ids, jobs, max_workers):
+        for item in items or []:
+            videos[item['id']] = parse_video(item)
+    database.save_video_details(videos.values())
+
+    stats = fetch_statistics([vid for vid in ids if vid in details], max_workers)
+    for vid, video_stats in stats.items():
+        videos[vid] = {**details[vid], **video_stats}
+    return {vid: videos[vid] for vid in ids if vid in videos}
+
+def fetch_statistics(video_ids, max_workers=MAX_WORKERS):
+    """
+    Stats-only refresh of known videos: {video_id: statistics} in 50-ID batches.
+    """
+    ids = list(dict.fromkeys(video_ids))
+    stats = {}
+    for items in _run_concurrently(_fetch_by_ids, [(b, 'statistics') for b in _batches(ids)], max_workers):
+        stats.update((item['id'], parse_statistics(item)) for item in items or [])
+    return stats
+
+def iter_trending_pages(regions, category_ids=None, max_pages=MAX_PAGES, max_workers=MAX_WORKERS, queue_size=8):
+    """
+    Fetches every (region, category) chart concurrently on a bounded thread pool
+    and yields pages of full video dicts (tagged with 'regions') as soon as each
+    page and its details are in, so later stages can start before the fetch ends.
+    The same video can appear in pages from several charts (see merge_video).
+    A failing chart is logged and skipped so the rest of the cycle still runs.
+    """
+    charts = [(region, cat) for region in regions for cat in (category_ids or [None])]
+    if not charts:
+        return
+
+    pages = queue.Queue(maxsize=queue_size)
+    chart_done = object()
+
+    def fetch_chart_pages(region, cat):
+        try:
+            for entries in iter_chart_pages(region, cat, max_pages):
+                details = fetch_details([vid for vid, _ in entries], max_workers=1)
+                pages.put([
+                    {**details[vid], **stats, 'regions': [region]}
+                    for vid, stats in entries if vid in details
+                ])
+        except Exception as e:
+            print(f"Error fetching trending videos ({region}, category {cat}): {e}")
+        finally:
+            pages.put(chart_done)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(charts))) as pool:
+        for region, cat in charts:
+            pool.submit(fetch_chart_pages, region, cat)
+
+        remaining = len(charts)
+        try:
+            while remaining:
+                page = pages.get()
+                if page is chart_done:
+                    remaining -= 1
+                elif page:
+                    yield page
+        finally:
+            # Consumer stopped early: drain so blocked producers can finish
+            while remaining:
+                if pages.get() is chart_done:
+                    remaining -= 1
+
+def merge_video(existing, video):
+    """Folds a duplicate sighting of a video (another region/chart) into the first one."""
+    for region in video.get('regions', []):
+        if region not in existing['regions']:
+            existing['regions'].append(region)
+    # Keep the freshest stats seen across charts
+    for key in ('view_count', 'like_count', 'comment_count'):
+        existing[key] = max(existing[key], video[key])
+    return existing
+
+def fetch_trending_multi(regions, category_ids=None, max_pages=MAX_PAGES, max_workers=MAX_WORKERS):
+    """
+    Fetches every (region, category) chart concurrently and merges videos that
+    trend in several charts into one entry.
+    """
+    merged = {}
+    for page in iter_trending_pages(regions, category_ids, max_pages, max_workers):
+        for video in page:
+            if video['video_id'] in merged:
+                merge_video(merged[video['video_id']], video)
+            else:
+                merged[video['video_id']] = video
+    return list(merged.values())
+
+def fetch_trending_videos(region_code="IN"):
+    """
+    Fetches trending videos from YouTube Data API.
+    """
+    return fetch_trending_multi([region_code])